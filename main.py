@@ -4,13 +4,19 @@ import os
 os.environ["CUDA_VISIBLE_DEVICES"] = "2"
 
 import cv2
-from src.detection.detector_tracker import UltralyticsByteTrack
-from src.embedding.clip_embedder import ClipEmbedder
-from src.memory.memory import PersonMemory
-from src.embedding.qwen_embedder import QwenEmbedder
-from src.agent.orchestration_agent import OrchestrationAgent
-from src.pipeline.graph import pipeline
+from src.memory.store import GalleryStore
+from src.utils.result_cache import ResultCache, file_fingerprint, text_hash
+from src.embedding import qwen_embedder
+from src.pipeline.components import build_components, make_state
+from src.pipeline.graph import pipeline, deferred_pipeline, build_pipeline, PIPELINE_STAGES, DEFERRED_PIPELINE_STAGES
+from src.pipeline.instrumentation import Instrumentation
+from src.pipeline.streaming import StreamingPipeline
+from src.pipeline.deferred import DeferredIdentityResolver, rerender
+from src.pipeline.replay import RunRecorder
+from src.pipeline.stride import StrideScheduler
+from src.utils.video import read_frames
 import yaml
+import time
 from box import Box
 from pathlib import Path
 from tqdm import tqdm
@@ -19,6 +25,64 @@ import torch
 with open("config/config.yaml", "r") as f:
     config = Box(yaml.safe_load(f))
 
+def read_tracked_frames(cap, detector):
+    """Yield (frame_id, frame, detections), detecting and tracking `detector.batch_size` frames per YOLO pass."""
+    batch = []
+    for frame_id, frame in read_frames(cap):
+        batch.append((frame_id, frame))
+        if len(batch) == detector.batch_size:
+            yield from zip(*zip(*batch), detector.track_frames([f for _, f in batch]))
+            batch = []
+    if batch:
+        yield from zip(*zip(*batch), detector.track_frames([f for _, f in batch]))
+
+def open_gallery(memory):
+    """Open the on-disk identity gallery (if configured) and load its people into `memory`."""
+    gallery_cfg = config.get("gallery", {})
+    if not gallery_cfg.get("path"):
+        return None
+    gallery = GalleryStore(gallery_cfg.path)
+    if gallery_cfg.get("load", True):
+        start = time.time()
+        loaded = gallery.load(memory)
+        print(f"[Gallery] loaded {loaded} identities from {gallery_cfg.path} in {time.time() - start:.2f} seconds")
+    return gallery
+
+def open_result_cache(components, video_path):
+    """
+    Open the cross-run result cache (if enabled). Each kind of result is
+    namespaced by the model and settings that produced it, so changing the
+    model, prompt or preprocessing invalidates the old entries.
+    """
+    cache_cfg = config.get("result_cache", {})
+    if not cache_cfg.get("enabled", False):
+        return None
+    descriptor = components["descriptor"]
+    with open(config.tracking.tracker_cfg, "r") as f:
+        tracker_hash = text_hash(f.read())
+    namespaces = {
+        "detections": f"{components['detector'].model_path}|{tracker_hash}",
+        "embedding": components["embedder"].model_path,
+        "description": f"{descriptor.model_id}|{text_hash(qwen_embedder.prompt)}|"
+                       f"{descriptor.resized_width}x{descriptor.resized_height}|prefix={descriptor.prefix_cache}",
+    }
+    cache = ResultCache(
+        cache_cfg.get("path", "cache/results.sqlite"),
+        max_bytes  = int(cache_cfg.get("max_size_mb", 2048) * 2 ** 20),
+        namespaces = namespaces,
+    )
+    removed = cache.invalidate_stale()
+    if removed:
+        print(f"[ResultCache] dropped {removed} entries from older models/prompts")
+    components["result_cache"] = cache
+    components["video_hash"] = file_fingerprint(video_path)
+    return cache
+
+def print_memory(memory):
+    print("Current memory:")
+    for gid, person in memory.memory.items():
+        print(f"ID {gid}: {person['description']}")
+
 def main():
     # Debug: Print CUDA device information
     print(f"CUDA available: {torch.cuda.is_available()}")
@@ -31,24 +95,68 @@ def main():
     # --- Setup ---
     video_path = config.input_video
     output_path = config.output_video
-    detector = UltralyticsByteTrack(
-        model_path=config.detection.model_path,
-        tracker_cfg=config.tracking.tracker_cfg,
-        persist=config.tracking.persist,
-        device=config.device
-    )
-    embedder = ClipEmbedder(
-        model_path=config.embedding.model_path, 
-        device=config.device
-    )
-    memory = PersonMemory(similarity_threshold=config.embedding.similarity_threshold)
-    descriptor = QwenEmbedder(device_map=config.device)
-    orchestrator = OrchestrationAgent(
-        model_name = config.llm.llm_model,
-        quant      = getattr(config.llm, "quant", "4bit"),
-        max_new_tokens = getattr(config.llm, "max_new_tokens", 120),
-        device_map = getattr(config.llm, "device_map", "auto"),
-    )
+    components = build_components(config)
+    result_cache = open_result_cache(components, video_path)
+    memory = components["memory"]
+    gallery = open_gallery(memory)
+    flush_interval = config.get("gallery", {}).get("flush_interval", 300)
+
+    def maybe_flush(frame_id):
+        if gallery is not None and flush_interval and (frame_id + 1) % flush_interval == 0:
+            gallery.flush(memory)
+
+    execution = config.get("execution", {})
+    mode = execution.get("mode", "serial")
+    deferred = execution.get("deferred_identity", False)
+    resolver = None
+    if deferred:
+        resolver = DeferredIdentityResolver(
+            components, config, max_pending=execution.get("deferred_max_pending", 32)
+        )
+        components["identity_resolver"] = resolver
+    graph_pipeline = deferred_pipeline if deferred else pipeline
+    stages = DEFERRED_PIPELINE_STAGES if deferred else PIPELINE_STAGES
+    instrumentation = None
+    instr_cfg = config.get("instrumentation", {})
+    if instr_cfg.get("enabled", False):
+        # Per-node wall/GPU time, item counts, cache and token counters; the default pipelines stay unwrapped
+        instrumentation = Instrumentation(
+            trace_path = instr_cfg.get("trace_path"),
+            format     = instr_cfg.get("format", "chrome"),
+            gpu_timing = instr_cfg.get("gpu_timing", True),
+        )
+        graph_pipeline = build_pipeline(stages, instrumentation)
+        stages = instrumentation.wrap_stages(stages)
+    recorder = None
+    if execution.get("record_run"):
+        if deferred:
+            # The video path only sees provisional IDs; descriptions and embeddings stay in the resolver
+            print("[Record] record_run needs the per-frame descriptions and embeddings of the inline pipeline; "
+                  "not recording with deferred_identity")
+        else:
+            # Per-frame detections / descriptions / embeddings / IDs for replay.py
+            recorder = RunRecorder(execution.record_run, meta={"input_video": video_path})
+    scheduler = None
+    stride_cfg = config.get("stride", {})
+    if stride_cfg.get("enabled", False):
+        if mode == "streaming":
+            print("[Stride] frame skipping only applies to serial mode; processing every frame")
+        else:
+            # Full pipeline on key frames only; frames in between get interpolated boxes
+            scheduler = StrideScheduler(
+                stride         = stride_cfg.get("stride", 2),
+                adaptive       = stride_cfg.get("adaptive", True),
+                min_stride     = stride_cfg.get("min_stride", 1),
+                max_stride     = stride_cfg.get("max_stride", 8),
+                motion_low     = stride_cfg.get("motion_low", 2.0),
+                motion_high    = stride_cfg.get("motion_high", 12.0),
+                min_confidence = stride_cfg.get("min_confidence", 0.6),
+            )
+
+    batched_detection = getattr(config.detection, "batch_size", 1) > 1
+    if batched_detection and (mode == "streaming" or scheduler is not None):
+        print("[Detection] batched detection only applies to the serial, every-frame path; tracking per frame")
+        batched_detection = False
 
     # --- Video IO ---
     cap = cv2.VideoCapture(video_path)
@@ -59,48 +167,104 @@ def main():
     total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
     out = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
-    frame_id = 0
     with tqdm(total=total_frames, desc="Processing frames") as pbar:
-        while cap.isOpened():
-            ret, frame = cap.read()
-            if not ret:
-                break
-
-            # --- Pipeline State ---
-            state = {
-                "config": config,
-                "frame_id": frame_id,
-                "frame": frame,
-                "detector": detector,
-                "embedder": embedder,
-                "descriptor": descriptor,
-                "detections": [],
-                "descriptions": [],
-                "description_matcher": orchestrator,
-                "embeddings": [], 
-                "memory": memory,  
-                "global_ids": [],  
-                "output_frame": None,
-                "frame_matching_details": []
-            }
-
-            # --- Run Pipeline ---
-            result_state = pipeline.invoke(state)
-            out.write(result_state["output_frame"])
-
-            # Print current memory after processing this frame
-            print("Current memory:")
-            for gid, person in memory.memory.items():
-                print(f"ID {gid}: {person['description']}")
-
-
-            frame_id += 1
-            pbar.update(1)
+        if mode == "streaming":
+            # Decode, every graph node and encode run as separate threads joined by bounded queues
+            streamer = StreamingPipeline(
+                stages=stages,
+                queue_size=execution.get("queue_size", 4),
+            )
+            report_interval = execution.get("report_interval", 100)
+
+            def on_frame(state):
+                pbar.update(1)
+                if recorder is not None:
+                    recorder.record(state)
+                maybe_flush(state["frame_id"])
+                if report_interval and (state["frame_id"] + 1) % report_interval == 0:
+                    print(streamer.format_report())
+
+            streamer.run(
+                read_frames(cap),
+                make_state=lambda frame_id, frame: make_state(config, components, frame_id, frame),
+                write=lambda state: out.write(state["output_frame"]),
+                on_frame=on_frame,
+            )
+            print(streamer.format_report())
+        elif scheduler is not None:
+            for result_state in scheduler.run(
+                read_frames(cap),
+                make_state=lambda frame_id, frame: make_state(config, components, frame_id, frame),
+                process=graph_pipeline.invoke,
+            ):
+                out.write(result_state["output_frame"])
+                if not result_state.get("interpolated"):
+                    if recorder is not None:
+                        recorder.record(result_state)
+                    if not deferred:
+                        print_memory(memory)
+                maybe_flush(result_state["frame_id"])
+                pbar.update(1)
+        else:
+            if batched_detection:
+                frame_source = read_tracked_frames(cap, components["detector"])
+            else:
+                frame_source = ((frame_id, frame, None) for frame_id, frame in read_frames(cap))
+            for frame_id, frame, tracked_detections in frame_source:
+                # --- Pipeline State ---
+                state = make_state(config, components, frame_id, frame, tracked_detections)
+
+                # --- Run Pipeline ---
+                result_state = graph_pipeline.invoke(state)
+                out.write(result_state["output_frame"])
+                if recorder is not None:
+                    recorder.record(result_state)
+
+                # Print current memory after processing this frame
+                if not deferred:
+                    print_memory(memory)
+
+                maybe_flush(frame_id)
+                pbar.update(1)
 
     cap.release()
     out.release()
     print(f"Output saved to {output_path}")
+
+    if resolver is not None:
+        # Let the background worker finish, then publish the retroactive relabelling
+        resolver.drain(timeout=execution.get("deferred_drain_timeout", 600))
+        resolver.close()
+        print(f"Deferred identities: {resolver.stats()}")
+        if execution.get("relabel_log"):
+            resolver.save_logs(execution.relabel_log)
+            print(f"Relabel log saved to {execution.relabel_log}")
+        if execution.get("rerender_output"):
+            rerender(video_path, execution.rerender_output, resolver.track_log, resolver.resolved)
+            print(f"Re-rendered output with final IDs saved to {execution.rerender_output}")
+    if scheduler is not None:
+        print(f"[Stride] {scheduler.stats()}")
+    if instrumentation is not None:
+        print(instrumentation.format_summary())
+        instrumentation.close()
+        if instr_cfg.get("trace_path"):
+            print(f"Trace saved to {instr_cfg.trace_path}")
+    if recorder is not None:
+        recorder.save()
+    if result_cache is not None:
+        print(f"[ResultCache] {result_cache.stats()}")
+        result_cache.close()
+    if gallery is not None:
+        gallery.flush(memory)
+        print(f"[Gallery] {gallery.stats()}")
+        gallery.close()
     print(f"Total unique persons tracked: {memory.get_memory_size()}")
+    if components["description_cache"] is not None:
+        print(f"Description cache: {components['description_cache'].stats()}")
+    if components["track_binding"] is not None:
+        print(f"Track bindings: {components['track_binding'].stats()}")
+    print(f"VLM prefill: {components['descriptor'].prefill_stats()}")
+    print(f"LLM prefill: {components['description_matcher'].prefill_stats()}")
 
 if __name__ == "__main__":
-    main()
+    main()
\ No newline at end of file
@@ -0,0 +1,132 @@
+# multistream.py
+"""
+Process several videos / camera streams at once against one shared identity
+gallery, so a person seen in one stream keeps their global ID in the others.
+
+    python multistream.py data/videos/cam_a.mp4 data/videos/cam_b.mp4
+    python multistream.py "data/videos/*.mp4" --workers 3 --output-dir output/streams
+    python multistream.py 0 rtsp://10.0.0.5/stream --max-frames 9000   # webcam index / stream URLs
+
+Each stream runs in its own process with its own models, tracker, caches and
+track bindings (the serial pipeline of main.py), all built from `--config`.
+Identities live in a SharedGallery served by a manager process. Every worker
+matches against it and adds to it, and runs its LLM comparisons locally. With `gallery.path`
+configured, the shared gallery is loaded at start and saved at the end.
+"""
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing as mp
+import cv2
+import yaml
+from box import Box
+from src.memory.shared import GalleryManager, RemoteMemory
+from src.utils.video import read_frames
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the pipeline on several streams with a shared gallery.")
+    parser.add_argument("sources", nargs="+", help="video paths, globs, camera indices or stream URLs")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--workers", type=int, default=None, help="concurrent streams (default: one per source)")
+    parser.add_argument("--output-dir", default="output/streams")
+    parser.add_argument("--max-frames", type=int, default=None, help="stop each stream after N frames (cameras)")
+    return parser.parse_args()
+
+
+def expand_sources(sources):
+    """Globs expand to their (sorted) files; digits are camera indices; anything else is passed to OpenCV as is."""
+    expanded = []
+    for source in sources:
+        if source.isdigit():
+            expanded.append(int(source))
+        elif "://" in source:
+            expanded.append(source)
+        else:
+            expanded.extend(sorted(glob.glob(source)) or [source])
+    return expanded
+
+
+def output_name(source, index):
+    if isinstance(source, int):
+        return f"camera{source}_tracked.mp4"
+    if "://" in source:
+        return f"stream{index}_tracked.mp4"
+    return f"{os.path.splitext(os.path.basename(source))[0]}_tracked.mp4"
+
+
+def run_stream(source, output_path, gallery, config_dict, max_frames=None):
+    """Worker: the serial pipeline of main.py on one stream, with identities from the shared gallery."""
+    # Imported here so the parent process never loads torch or the models
+    from src.pipeline.components import build_components, make_state
+    from src.pipeline.graph import pipeline
+
+    config = Box(config_dict)
+    components = build_components(config)
+    components["memory"] = RemoteMemory(gallery)
+    cap = cv2.VideoCapture(source)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 25
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    frames = 0
+    start = time.perf_counter()
+    for frame_id, frame in read_frames(cap):
+        if max_frames is not None and frame_id >= max_frames:
+            break
+        state = pipeline.invoke(make_state(config, components, frame_id, frame))
+        out.write(state["output_frame"])
+        frames += 1
+    seconds = time.perf_counter() - start
+    cap.release()
+    out.release()
+    return {"source": str(source), "output": output_path, "frames": frames, "seconds": round(seconds, 2),
+            "fps": round(frames / seconds, 2) if seconds else 0.0}
+
+
+def main():
+    args = parse_args()
+    with open(args.config, "r") as f:
+        config = Box(yaml.safe_load(f))
+    sources = expand_sources(args.sources)
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    # CUDA cannot be re-initialised in forked children
+    ctx = mp.get_context("spawn")
+    manager = GalleryManager(ctx=ctx)
+    manager.start()
+    gallery_cfg = config.get("gallery", {})
+    gallery = manager.SharedGallery(config.to_dict(), gallery_cfg.get("path"), gallery_cfg.get("load", True))
+
+    reports = []
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers or len(sources), mp_context=ctx) as pool:
+        futures = {
+            pool.submit(run_stream, source, os.path.join(args.output_dir, output_name(source, i)),
+                        gallery, config.to_dict(), args.max_frames): source
+            for i, source in enumerate(sources)
+        }
+        for future in as_completed(futures):
+            try:
+                report = future.result()
+            except Exception as e:
+                print(f"[Streams] {futures[future]} failed: {e}")
+                continue
+            reports.append(report)
+            print(f"[Streams] {report['source']}: {report['frames']} frames in {report['seconds']} s "
+                  f"({report['fps']} fps) -> {report['output']}")
+    wall = time.perf_counter() - start
+
+    total_frames = sum(r["frames"] for r in reports)
+    print(f"[Streams] {len(reports)}/{len(sources)} streams, {total_frames} frames in {wall:.2f} s: "
+          f"aggregate {total_frames / wall:.2f} fps")
+    print(f"[Streams] shared gallery: {gallery.get_memory_size()} identities")
+    gallery.close()
+    manager.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+# replay.py
+"""
+Offline replay: re-run identity assignment (and optionally rendering) from a
+run recorded with `execution.record_run`, without loading YOLO, CLIP or Qwen.
+
+    python replay.py --run output/run.npz                       # description matching, offline matcher
+    python replay.py --run output/run.npz --mode embedding      # CLIP-only matching
+    python replay.py --run output/run.npz --output output/replay.mp4
+
+Edit thresholds in the config (or pass --config) and replay again.
+"""
+import argparse
+import time
+import cv2
+import yaml
+from box import Box
+from tqdm import tqdm
+from src.memory.memory import build_memory
+from src.pipeline.components import build_track_binding, load_matcher
+from src.pipeline.graph import id_assignment_node, id_assignment_description_node, output_node
+from src.pipeline.replay import RunLog, OfflineMatcher, id_switches
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Replay identity assignment from a recorded run.")
+    parser.add_argument("--run", required=True, help=".npz written by execution.record_run")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--mode", choices=["description", "embedding"], default="description",
+                        help="re-run id_assignment_description_node or the CLIP-only id_assignment_node")
+    parser.add_argument("--video", default=None, help="source video for --output (default: the recorded one)")
+    parser.add_argument("--output", default=None, help="render the replayed IDs to this video")
+    parser.add_argument("--llm", action="store_true", help="use the real OrchestrationAgent instead of the offline matcher")
+    parser.add_argument("--offline-threshold", type=float, default=0.75,
+                        help="attribute score the offline matcher needs to accept a candidate")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.config, "r") as f:
+        config = Box(yaml.safe_load(f))
+    run = RunLog(args.run)
+
+    memory = build_memory(config)
+    matcher = load_matcher(config) if args.llm else OfflineMatcher(args.offline_threshold)
+    binding = build_track_binding(config)
+    node = id_assignment_description_node if args.mode == "description" else id_assignment_node
+
+    cap = out = None
+    if args.output:
+        cap = cv2.VideoCapture(args.video or run.meta["input_video"])
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        out = cv2.VideoWriter(args.output, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    track_ids, recorded_ids, replayed_ids = [], [], []
+    video_frame_id, image = -1, None
+    start = time.time()
+    for frame in tqdm(run.frames(), total=len(run), desc="Replaying frames"):
+        recorded_ids.extend(frame["global_ids"])
+        state = {
+            **frame,
+            "config": config,
+            "frame": None,
+            "memory": memory,
+            "description_matcher": matcher,
+            "track_binding": binding,
+            "global_ids": [],
+            "frame_matching_details": [],
+        }
+        state = node(state)
+        track_ids.extend(det["track_id"] for det in state["detections"])
+        replayed_ids.extend(state["global_ids"])
+
+        if out is not None:
+            while video_frame_id < frame["frame_id"]:
+                ok, image = cap.read()
+                if not ok:
+                    break
+                video_frame_id += 1
+            if image is not None and video_frame_id == frame["frame_id"]:
+                state["frame"] = image
+                out.write(output_node(state)["output_frame"])
+
+    if out is not None:
+        cap.release()
+        out.release()
+        print(f"Replayed output saved to {args.output}")
+    print(f"[Replay] {len(run)} frames in {time.time() - start:.2f} seconds")
+    print(f"[Replay] identities: recorded {len({g for g in recorded_ids if g is not None})}, "
+          f"replayed {memory.get_memory_size()}")
+    print(f"[Replay] ID switches: recorded {id_switches(track_ids, recorded_ids)}, "
+          f"replayed {id_switches(track_ids, replayed_ids)}")
+
+
+if __name__ == "__main__":
+    main()
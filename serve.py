@@ -0,0 +1,62 @@
+# serve.py
+"""
+Local model server: loads Qwen2.5-VL (descriptions) and the matching LLM once
+and serves them over localhost HTTP to any number of pipelines, batching
+concurrent requests across clients.
+
+    python serve.py                      # real models, settings from config/config.yaml
+    python serve.py --stub --port 8766   # stub models with simulated latency (no weights / GPU)
+
+Point pipelines at it with `model_server.url: http://127.0.0.1:8765` in the config.
+"""
+import argparse
+import yaml
+from box import Box
+from src.serving.server import ModelServer
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Serve the VLM and LLM to several pipelines.")
+    parser.add_argument("--config", default="config/config.yaml")
+    parser.add_argument("--host", default=None)
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--stub", action="store_true", help="serve stub models (see src/benchmark/stubs.py)")
+    parser.add_argument("--stub-latency", type=float, nargs=2, default=[0.15, 0.02], metavar=("CALL", "ITEM"),
+                        help="stub seconds per call and per item")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    with open(args.config, "r") as f:
+        config = Box(yaml.safe_load(f))
+    server_cfg = config.get("model_server", {})
+
+    if args.stub:
+        from src.benchmark.stubs import StubDescriptor, StubMatcher
+        descriptor = StubDescriptor(*args.stub_latency, max_batch_size=None)
+        matcher = StubMatcher(latency=args.stub_latency[0], per_item=args.stub_latency[1])
+    else:
+        from src.pipeline.components import load_descriptor, load_matcher
+        descriptor = load_descriptor(config)
+        matcher = load_matcher(config)
+
+    server = ModelServer(
+        descriptor,
+        matcher,
+        host           = args.host or server_cfg.get("host", "127.0.0.1"),
+        port           = args.port or server_cfg.get("port", 8765),
+        max_batch_size = server_cfg.get("max_batch_size", 16),
+        max_wait       = server_cfg.get("max_wait_ms", 10) / 1000,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"[ModelServer] {server.stats()}")
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# src/agent/json_constraint.py
+
+import numpy as np
+import torch
+from transformers import LogitsProcessor, StoppingCriteria
+
+CONFIDENCE_LEVELS = ("high", "medium", "low")
+_CLOSE = '"}'
+
+
+def _is_free_text(s):
+    """True if `s` can appear raw inside a JSON string: no quote, backslash or control character."""
+    return all(c >= " " and c not in '"\\' for c in s)
+
+
+class TokenTable:
+    """
+    Decoded string of every vocabulary token, computed once per tokenizer, plus
+    the lookups the constraint needs: string -> token ids, and masks of tokens
+    that may appear inside / close the free-text "reasoning" value.
+    """
+
+    def __init__(self, tokenizer, vocab_size=None):
+        vocab_size = vocab_size or len(tokenizer)
+        special = set(tokenizer.all_special_ids)
+        decoded = tokenizer.batch_decode([[i] for i in range(len(tokenizer))])
+        self.strings = [s if i not in special else "" for i, s in enumerate(decoded)]
+        self.strings += [""] * (vocab_size - len(self.strings))
+        self.by_string = {}
+        for i, s in enumerate(self.strings):
+            if s:
+                self.by_string.setdefault(s, []).append(i)
+        self.max_len = max(len(s) for s in self.strings)
+
+        # Tokens made only of free-text characters, and tokens "<free text>\"" / "<free text>\"}"
+        self.free_ok = np.zeros(vocab_size, dtype=bool)
+        self.close_ok = np.zeros(vocab_size, dtype=bool)
+        for i, s in enumerate(self.strings):
+            if not s:
+                continue
+            q = s.find('"')
+            if q < 0:
+                self.free_ok[i] = _is_free_text(s)
+            elif _CLOSE.startswith(s[q:]) and _is_free_text(s[:q]):
+                self.close_ok[i] = True
+        self._free_masks = {}  # {device: bool tensor}
+
+    def prefix_tokens(self, text):
+        """Ids of every token whose string is a non-empty prefix of `text`."""
+        ids = []
+        for k in range(1, min(len(text), self.max_len) + 1):
+            ids.extend(self.by_string.get(text[:k], ()))
+        return ids
+
+    def free_mask(self, device):
+        if device not in self._free_masks:
+            self._free_masks[device] = torch.from_numpy(self.free_ok | self.close_ok).to(device)
+        return self._free_masks[device]
+
+
+class MatchJsonConstraint(LogitsProcessor):
+    """
+    Forces the reply into
+        {"matched_id": <one of candidate_ids|null>, "confidence": "high|medium|low", "reasoning": "<text>"}
+    followed by EOS. The id (from `row_candidate_ids`, one list per batch row) and
+    the confidence come from closed sets, the reasoning is any text without
+    quotes/backslashes/control characters of at most `reasoning_max_chars`,
+    closed early when only the closing `"}` still fits in `max_new_tokens`.
+    The generated text is re-derived from the token table every step, so the
+    processor holds no per-step state and works for any batch row.
+    """
+
+    def __init__(self, table, row_candidate_ids, prompt_length, eos_token_ids, reasoning_max_chars=240,
+                 max_new_tokens=None):
+        self.table = table
+        self.prompt_length = prompt_length
+        self.max_new_tokens = max_new_tokens
+        self.eos_token_ids = list(eos_token_ids)
+        self.reasoning_max_chars = reasoning_max_chars
+        self.row_heads = []
+        for candidate_ids in row_candidate_ids:
+            choices = [str(int(gid)) for gid in candidate_ids] + ["null"]
+            self.row_heads.append([f'{{"matched_id": {gid}, "confidence": "{level}", "reasoning": "'
+                                   for gid in choices for level in CONFIDENCE_LEVELS])
+
+    def generated_text(self, row_ids):
+        return "".join(self.table.strings[i] for i in row_ids[self.prompt_length:].tolist())
+
+    def state(self, row, text):
+        """("head", text) in the fixed part, ("free", reasoning), ("tail", closing chars) or ("done", "")."""
+        for head in self.row_heads[row]:
+            if text.startswith(head):
+                rest = text[len(head):]
+                q = rest.find('"')
+                if q < 0:
+                    return "free", rest
+                return ("done", "") if rest[q:] == _CLOSE else ("tail", rest[q:])
+        return "head", text
+
+    def is_done(self, row, row_ids):
+        return self.state(row, self.generated_text(row_ids))[0] == "done"
+
+    def __call__(self, input_ids, scores):
+        constrained = torch.full_like(scores, float("-inf"))
+        remaining = (self.max_new_tokens - (input_ids.shape[1] - self.prompt_length)
+                     if self.max_new_tokens is not None else None)
+        # Close the reasoning while the '"' and '}' tokens still fit in the budget
+        must_close = remaining is not None and remaining <= len(_CLOSE)
+        for row in range(input_ids.shape[0]):
+            row_ids = input_ids[row]
+            if any(i in self.eos_token_ids for i in row_ids[self.prompt_length:].tolist()):
+                constrained[row] = scores[row]  # finished rows are padded by generate
+                continue
+            kind, value = self.state(row, self.generated_text(row_ids))
+            if kind == "free" and len(value) < self.reasoning_max_chars and not must_close:
+                mask = self.table.free_mask(scores.device)[:scores.shape[-1]]
+                constrained[row] = scores[row].masked_fill(~mask, float("-inf"))
+                continue
+            if kind == "head":
+                allowed = set()
+                for head in self.row_heads[row]:
+                    if head.startswith(value):
+                        allowed.update(self.table.prefix_tokens(head[len(value):]))
+            elif kind == "free":
+                allowed = self.table.prefix_tokens(_CLOSE)  # reasoning is at its length or token limit
+            elif kind == "tail":
+                allowed = self.table.prefix_tokens(_CLOSE[len(value):])
+            else:
+                allowed = self.eos_token_ids
+            allowed = list(allowed) or self.eos_token_ids
+            constrained[row, allowed] = scores[row, allowed]
+        return constrained
+
+
+class StopOnCompleteJson(StoppingCriteria):
+    """Stops generation as soon as every row has produced the closing brace."""
+
+    def __init__(self, constraint):
+        self.constraint = constraint
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return torch.tensor([self.constraint.is_done(row, row_ids) for row, row_ids in enumerate(input_ids)],
+                            dtype=torch.bool, device=input_ids.device)
@@ -3,12 +3,15 @@ from transformers import (
     AutoModelForCausalLM,
     AutoTokenizer,
     BitsAndBytesConfig,
-    pipeline,
+    DynamicCache,
+    LogitsProcessorList,
+    StoppingCriteriaList,
 )
-from langchain_community.llms import HuggingFacePipeline
-from langchain.schema import HumanMessage, SystemMessage
 import torch, json
 import re
+from src.utils.prefix_cache import PrefixCacheStats, expand_cache
+from src.agent.json_constraint import TokenTable, MatchJsonConstraint, StopOnCompleteJson
+from src.memory.memory import resolve_one_to_one
 
 def extract_json_from_reply(reply):
     # This regex finds all {...} blocks in the reply
@@ -61,7 +64,18 @@ If several IDs seem plausible, choose the single best match. If none is credible
 """
 
 class OrchestrationAgent:
-    def __init__(self, model_name="Qwen/Qwen2.5-7B-Instruct", quant="4bit", max_new_tokens=120, device_map="auto"):
+    def __init__(self, model_name="Qwen/Qwen2.5-7B-Instruct", quant="4bit", max_new_tokens=96, device_map="auto",
+                 prefix_cache=True, constrained=True, reasoning_max_chars=240, max_batch_size=8):
+        """
+        Replies are decoded greedily and only the new tokens are returned.
+        With `constrained`, decoding is restricted to the
+        {"matched_id", "confidence", "reasoning"} object (matched_id limited to
+        the existing IDs or null) and stops at its closing brace.
+        With `prefix_cache`, the KV cache of the constant system-prompt prefix is
+        computed once and reused by every `compare_descriptions` call, so only the
+        new/existing descriptions are prefilled.
+        `max_batch_size` bounds the prompts per `compare_descriptions_batch` generate call.
+        """
         if quant == "4bit":
             bnb_cfg = BitsAndBytesConfig(
                 load_in_4bit=True,
@@ -81,20 +95,102 @@ class OrchestrationAgent:
 
         tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
 
-        gen_pipe = pipeline(
-            task="text-generation",
-            model=model,
-            tokenizer=tokenizer,
-            max_new_tokens=120,
-            temperature=0.7,
-            pad_token_id=tokenizer.eos_token_id,
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.reasoning_max_chars = reasoning_max_chars
+        eos = model.generation_config.eos_token_id
+        self.eos_token_ids = eos if isinstance(eos, list) else [eos]
+        self.token_table = TokenTable(tokenizer, model.get_output_embeddings().weight.shape[0]) if constrained else None
+        self.prefill = PrefixCacheStats("LLM")
+        self.max_batch_size = max_batch_size
+        self.prefix_ids = None
+        self.prefix_cache = None
+        if prefix_cache:
+            self._build_prefix_cache()
+
+    def _build_prefix_cache(self):
+        """Prefill the chat-template prefix shared by every matching prompt (system prompt + user header)."""
+        sentinel = "<<USER_CONTENT>>"
+        text = self.tokenizer.apply_chat_template(
+            [{"role": "system", "content": MATCHING_SYSTEM_PROMPT}, {"role": "user", "content": sentinel}],
+            tokenize=False, add_generation_prompt=True,
         )
+        prefix_text = text[:text.index(sentinel)]
+        prefix_ids = self.tokenizer(prefix_text, return_tensors="pt", add_special_tokens=False).input_ids
+        with torch.no_grad():
+            out = self.model(
+                input_ids=prefix_ids.to(self.model.device),
+                past_key_values=DynamicCache(),
+                use_cache=True,
+            )
+        self.prefix_ids = prefix_ids[0]
+        self.prefix_cache = out.past_key_values
+        print(f"[Timing] LLM prefix cache: {len(self.prefix_ids)} system-prompt tokens prefilled once")
 
-        # LangChain wrapper
-        self.tokenizer = tokenizer        # we’ll need it in compare_descriptions
-        self.llm = HuggingFacePipeline(pipeline=gen_pipe)
-        
-    def compare_descriptions(self, new_description, existing_descriptions):
+    def prefill_stats(self):
+        return self.prefill.stats()
+
+    def _prefix_cache_for(self, batch_size):
+        """The system-prompt cache expanded to `batch_size` rows (views, not copies)."""
+        return expand_cache(self.prefix_cache, batch_size)
+
+    def _generate(self, prompt_texts, row_candidate_ids=None):
+        """
+        Greedy replies (new tokens only) to a batch of prompts in one `generate`
+        call. When every prompt starts with the cached system-prompt prefix, the
+        rows are padded in the middle ([prefix][pad...][rest]) so they can all
+        start from the same prefix cache; otherwise they are left-padded.
+        `row_candidate_ids` (one ID list per prompt) enables the JSON constraint.
+        """
+        rows = [self.tokenizer(text, add_special_tokens=False).input_ids for text in prompt_texts]
+        length = max(len(ids) for ids in rows)
+        pad_id = self.tokenizer.eos_token_id
+        n_prefix = len(self.prefix_ids) if self.prefix_cache is not None else 0
+        use_prefix = n_prefix > 0 and all(
+            len(ids) > n_prefix and ids[:n_prefix] == self.prefix_ids.tolist() for ids in rows
+        )
+        split = n_prefix if use_prefix else 0
+
+        input_ids = torch.full((len(rows), length), pad_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(rows), length), dtype=torch.long)
+        for r, ids in enumerate(rows):
+            n_pad = length - len(ids)
+            input_ids[r, :split] = torch.tensor(ids[:split])
+            input_ids[r, split + n_pad:] = torch.tensor(ids[split:])
+            attention_mask[r, :split] = 1
+            attention_mask[r, split + n_pad:] = 1
+        input_ids = input_ids.to(self.model.device)
+        attention_mask = attention_mask.to(self.model.device)
+
+        kwargs = {}
+        if use_prefix:
+            kwargs["past_key_values"] = self._prefix_cache_for(len(rows))
+        self.prefill.record(sum(len(ids) for ids in rows), split * len(rows))
+
+        if self.token_table is not None and row_candidate_ids is not None:
+            constraint = MatchJsonConstraint(self.token_table, row_candidate_ids, length, self.eos_token_ids,
+                                             self.reasoning_max_chars, self.max_new_tokens)
+            kwargs["logits_processor"] = LogitsProcessorList([constraint])
+            kwargs["stopping_criteria"] = StoppingCriteriaList([StopOnCompleteJson(constraint)])
+
+        with torch.no_grad():
+            output_ids = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=attention_mask,
+                max_new_tokens=self.max_new_tokens,
+                do_sample=False,
+                temperature=None,
+                top_p=None,
+                top_k=None,
+                pad_token_id=pad_id,
+                **kwargs,
+            )
+        self.prefill.record_generated(int((output_ids[:, length:] != pad_id).sum()))
+        return [reply.strip() for reply in
+                self.tokenizer.batch_decode(output_ids[:, length:], skip_special_tokens=True)]
+
+    def _prompt_text(self, new_description, existing_descriptions):
         existing_text = "\n".join(
             [f"ID {gid}: {desc}" for gid, desc in existing_descriptions.items()]
         )
@@ -106,16 +202,13 @@ class OrchestrationAgent:
         ]
 
         # Convert to a single prompt string using Qwen’s chat template
-        prompt_text = self.tokenizer.apply_chat_template(
+        return self.tokenizer.apply_chat_template(
             messages, tokenize=False, add_generation_prompt=True
         )
 
-        response_text = self.llm.invoke(prompt_text)
-
-        # HuggingFacePipeline returns a str; strip off the leading prompt copy
-        reply = response_text.strip()
-
-        json_str = extract_json_from_reply(reply)
+    def _parse_reply(self, reply):
+        # Constrained replies are exactly the JSON object; unconstrained ones may wrap it in text
+        json_str = reply if self.token_table is not None else extract_json_from_reply(reply)
         if not json_str:
             return None, "error", f"LLM error: No JSON found in reply\nRaw response: {reply}"
 
@@ -130,3 +223,34 @@ class OrchestrationAgent:
             )
         except Exception as e:
             return None, "error", f"LLM error: {e}\nRaw response: {reply}"
+
+    def compare_descriptions(self, new_description, existing_descriptions):
+        prompt_text = self._prompt_text(new_description, existing_descriptions)
+        reply = self._generate([prompt_text], [list(existing_descriptions)])[0]
+        return self._parse_reply(reply)
+
+    def compare_descriptions_batch(self, new_descriptions, existing_descriptions):
+        """
+        Match several new descriptions with padded batched `generate` calls (at
+        most `max_batch_size` prompts each) instead of one call per person.
+        `existing_descriptions` is one gallery dict shared by all, or one dict per
+        new description (e.g. per-person shortlists). Returns a one-to-one list of
+        (matched_id, confidence, reasoning): if several people pick the same ID,
+        the most confident keeps it and the others are returned as unmatched.
+        """
+        galleries = (existing_descriptions if isinstance(existing_descriptions, (list, tuple))
+                     else [existing_descriptions] * len(new_descriptions))
+        return resolve_one_to_one(self.compare_descriptions_many(new_descriptions, galleries))
+
+    def compare_descriptions_many(self, new_descriptions, galleries):
+        """
+        Independent (matched_id, confidence, reasoning) per (new description,
+        gallery dict) pair, batched like `compare_descriptions_batch` but not made
+        one-to-one, so pairs from different frames or clients can share a batch.
+        """
+        prompts = [self._prompt_text(new, gallery) for new, gallery in zip(new_descriptions, galleries)]
+        replies = []
+        for start in range(0, len(prompts), self.max_batch_size):
+            stop = start + self.max_batch_size
+            replies.extend(self._generate(prompts[start:stop], [list(g) for g in galleries[start:stop]]))
+        return [self._parse_reply(reply) for reply in replies]
@@ -0,0 +1,123 @@
+# src/benchmark/harness.py
+
+import contextlib
+import os
+import resource
+import time
+import tracemalloc
+import numpy as np
+from src.benchmark.stubs import StubDetector, StubEmbedder, StubDescriptor, StubMatcher
+from src.pipeline.components import build_components
+from src.pipeline.graph import PIPELINE_STAGES, build_pipeline
+
+# Latency profiles (seconds per call, seconds per item) for each stub model
+ZERO_LATENCY = {"detector": (0.0, 0.0), "embedder": (0.0, 0.0), "descriptor": (0.0, 0.0), "matcher": (0.0, 0.0)}
+GPU_LATENCY = {"detector": (0.012, 0.0), "embedder": (0.004, 0.0005), "descriptor": (0.15, 0.02),
+               "matcher": (0.25, 0.05)}
+
+
+def build_stub_components(config, scene, latencies=ZERO_LATENCY):
+    """build_components with stub models: the real memory, caches and binding as configured."""
+    match_latency, match_per_item = latencies["matcher"]
+    return build_components(
+        config,
+        detector   = StubDetector(scene, *latencies["detector"]),
+        embedder   = StubEmbedder(512, *latencies["embedder"]),
+        descriptor = StubDescriptor(*latencies["descriptor"],
+                                    max_batch_size=getattr(config.description, "max_batch_size", 8)),
+        matcher    = StubMatcher(latency=match_latency, per_item=match_per_item,
+                                 max_batch_size=getattr(config.llm, "max_batch_size", 8)),
+    )
+
+
+def _timed(name, node, timings):
+    def run(state):
+        start = time.perf_counter()
+        state = node(state)
+        timings[name].append(time.perf_counter() - start)
+        return state
+    return run
+
+
+def _percentiles(seconds):
+    ms = np.asarray(seconds) * 1e3
+    if not len(ms):
+        return {}
+    return {
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def run_benchmark(config, scene, components, stages=PIPELINE_STAGES, warmup=5, trace_memory=False, quiet=True):
+    """
+    Run `pipeline.invoke` over every frame of `scene` with each node timed.
+    Returns frames/sec, per-node latency percentiles, the graph's own overhead
+    (invoke time not spent inside any node) and peak memory. `trace_memory`
+    adds the tracemalloc peak of Python/numpy allocations, at some cost in speed.
+    Node prints are discarded when `quiet`.
+    """
+    timings = {name: [] for name, _ in stages}
+    graph = build_pipeline([(name, _timed(name, node, timings)) for name, node in stages])
+    frame_times = []
+
+    with contextlib.ExitStack() as stack:
+        if quiet:
+            stack.enter_context(contextlib.redirect_stdout(stack.enter_context(open(os.devnull, "w"))))
+        if trace_memory:
+            tracemalloc.start()
+        start = time.perf_counter()
+        for frame_id, frame in scene.frames():
+            state = {
+                "config": config,
+                "frame_id": frame_id,
+                "frame": frame,
+                **components,
+                "detections": [],
+                "descriptions": [],
+                "embeddings": [],
+                "global_ids": [],
+                "output_frame": None,
+                "frame_matching_details": [],
+            }
+            frame_start = time.perf_counter()
+            graph.invoke(state)
+            frame_times.append(time.perf_counter() - frame_start)
+            if frame_id + 1 == warmup:
+                # Drop warm-up frames (first gallery entries, lazy imports, allocator growth)
+                start = time.perf_counter()
+                for values in timings.values():
+                    values.clear()
+                frame_times.clear()
+        wall = time.perf_counter() - start
+        traced_peak = tracemalloc.get_traced_memory()[1] if trace_memory else None
+        if trace_memory:
+            tracemalloc.stop()
+
+    node_total = np.sum([timings[name] for name, _ in stages], axis=0) if frame_times else np.zeros(0)
+    return {
+        "frames": len(frame_times),
+        "wall_s": round(wall, 3),
+        "fps": round(len(frame_times) / wall, 2) if wall else 0.0,
+        "frame": _percentiles(frame_times),
+        "nodes": {name: _percentiles(timings[name]) for name, _ in stages},
+        "graph_overhead": _percentiles(np.asarray(frame_times) - node_total),
+        "identities": components["memory"].get_memory_size(),
+        "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "traced_peak_mb": round(traced_peak / 2 ** 20, 1) if traced_peak is not None else None,
+    }
+
+
+def format_report(name, report):
+    lines = [f"[Bench] {name}: {report['frames']} frames, {report['fps']} fps, "
+             f"{report['identities']} identities, max RSS {report['max_rss_mb']} MB"
+             + (f", traced peak {report['traced_peak_mb']} MB" if report["traced_peak_mb"] is not None else "")]
+    rows = [("frame", report["frame"]), *report["nodes"].items(), ("graph overhead", report["graph_overhead"])]
+    for label, stats in rows:
+        if stats:
+            lines.append(f"  {label:<16} mean {stats['mean_ms']:>9.3f} ms | p50 {stats['p50_ms']:>9.3f} | "
+                         f"p90 {stats['p90_ms']:>9.3f} | p99 {stats['p99_ms']:>9.3f} | max {stats['max_ms']:>9.3f}")
+    return "\n".join(lines)
@@ -0,0 +1,138 @@
+# src/benchmark/stubs.py
+"""
+Deterministic stand-ins for the pipeline's models, with the same interfaces
+as UltralyticsByteTrack, ClipEmbedder, QwenEmbedder and OrchestrationAgent.
+Each call sleeps `latency + per_item * n` seconds, so a benchmark can model
+real model speed or (with zero latency) measure only the pipeline's own cost.
+Outputs depend only on the pixels of a crop, so runs are reproducible.
+"""
+
+import json
+import time
+import numpy as np
+from src.detection.detections import Detections
+from src.memory.attributes import ATTRIBUTE_FIELDS
+from src.memory.memory import resolve_one_to_one
+from src.pipeline.replay import OfflineMatcher
+from src.utils.prefix_cache import PrefixCacheStats
+
+
+def _wait(latency, per_item, n):
+    delay = latency + per_item * n
+    if delay > 0:
+        time.sleep(delay)
+
+
+def _colour_key(image):
+    """Median colour of the middle of a crop's lower half, quantised: stable per synthetic person."""
+    h, w = image.shape[:2]
+    body = image[h // 2 + h // 8:h - h // 8, w // 4:w - w // 4].reshape(-1, 3)
+    if not len(body):
+        body = image.reshape(-1, 3)
+    return tuple((np.median(body, axis=0) // 32).astype(int).tolist())
+
+
+def _seed(key):
+    return int(sum(v * 8 ** i for i, v in enumerate(key)))
+
+
+class StubDetector:
+    """
+    Reports the ground-truth boxes of a SyntheticScene. Like the real tracker it
+    is stateful: the n-th `track_frame` call returns the boxes of frame n.
+    """
+
+    def __init__(self, scene, latency=0.0, per_item=0.0):
+        self.scene = scene
+        self.latency = latency
+        self.per_item = per_item
+        self.model_path = f"stub-detector-{scene.n_people}"
+        self.frame_id = 0
+
+    def track_frame(self, frame):
+        boxes = self.scene.boxes(self.frame_id)
+        self.frame_id += 1
+        _wait(self.latency, self.per_item, len(boxes))
+        return Detections.from_records(frame, boxes)
+
+
+class StubEmbedder:
+    """Unit vectors seeded by a crop's dominant colour, so the same person embeds the same way."""
+
+    def __init__(self, dim=512, latency=0.0, per_item=0.0):
+        self.dim = dim
+        self.latency = latency
+        self.per_item = per_item
+        self.model_path = f"stub-embedder-{dim}"
+
+    def _vector(self, image):
+        vector = np.random.default_rng(_seed(_colour_key(image))).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+    def get_embedding(self, image, bgr=True):
+        _wait(self.latency, self.per_item, 1)
+        return self._vector(np.asarray(image))
+
+    def get_embeddings(self, crops, bgr=True):
+        _wait(self.latency, self.per_item, len(crops))
+        if len(crops) == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return np.stack([self._vector(np.asarray(crop)) for crop in crops])
+
+
+class StubDescriptor:
+    """Attribute JSON in the Qwen prompt's format, chosen from a crop's dominant colour."""
+
+    def __init__(self, latency=0.0, per_item=0.0, max_batch_size=8):
+        self.latency = latency
+        self.per_item = per_item
+        self.max_batch_size = max_batch_size
+        self.model_id = "stub-descriptor"
+        self.prefill = PrefixCacheStats("VLM")
+
+    def prefill_stats(self):
+        return self.prefill.stats()
+
+    def describe(self, pil_img, prompt=None, max_new_tokens=256):
+        return self.describe_batch([pil_img], prompt, max_new_tokens)[0]
+
+    def describe_batch(self, pil_imgs, prompt=None, max_new_tokens=256):
+        batch_size = self.max_batch_size or len(pil_imgs)
+        for start in range(0, len(pil_imgs), batch_size):
+            _wait(self.latency, self.per_item, len(pil_imgs[start:start + batch_size]))
+        return [self._describe(np.asarray(img)) for img in pil_imgs]
+
+    def _describe(self, image):
+        rng = np.random.default_rng(_seed(_colour_key(image)))
+        fields = {name: str(rng.choice(vocab)) for name, vocab, _ in ATTRIBUTE_FIELDS}
+        fields["clothes"] = f"{rng.choice(['black', 'white', 'red', 'blue', 'green', 'beige'])} shirt"
+        return json.dumps(fields)
+
+
+class StubMatcher(OfflineMatcher):
+    """OfflineMatcher with OrchestrationAgent's batch interface and a configurable latency per generate call."""
+
+    def __init__(self, threshold=0.75, latency=0.0, per_item=0.0, max_batch_size=8):
+        super().__init__(threshold)
+        self.latency = latency
+        self.per_item = per_item
+        self.max_batch_size = max_batch_size
+        self.prefill = PrefixCacheStats("LLM")
+
+    def prefill_stats(self):
+        return self.prefill.stats()
+
+    def compare_descriptions(self, new_description, existing_descriptions):
+        _wait(self.latency, self.per_item, 1)
+        return super().compare_descriptions(new_description, existing_descriptions)
+
+    def compare_descriptions_batch(self, new_descriptions, existing_descriptions):
+        galleries = (existing_descriptions if isinstance(existing_descriptions, (list, tuple))
+                     else [existing_descriptions] * len(new_descriptions))
+        return resolve_one_to_one(self.compare_descriptions_many(new_descriptions, galleries))
+
+    def compare_descriptions_many(self, new_descriptions, galleries):
+        for start in range(0, len(new_descriptions), self.max_batch_size):
+            _wait(self.latency, self.per_item, len(new_descriptions[start:start + self.max_batch_size]))
+        return [super(StubMatcher, self).compare_descriptions(new, gallery)
+                for new, gallery in zip(new_descriptions, galleries)]
@@ -0,0 +1,114 @@
+# src/detection/detections.py
+
+from collections.abc import Mapping
+import numpy as np
+
+NO_TRACK = -1  # track_ids entry of a box the tracker has not assigned yet
+
+
+class Detection(Mapping):
+    """
+    One row of a Detections, read like the old per-person dict:
+    det["track_id"], det["bbox"], det["confidence"], det["crop"] (a lazy view).
+    """
+
+    __slots__ = ("parent", "index")
+    KEYS = ("track_id", "bbox", "confidence", "crop")
+
+    def __init__(self, parent, index):
+        self.parent = parent
+        self.index = index
+
+    def __getitem__(self, key):
+        parent, i = self.parent, self.index
+        if key == "track_id":
+            track_id = int(parent.track_ids[i])
+            return track_id if track_id != NO_TRACK else None
+        if key == "bbox":
+            return parent.xyxy[i].tolist()
+        if key == "confidence":
+            return float(parent.confidences[i])
+        if key == "crop":
+            return parent.crop(i)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self.KEYS)
+
+    def __len__(self):
+        return len(self.KEYS)
+
+    def __repr__(self):
+        return f"Detection(track_id={self['track_id']}, bbox={self['bbox']}, confidence={self['confidence']:.3f})"
+
+
+class Detections:
+    """
+    A frame's detections as parallel arrays: xyxy (N, 4) int32, confidences
+    (N,) float32 and track_ids (N,) int64 (NO_TRACK when untracked), plus the
+    frame they came from so crops are cut as views only when asked for.
+
+    Iterating or indexing with an int gives Detection rows that read like the
+    old list of dicts; indexing with a boolean mask or index array gives a
+    filtered Detections without touching any row.
+    """
+
+    def __init__(self, frame, xyxy, confidences, track_ids=None):
+        self.frame = frame
+        self.xyxy = np.asarray(xyxy, dtype=np.int32).reshape(-1, 4)
+        self.confidences = np.asarray(confidences, dtype=np.float32).reshape(-1)
+        self.track_ids = (np.full(len(self.xyxy), NO_TRACK, dtype=np.int64) if track_ids is None
+                          else np.asarray(track_ids, dtype=np.int64).reshape(-1))
+
+    @classmethod
+    def from_boxes(cls, frame, boxes, classes=(0,), min_confidence=0.0):
+        """
+        Build from an ultralytics Boxes with one device->host transfer
+        (`boxes.data`: x1, y1, x2, y2, [track id,] conf, cls per row), keeping
+        rows of `classes` with confidence >= `min_confidence`.
+        """
+        if boxes is None or len(boxes) == 0:
+            return cls.empty(frame)
+        data = boxes.data.cpu().numpy()
+        keep = data[:, -2] >= min_confidence
+        if classes is not None:
+            keep &= np.isin(data[:, -1].astype(np.int64), classes)
+        data = data[keep]
+        track_ids = data[:, 4] if boxes.is_track else None
+        return cls(frame, data[:, :4], data[:, -2], track_ids)
+
+    @classmethod
+    def from_records(cls, frame, records):
+        """Build from (track_id, bbox, confidence) tuples, as stored by `records`."""
+        if not records:
+            return cls.empty(frame)
+        track_ids, bboxes, confidences = zip(*records)
+        return cls(frame, bboxes, confidences, [NO_TRACK if t is None else t for t in track_ids])
+
+    @classmethod
+    def empty(cls, frame=None):
+        return cls(frame, np.zeros((0, 4)), np.zeros(0), np.zeros(0))
+
+    def __len__(self):
+        return len(self.xyxy)
+
+    def __iter__(self):
+        return (Detection(self, i) for i in range(len(self)))
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Detection(self, int(index) % len(self) if index < 0 else int(index))
+        return Detections(self.frame, self.xyxy[index], self.confidences[index], self.track_ids[index])
+
+    def crop(self, i):
+        """View of box `i` clamped to the frame, or None when it is empty or there is no frame."""
+        if self.frame is None:
+            return None
+        x1, y1, x2, y2 = self.xyxy[i].tolist()
+        x1, y1 = max(x1, 0), max(y1, 0)
+        return self.frame[y1:y2, x1:x2] if x2 > x1 and y2 > y1 else None
+
+    def records(self):
+        """[(track_id, bbox, confidence)] for caches and logs."""
+        return [(None if t == NO_TRACK else t, bbox, conf) for t, bbox, conf in
+                zip(self.track_ids.tolist(), self.xyxy.tolist(), self.confidences.tolist())]
@@ -1,48 +1,112 @@
 # tracker/detector_tracker.py
 
+import numpy as np
+import yaml
 from ultralytics import YOLO
-import os
+from ultralytics.trackers.byte_tracker import BYTETracker
+from ultralytics.utils import IterableSimpleNamespace
+from src.detection.detections import Detections
 
 class UltralyticsByteTrack:
-    def __init__(self, model_path="yolov8m.pt", tracker_cfg="config/bytetrack.yaml", persist=True, device="cuda"):
+    def __init__(self, model_path="yolov8m.pt", tracker_cfg="config/bytetrack.yaml", persist=True, device="cuda",
+                 classes=(0,), min_confidence=0.0, batch_size=8, imgsz=640, half_resolution=False):
+        """
+        `track_frame` tracks one frame with ultralytics' `model.track`.
+        `track_frames` runs one YOLO forward pass over up to `batch_size`
+        frames (at `imgsz`, or imgsz/2 with `half_resolution`) and then updates
+        its own ByteTrack (configured by `tracker_cfg`) frame by frame, so track
+        IDs follow the same rules. The two keep separate tracker state: use one
+        or the other for a video. Both keep YOLO boxes down to the tracker cfg's
+        `track_low_thresh`, which ByteTrack's second association pass needs.
+        """
         self.model = YOLO(model_path)
+        self.model_path = model_path
         self.tracker_cfg = tracker_cfg
         self.persist = persist
         self.device = device
-        self.model.to(self.device)
+        self.classes = classes
+        self.min_confidence = min_confidence
+        self.batch_size = batch_size
+        self.imgsz = imgsz // 2 if half_resolution else imgsz
+        self.tracker = None  # BYTETracker of track_frames, created on first use
+        self.detect_conf = getattr(self._tracker_args(), "track_low_thresh", 0.1)
+        if device is not None:
+            self.model.to(self.device)
 
     def track_frame(self, frame):
         """
         Runs detection and tracking on a single frame.
-        Returns a list of dicts, one per person:
+        Returns a Detections (struct-of-arrays: xyxy, confidences, track_ids);
+        iterating it yields one dict-like row per person:
         {
-            "track_id": int,
+            "track_id": int or None,
             "bbox": [x1, y1, x2, y2],
             "confidence": float,
-            "crop": person_img (numpy array)
+            "crop": person_img (numpy array, a view into `frame`, cut on access)
         }
+        Boxes of other classes or below `min_confidence` are dropped on the array.
         """
         results = self.model.track(
             frame,
             persist=self.persist,
             tracker=self.tracker_cfg,
-            classes=0,  # only person
+            classes=list(self.classes),  # only person by default
+            conf=self.detect_conf,
             verbose=False,
             device=self.device
         )
+        boxes = results[0].boxes if results else None
+        # One device->host copy of all boxes instead of several tiny ones per person
+        return Detections.from_boxes(frame, boxes, self.classes, self.min_confidence)
+
+    def track_frames(self, frames):
+        """
+        Detect and track a list of consecutive frames: YOLO runs on chunks of
+        `batch_size` frames per forward pass, then each frame's boxes go through
+        the ByteTrack update in order. Returns one Detections per frame.
+        """
+        if self.tracker is None or not self.persist:
+            self.tracker = self._build_tracker()
         output = []
-        if results and results[0].boxes is not None:
-            boxes = results[0].boxes
-            for i in range(len(boxes)):
-                box = boxes[i]
-                x1, y1, x2, y2 = map(int, box.xyxy[0].tolist())
-                track_id = int(box.id[0]) if box.id is not None else None
-                conf = float(box.conf[0])
-                crop = frame[y1:y2, x1:x2].copy() if x2 > x1 and y2 > y1 else None
-                output.append({
-                    "track_id": track_id,
-                    "bbox": [x1, y1, x2, y2],
-                    "confidence": conf,
-                    "crop": crop
-                })
+        for start in range(0, len(frames), self.batch_size):
+            chunk = frames[start:start + self.batch_size]
+            results = self.model.predict(
+                chunk,
+                classes=list(self.classes),
+                conf=self.detect_conf,  # predict's own default (0.25) would hide the low-score boxes from ByteTrack
+                imgsz=self.imgsz,
+                verbose=False,
+                device=self.device,
+            )
+            for frame, result in zip(chunk, results):
+                boxes = result.boxes.cpu().numpy()  # one device->host copy per frame
+                tracks = self.tracker.update(boxes, frame)
+                output.append(self._tracked(frame, tracks, boxes))
         return output
+
+    def reset(self):
+        """Forget the tracks of `track_frames`, e.g. before a new video."""
+        self.tracker = None
+
+    def _tracker_args(self):
+        with open(self.tracker_cfg, "r") as f:
+            return IterableSimpleNamespace(**yaml.safe_load(f))
+
+    def _build_tracker(self):
+        return BYTETracker(args=self._tracker_args())  # built like model.track builds its own
+
+    def _tracked(self, frame, tracks, boxes):
+        # Same output as model.track: without tracks the detections stay, untracked,
+        # unless new tracks wait for confirmation; track boxes are clipped to the frame
+        if len(tracks) == 0:
+            if any(not t.is_activated for t in self.tracker.tracked_stracks):
+                return Detections.empty(frame)
+            return Detections.from_boxes(frame, boxes, self.classes, self.min_confidence)
+        # BYTETracker rows: x1, y1, x2, y2, track id, score, cls, index into the detections
+        keep = tracks[:, 5] >= self.min_confidence
+        if self.classes is not None:
+            keep &= np.isin(tracks[:, 6].astype(np.int64), self.classes)
+        tracks = tracks[keep]
+        h, w = frame.shape[:2]
+        xyxy = np.clip(tracks[:, :4], 0, [w, h, w, h])
+        return Detections(frame, xyxy, tracks[:, 5], tracks[:, 4])
@@ -0,0 +1,124 @@
+# src/detection/quality.py
+
+import cv2
+import numpy as np
+
+
+def box_iou_matrix(boxes):
+    """Pairwise IoU of (N, 4) xyxy boxes, with zeros on the diagonal."""
+    x1, y1, x2, y2 = boxes.T
+    area = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    iw = np.clip(np.minimum(x2[:, None], x2) - np.maximum(x1[:, None], x1), 0, None)
+    ih = np.clip(np.minimum(y2[:, None], y2) - np.maximum(y1[:, None], y1), 0, None)
+    inter = iw * ih
+    iou = inter / np.maximum(area[:, None] + area - inter, 1e-9)
+    np.fill_diagonal(iou, 0.0)
+    return iou
+
+
+def laplacian_variance(gray, boxes):
+    """
+    Variance of the Laplacian inside every box, from two integral images, so
+    the cost is one Laplacian per frame instead of one per crop.
+    """
+    lap = cv2.Laplacian(gray, cv2.CV_64F)
+    s, sq = cv2.integral2(lap)
+    x1, y1, x2, y2 = boxes.astype(np.int64).T
+    n = np.maximum((x2 - x1) * (y2 - y1), 1)
+
+    def box_sum(table):
+        return table[y2, x2] - table[y1, x2] - table[y2, x1] + table[y1, x1]
+
+    mean = box_sum(s) / n
+    return np.maximum(box_sum(sq) / n - mean ** 2, 0.0)
+
+
+def score_detections(frame, bboxes, confidences, reference_height=256, aspect_ratio=2.5,
+                     blur_reference=100.0, edge_margin=2):
+    """
+    Cheap crop-quality score in [0, 1] for every detection of a frame, as the
+    product of: box size (height relative to `reference_height`), aspect ratio
+    (closeness to a standing person's h/w), sharpness (Laplacian variance
+    relative to `blur_reference`), truncation at the frame edge, detector
+    confidence, and occlusion (1 - max IoU with any other box).
+    Returns (quality, components) with components a dict of (N,) arrays.
+    """
+    boxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    conf = np.asarray(confidences, dtype=np.float64).reshape(-1)
+    if len(boxes) == 0:
+        return np.zeros(0), {}
+
+    h, w = frame.shape[:2]
+    boxes[:, [0, 2]] = np.clip(boxes[:, [0, 2]], 0, w)
+    boxes[:, [1, 3]] = np.clip(boxes[:, [1, 3]], 0, h)
+    bw = np.maximum(boxes[:, 2] - boxes[:, 0], 1.0)
+    bh = np.maximum(boxes[:, 3] - boxes[:, 1], 1.0)
+
+    size = np.clip(bh / reference_height, 0.0, 1.0)
+    aspect = np.exp(-0.5 * (np.log(bh / bw) - np.log(aspect_ratio)) ** 2 / 0.5 ** 2)
+
+    touching = ((boxes[:, 0] <= edge_margin).astype(int) + (boxes[:, 1] <= edge_margin)
+                + (boxes[:, 2] >= w - edge_margin) + (boxes[:, 3] >= h - edge_margin))
+    truncation = 1.0 - 0.25 * touching
+
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    sharpness = np.clip(laplacian_variance(gray, boxes) / blur_reference, 0.0, 1.0)
+
+    occlusion = 1.0 - box_iou_matrix(boxes).max(axis=1) if len(boxes) > 1 else np.ones(1)
+
+    components = {
+        "size": size,
+        "aspect": aspect,
+        "sharpness": sharpness,
+        "truncation": truncation,
+        "confidence": conf,
+        "occlusion": occlusion,
+    }
+    quality = size * aspect * sharpness * truncation * conf * occlusion
+    return quality, components
+
+
+class BestShotBuffer:
+    """
+    Collects crops of each track over a window of `window` frames and releases
+    only the highest-quality one for VLM description. Tracks that stop
+    offering crops for `max_age` frames are dropped. Crops below
+    `min_quality` are not used to refresh a track that is already described.
+    """
+
+    def __init__(self, window=8, min_quality=0.2, max_age=30):
+        self.window = window
+        self.min_quality = min_quality
+        self.max_age = max_age
+        self.slots = {}  # {track_id: {"start", "last_seen", "quality", "crop", "signature", "source"}}
+
+    def offer(self, track_id, frame_id, quality, crop, signature=None, source=None):
+        """
+        Consider `crop` as the best shot of `track_id` in its current window.
+        `source` is returned with the crop, e.g. the (frame_id, bbox) it was cut from.
+        """
+        self._expire(frame_id)
+        slot = self.slots.get(track_id)
+        if slot is None:
+            slot = {"start": frame_id, "last_seen": frame_id, "quality": -1.0, "crop": None, "signature": None,
+                    "source": None}
+            self.slots[track_id] = slot
+        slot["last_seen"] = frame_id
+        if quality > slot["quality"]:
+            slot["quality"] = quality
+            slot["crop"] = crop.copy() if crop is not None else None  # crops are views; don't pin the frame
+            slot["signature"] = signature
+            slot["source"] = source
+
+    def pop_ready(self, track_id, frame_id):
+        """Return (crop, quality, signature, source) once the track's window has closed, else None."""
+        slot = self.slots.get(track_id)
+        if slot is None or frame_id - slot["start"] + 1 < self.window:
+            return None
+        del self.slots[track_id]
+        return slot["crop"], slot["quality"], slot["signature"], slot["source"]
+
+    def _expire(self, frame_id):
+        stale = [tid for tid, slot in self.slots.items() if frame_id - slot["last_seen"] > self.max_age]
+        for tid in stale:
+            del self.slots[tid]
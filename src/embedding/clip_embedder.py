@@ -1,6 +1,7 @@
 # src/embedding/clip_embedder.py
 
 import torch
+import torch.nn.functional as F
 from transformers import CLIPProcessor, CLIPModel
 from PIL import Image
 import numpy as np
@@ -8,15 +9,74 @@ import numpy as np
 class ClipEmbedder:
     def __init__(self, model_path, device="cuda"):
         self.device = device
+        self.model_path = model_path
         self.model = CLIPModel.from_pretrained(model_path).to(device)
         self.processor = CLIPProcessor.from_pretrained(model_path)
 
-    def get_embedding(self, image):
-        # Ensure image is a PIL Image
-        if isinstance(image, np.ndarray):
-            image = Image.fromarray(image)
-        inputs = self.processor(images=image, return_tensors="pt").to(self.device)
+        # Preprocessing constants for the batched torch path (mirrors CLIPImageProcessor)
+        image_processor = self.processor.image_processor
+        self.resize_size = image_processor.size["shortest_edge"]
+        self.crop_size = image_processor.crop_size["height"]
+        self.mean = torch.tensor(image_processor.image_mean, device=device).view(1, 3, 1, 1)
+        self.std = torch.tensor(image_processor.image_std, device=device).view(1, 3, 1, 1)
+
+    def get_embedding(self, image, bgr=True):
+        """Embed one crop (BGR array as handed out by the detector when `bgr`, or a PIL image)."""
+        return self.get_embeddings([image], bgr)[0]
+
+    def get_embeddings(self, crops, bgr=True):
+        """
+        Embed a list of crops in a single forward pass.
+        Crops are HxWx3 uint8 arrays (BGR when `bgr=True`, as handed out by the
+        detector) or PIL images; resizing, center cropping and normalisation run
+        as torch ops on `self.device`. Returns an (N, D) float32 array of
+        L2-normalised embeddings.
+        """
+        if len(crops) == 0:
+            return np.zeros((0, self.model.config.projection_dim), dtype=np.float32)
+
+        return self._embed(torch.cat([self._preprocess(crop, bgr) for crop in crops]))
+
+    def get_embeddings_from_frame(self, frame_buffer, bboxes):
+        """
+        Embed the boxes of one frame: the frame is uploaded once (FrameBuffer.tensor)
+        and every box is cut, resized and normalised on `self.device`, so no crop
+        is copied on the host. Every box must overlap the frame.
+        """
+        if len(bboxes) == 0:
+            return np.zeros((0, self.model.config.projection_dim), dtype=np.float32)
+        frame = frame_buffer.tensor(self.device)
+        boxes = [frame_buffer.clip(bbox) for bbox in bboxes]
+        return self._embed(torch.cat([self._resize_normalize(frame[:, y1:y2, x1:x2].unsqueeze(0).float())
+                                      for x1, y1, x2, y2 in boxes]))
+
+    def _embed(self, pixel_values):
         with torch.no_grad():
-            outputs = self.model.get_image_features(**inputs)
+            outputs = self.model.get_image_features(pixel_values=pixel_values)
             outputs = outputs / outputs.norm(dim=-1, keepdim=True)
-        return outputs.cpu().numpy().flatten()
\ No newline at end of file
+        return outputs.float().cpu().numpy()
+
+    def _preprocess(self, image, bgr):
+        """Resize shortest edge, center crop and normalise one crop into a (1, 3, S, S) tensor."""
+        if isinstance(image, Image.Image):
+            image = np.asarray(image.convert("RGB"))
+            bgr = False
+        tensor = torch.from_numpy(np.ascontiguousarray(image)).to(self.device)
+        tensor = tensor.permute(2, 0, 1).unsqueeze(0).float()
+        if bgr:
+            tensor = tensor.flip(1)
+        return self._resize_normalize(tensor)
+
+    def _resize_normalize(self, tensor):
+        """(1, 3, H, W) float RGB in [0, 255] -> resized, center-cropped, normalised (1, 3, S, S)."""
+        h, w = tensor.shape[-2:]
+        scale = self.resize_size / min(h, w)
+        new_h = max(self.crop_size, round(h * scale))
+        new_w = max(self.crop_size, round(w * scale))
+        tensor = F.interpolate(tensor, size=(new_h, new_w), mode="bicubic",
+                               align_corners=False, antialias=True).clamp_(0, 255)
+
+        top = (new_h - self.crop_size) // 2
+        left = (new_w - self.crop_size) // 2
+        tensor = tensor[..., top:top + self.crop_size, left:left + self.crop_size]
+        return (tensor / 255.0 - self.mean) / self.std
@@ -1,6 +1,7 @@
 import torch
-from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor
+from transformers import Qwen2_5_VLForConditionalGeneration, AutoProcessor, DynamicCache
 from qwen_vl_utils import process_vision_info
+from src.utils.prefix_cache import PrefixCacheStats, prefix_matches, expand_cache
 
 prompt = """
 You are a vision-language assistant. You will be shown an image of a person and asked to fill in attributes.  
@@ -43,10 +44,21 @@ Output *exactly* in this JSON form:
 class QwenEmbedder:
     def __init__(self, model_id = "Qwen/Qwen2.5-VL-3B-Instruct",
                  torch_dtype = torch.bfloat16, attn_implementation="flash_attention_2",
-                 device_map = "cuda"):
+                 device_map = "cuda", max_batch_size=8, resized_width=224, resized_height=448,
+                 prefix_cache=False):
         """
         Vision-language embedder using Qwen2.5-VL-3B-Instruct.
         Requires `pip install qwen-vl-utils[decord]` and recent `transformers`.
+
+        Crops are resized to a fixed `resized_width` x `resized_height` pixel budget
+        (multiples of 28) so every crop yields the same number of vision tokens and a
+        batch of crops can be generated together; set either to None to keep the
+        native crop size. `max_batch_size` bounds the crops per `generate` call.
+
+        With `prefix_cache` the attribute prompt is placed before the image, so the
+        KV cache of the text prefix is prefilled once and reused by every crop and
+        only the image tokens are prefilled per call (greedy decoding). It needs a
+        fixed resize so every prompt in a batch has the same length.
         """
         # Load the multimodal VL model
         self.model = Qwen2_5_VLForConditionalGeneration.from_pretrained(
@@ -57,48 +69,151 @@ class QwenEmbedder:
         )
         # Processor handles tokenization (via its built‑in tokenizer), decoding, and vision preprocessing; no separate tokenizer needed
         self.processor = AutoProcessor.from_pretrained(model_id)
+        # Decoder-only generation needs left padding so every prompt ends at the same position
+        self.processor.tokenizer.padding_side = "left"
         self.device=device_map
+        self.model_id = model_id
+        self.max_batch_size = max_batch_size
+        self.resized_width = resized_width
+        self.resized_height = resized_height
+        self.prefix_cache = prefix_cache and bool(resized_width and resized_height)
+        if prefix_cache and not self.prefix_cache:
+            print("[QwenEmbedder] prefix_cache needs resized_width/resized_height; disabled")
+        self.prefill = PrefixCacheStats("VLM")
+        self._prefix_caches = {}  # {prompt: [prefix_ids, single-row cache or None]}
 
-    def describe(self, pil_img, prompt=prompt, max_new_tokens=256):
-        """
-        Describe a single PIL image given a text prompt.
-        """
-        messages = [
+    def _build_messages(self, pil_img, prompt):
+        image = {"type": "image", "image": pil_img}
+        if self.resized_width and self.resized_height:
+            image["resized_width"] = self.resized_width
+            image["resized_height"] = self.resized_height
+        text = {"type": "text", "text": prompt}
+        return [
             {
                 "role": "user",
-                "content": [
-                    {
-                        "type": "image",
-                        "image": pil_img,
-                    },
-                    {"type": "text", "text": prompt},
-                ],
+                # The prompt goes first when its prefix KV cache is reused
+                "content": [text, image] if self.prefix_cache else [image, text],
             }
         ]
-        # Prepare vision inputs
-        image_inputs, video_inputs = process_vision_info(messages)
 
-        text = self.processor.apply_chat_template(
-            messages,
-            add_generation_prompt=True,
-            tokenize=False,
-        )
+    def prefill_stats(self):
+        return self.prefill.stats()
+
+    def describe(self, pil_img, prompt=prompt, max_new_tokens=256):
+        """
+        Describe a single PIL image given a text prompt.
+        """
+        return self.describe_batch([pil_img], prompt, max_new_tokens)[0]
+
+
+    def describe_batch(self, pil_imgs, prompt=prompt, max_new_tokens=256):
+        """
+        Describe a batch of PIL images with the same prompt, running one padded
+        `generate` call per chunk of `max_batch_size` images.
+        """
+        answers = []
+        batch_size = self.max_batch_size or len(pil_imgs)
+        for start in range(0, len(pil_imgs), batch_size):
+            answers.extend(self._generate_batch(pil_imgs[start:start + batch_size], prompt, max_new_tokens))
+        return answers
+
+    def _generate_batch(self, pil_imgs, prompt, max_new_tokens):
+        conversations = [self._build_messages(img, prompt) for img in pil_imgs]
+        # Prepare vision inputs for the whole batch at once
+        image_inputs, video_inputs = process_vision_info(conversations)
+
+        texts = [
+            self.processor.apply_chat_template(messages, add_generation_prompt=True, tokenize=False)
+            for messages in conversations
+        ]
 
         inputs = self.processor(
-            text=[text],
+            text=texts,
             images=image_inputs,
             videos=video_inputs,
             padding=True,
             return_tensors="pt",
         ).to(self.device)
 
-        output_ids = self.model.generate(**inputs, max_new_tokens=max_new_tokens)
-        answer = self.processor.batch_decode(output_ids, skip_special_tokens=True)[0]
-        return answer.strip()
+        if self.prefix_cache and inputs.attention_mask.all():
+            prefix = self._prefix_for(prompt, texts[0])
+            if prefix_matches(inputs.input_ids, prefix[0]):
+                return self._generate_from_prefix(inputs, prefix, max_new_tokens)
 
+        self.prefill.record(int(inputs.attention_mask.sum()), 0)
+        with torch.no_grad():
+            output_ids = self.model.generate(**inputs, max_new_tokens=max_new_tokens)
+        # With left padding all prompts end at the same column; keep only the new tokens
+        new_ids = output_ids[:, inputs.input_ids.shape[1]:]
+        self.prefill.record_generated(int((new_ids != self.processor.tokenizer.pad_token_id).sum()))
+        answers = self.processor.batch_decode(new_ids, skip_special_tokens=True)
+        return [answer.strip() for answer in answers]
 
-    def describe_batch(self, pil_imgs, prompt=prompt, max_new_tokens=256):
+    def _prefix_for(self, prompt, text):
+        """[token ids of the text before the image in `text`, its single-row KV cache (None until prefilled)]."""
+        if prompt not in self._prefix_caches:
+            prefix_text = text[:text.index("<|vision_start|>")]
+            prefix_ids = self.processor.tokenizer(prefix_text, return_tensors="pt", add_special_tokens=False).input_ids[0]
+            self._prefix_caches[prompt] = [prefix_ids, None]
+        return self._prefix_caches[prompt]
+
+    def _generate_from_prefix(self, inputs, prefix, max_new_tokens):
         """
-        Describe a batch of PIL images with the same prompt.
+        Greedy decoding that starts from the cached prompt prefix. `generate` cannot
+        be used here: it drops `pixel_values` once the cache is non-empty, so the
+        image tokens are prefilled by hand with their 3-D (M-RoPE) position ids.
         """
-        return [self.describe(img, prompt, max_new_tokens) for img in pil_imgs]
+        model = self.model
+        input_ids = inputs.input_ids
+        batch_size, length = input_ids.shape
+        prefix_ids = prefix[0]
+        n_prefix = len(prefix_ids)
+        device = input_ids.device
+
+        with torch.no_grad():
+            if prefix[1] is None:
+                # A text-only prefix has plain sequential positions, the same as inside the full prompt
+                out = model(input_ids=prefix_ids.to(device)[None], past_key_values=DynamicCache(), use_cache=True)
+                prefix[1] = out.past_key_values
+            cache = expand_cache(prefix[1], batch_size)
+            self.prefill.record(batch_size * length, batch_size * n_prefix)
+
+            get_rope_index = getattr(model, "get_rope_index", None) or model.model.get_rope_index
+            position_ids, rope_deltas = get_rope_index(input_ids, inputs.image_grid_thw, None, inputs.attention_mask)
+            out = model(
+                input_ids=input_ids[:, n_prefix:],
+                pixel_values=inputs.pixel_values,
+                image_grid_thw=inputs.image_grid_thw,
+                position_ids=position_ids[:, :, n_prefix:],
+                past_key_values=cache,
+                cache_position=torch.arange(n_prefix, length, device=device),
+                use_cache=True,
+            )
+
+            eos_ids = model.generation_config.eos_token_id
+            eos_ids = torch.tensor(eos_ids if isinstance(eos_ids, list) else [eos_ids], device=device)
+            pad_id = self.processor.tokenizer.pad_token_id
+            finished = torch.zeros(batch_size, dtype=torch.bool, device=device)
+            generated = []
+            position = length
+            for _ in range(max_new_tokens):
+                next_tokens = out.logits[:, -1, :].argmax(dim=-1)
+                next_tokens = torch.where(finished, torch.full_like(next_tokens, pad_id), next_tokens)
+                generated.append(next_tokens)
+                finished |= torch.isin(next_tokens, eos_ids)
+                if finished.all():
+                    break
+                step_positions = (rope_deltas.to(device) + position).view(1, batch_size, 1).expand(3, -1, -1)
+                out = model(
+                    input_ids=next_tokens[:, None],
+                    position_ids=step_positions,
+                    past_key_values=out.past_key_values,
+                    cache_position=torch.tensor([position], device=device),
+                    use_cache=True,
+                )
+                position += 1
+
+        generated = torch.stack(generated, dim=1)
+        self.prefill.record_generated(int((generated != pad_id).sum()))
+        answers = self.processor.batch_decode(generated, skip_special_tokens=True)
+        return [answer.strip() for answer in answers]
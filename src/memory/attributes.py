@@ -0,0 +1,232 @@
+# src/memory/attributes.py
+
+import re
+from collections import namedtuple
+import numpy as np
+
+UNKNOWN = -1  # "unknown" / "not_visible" / unparseable: acts as a wildcard
+
+# (field, vocabulary, rubric weight) in the order of the Qwen attribute prompt.
+# Weights follow MATCHING_SYSTEM_PROMPT: core physical 3, semi-permanent 2, clothing 1.
+ATTRIBUTE_FIELDS = [
+    ("gender", ["male", "female"], 3.0),
+    ("age_group", ["baby", "child", "teen", "adult", "senior"], 3.0),
+    ("hair_color", ["black", "brown", "brunette", "blonde", "red", "gray", "other"], 3.0),
+    ("hair_tone", ["jet", "ebony", "ash", "chocolate", "chestnut", "auburn", "honey", "golden",
+                   "copper", "platinum", "other"], 3.0),
+    ("hair_length", ["bald", "buzzcut", "very_short", "short", "ear_length", "chin_length",
+                     "shoulder_length", "medium", "long"], 3.0),
+    ("eyebrow_shape", ["very_thin", "thin", "thick", "arched", "straight"], 3.0),
+    ("jawline", ["angular", "square", "rounded", "soft", "other"], 3.0),
+    ("face_shape", ["oval", "square", "heart", "round"], 3.0),
+    ("hair_style", ["straight", "wavy", "curly", "braided", "ponytail", "bun", "updo", "half_up",
+                    "other"], 3.0),
+    ("facial_hair", ["none", "mustache", "beard", "goatee", "stubble", "moustache_and_beard",
+                     "other"], 2.0),
+    ("eyewear", ["none", "prescription_glasses", "sunglasses", "other"], 2.0),
+    ("skin_tone", ["very_fair", "fair", "light", "medium", "olive", "tan", "brown", "dark", "other"], 3.0),
+    ("body_type", ["underweight", "slim", "average", "athletic", "overweight", "obese", "other"], 3.0),
+    ("distinctive_marks", ["none", "present"], 3.0),
+    ("bag", ["none", "handbag", "backpack", "shoulder_bag", "tote", "purse", "other"], 1.0),
+    ("gloves", ["none", "gloves", "fingerless_gloves", "other"], 1.0),
+    ("footwear", ["none", "sneakers", "boots", "sandals", "heels", "flats", "loafers", "other"], 1.0),
+    ("headwear", ["none", "hat", "cap", "beanie", "hood", "helmet", "other"], 1.0),
+    ("accessories", ["none", "present"], 1.0),
+]
+FIELD_NAMES = [name for name, _, _ in ATTRIBUTE_FIELDS]
+FIELD_WEIGHTS = np.array([weight for _, _, weight in ATTRIBUTE_FIELDS], dtype=np.float32)
+_VOCAB_CODES = [{value: code for code, value in enumerate(vocab)} for _, vocab, _ in ATTRIBUTE_FIELDS]
+
+# Free-text `clothes` is reduced to the set of colour words it mentions, as a bitmask
+CLOTHES_COLORS = ["black", "white", "gray", "red", "blue", "navy", "green", "yellow", "orange",
+                  "purple", "pink", "brown", "beige", "tan", "gold", "silver", "maroon", "olive"]
+CLOTHES_WEIGHT = 1.0
+_COLOR_BITS = {color: 1 << i for i, color in enumerate(CLOTHES_COLORS)}
+_COLOR_BITS["grey"] = _COLOR_BITS["gray"]
+
+_SYNONYMS = {"moustache": "mustache", "glasses": "prescription_glasses", "blond": "blonde",
+             "grey": "gray", "not_visible": "unknown", "n/a": "unknown", "": "unknown"}
+_PAIR_RE = re.compile(r'"(\w+)"\s*:\s*"([^"]*)"')
+
+AttributeRecord = namedtuple("AttributeRecord", ["codes", "colors"])  # int8 (F,), int clothes-colour bitmask
+
+
+def _normalize_value(raw):
+    # "sneakers;black" / "none; not visible" -> first component, snake_case
+    value = raw.split(";")[0].strip().lower().strip(".,")
+    value = re.sub(r"[\s\-]+", "_", value)
+    return _SYNONYMS.get(value, value)
+
+
+def parse_description(description):
+    """
+    Parse a Qwen attribute JSON string into an AttributeRecord, or None when no
+    attribute could be read. Tolerates the small JSON slips the VLM makes by
+    scraping "key": "value" pairs instead of requiring valid JSON.
+    """
+    if not description:
+        return None
+    pairs = {key: value for key, value in _PAIR_RE.findall(description)}
+    if not pairs:
+        return None
+
+    codes = np.full(len(ATTRIBUTE_FIELDS), UNKNOWN, dtype=np.int8)
+    for f, (name, vocab, _) in enumerate(ATTRIBUTE_FIELDS):
+        if name not in pairs:
+            continue
+        value = _normalize_value(pairs[name])
+        if value == "unknown":
+            continue
+        if "present" in _VOCAB_CODES[f] and value != "none":
+            value = "present"  # free-text fields only record whether something is there
+        code = _VOCAB_CODES[f].get(value, _VOCAB_CODES[f].get("other", UNKNOWN))
+        codes[f] = code
+
+    colors = 0
+    for word in re.findall(r"[a-z]+", pairs.get("clothes", "").lower()):
+        colors |= _COLOR_BITS.get(word, 0)
+    return AttributeRecord(codes, colors)
+
+
+def decode_record(record):
+    """Turn an AttributeRecord back into a readable {field: value} dict."""
+    decoded = {}
+    for (name, vocab, _), code in zip(ATTRIBUTE_FIELDS, record.codes.tolist()):
+        decoded[name] = vocab[code] if code != UNKNOWN else "unknown"
+    decoded["clothes_colors"] = [c for c in CLOTHES_COLORS if record.colors & _COLOR_BITS[c]]
+    return decoded
+
+
+def _popcount(values):
+    return np.unpackbits(values.astype(">u4").view(np.uint8).reshape(-1, 4), axis=1).sum(axis=1)
+
+
+class AttributeTable:
+    """Column-wise store of AttributeRecords: one contiguous int8 column per field."""
+
+    def __init__(self, initial_capacity=64):
+        self.codes = np.full((len(ATTRIBUTE_FIELDS), initial_capacity), UNKNOWN, dtype=np.int8)
+        self.colors = np.zeros(initial_capacity, dtype=np.uint32)
+        self.ids = np.zeros(initial_capacity, dtype=np.int64)
+        self.rows = {}  # {global_id: column}
+        self.count = 0
+
+    def add(self, global_id, record):
+        """Insert or overwrite the record for `global_id`."""
+        col = self.rows.get(global_id)
+        if col is None:
+            if self.count == self.ids.shape[0]:
+                self._grow(2 * self.ids.shape[0])
+            col = self.count
+            self.rows[global_id] = col
+            self.ids[col] = global_id
+            self.count += 1
+        self.codes[:, col] = record.codes
+        self.colors[col] = record.colors
+
+    def extend(self, global_ids, codes, colors):
+        """Bulk-append new people: `codes` is (F, N) int8 and `colors` (N,) uint32, as stored in a gallery."""
+        n = len(global_ids)
+        if self.count + n > self.ids.shape[0]:
+            self._grow(max(2 * self.ids.shape[0], self.count + n))
+        self.codes[:, self.count:self.count + n] = codes
+        self.colors[self.count:self.count + n] = colors
+        self.ids[self.count:self.count + n] = global_ids
+        for col, global_id in enumerate(global_ids, start=self.count):
+            self.rows[int(global_id)] = col
+        self.count += n
+
+    def remove(self, global_id):
+        col = self.rows.pop(global_id, None)
+        if col is None:
+            return
+        last = self.count - 1
+        if col != last:
+            self.codes[:, col] = self.codes[:, last]
+            self.colors[col] = self.colors[last]
+            self.ids[col] = self.ids[last]
+            self.rows[int(self.ids[col])] = col
+        self.count -= 1
+
+    def score(self, record, candidate_ids=None):
+        """
+        Weighted attribute similarity of `record` against every stored person
+        (or only `candidate_ids`). Unknown values on either side are wildcards
+        and drop out of the comparison. Returns (ids, scores, coverage), where
+        coverage is the fraction of the total rubric weight that was comparable.
+        """
+        if candidate_ids is None:
+            cols = np.arange(self.count)
+        else:
+            cols = np.array([self.rows[g] for g in candidate_ids if g in self.rows], dtype=np.int64)
+        codes = self.codes[:, cols]
+        colors = self.colors[cols]
+
+        known = (codes != UNKNOWN) & (record.codes != UNKNOWN)[:, None]
+        matched = known & (codes == record.codes[:, None])
+        num = FIELD_WEIGHTS @ matched
+        den = FIELD_WEIGHTS @ known
+
+        # Clothes colours: Jaccard overlap when both sides mention colours
+        if record.colors:
+            both = colors != 0
+            union = _popcount(colors | np.uint32(record.colors))
+            inter = _popcount(colors & np.uint32(record.colors))
+            num = num + CLOTHES_WEIGHT * np.where(both, inter / np.maximum(union, 1), 0.0)
+            den = den + CLOTHES_WEIGHT * both
+
+        total = FIELD_WEIGHTS.sum() + CLOTHES_WEIGHT
+        scores = np.where(den > 0, num / np.maximum(den, 1e-9), 0.0)
+        return self.ids[cols], scores, den / total
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, global_id):
+        return global_id in self.rows
+
+    def _grow(self, capacity):
+        codes = np.full((len(ATTRIBUTE_FIELDS), capacity), UNKNOWN, dtype=np.int8)
+        codes[:, :self.count] = self.codes[:, :self.count]
+        colors = np.zeros(capacity, dtype=np.uint32)
+        colors[:self.count] = self.colors[:self.count]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self.count] = self.ids[:self.count]
+        self.codes, self.colors, self.ids = codes, colors, ids
+
+
+class AttributeMatcher:
+    """
+    Deterministic, LLM-free decision on top of AttributeTable scores.
+    A clear winner (score >= accept_threshold and ahead of the runner-up by
+    accept_margin) is a match; if everyone scores below reject_threshold the
+    person is new. Anything else, or too little comparable evidence
+    (coverage < min_coverage), is ambiguous and left to the LLM.
+    """
+
+    def __init__(self, accept_threshold=0.9, accept_margin=0.1, reject_threshold=0.4, min_coverage=0.5):
+        self.accept_threshold = accept_threshold
+        self.accept_margin = accept_margin
+        self.reject_threshold = reject_threshold
+        self.min_coverage = min_coverage
+        self.table = AttributeTable()
+
+    def decide(self, record, candidate_ids=None):
+        """
+        Returns (decision, global_id, score, ranked_ids) with decision one of
+        "match", "new" or "ambiguous"; ranked_ids lists candidates best first.
+        """
+        ids, scores, coverage = self.table.score(record, candidate_ids)
+        if len(ids) == 0:
+            return "ambiguous", None, 0.0, []
+        order = np.argsort(-scores, kind="stable")
+        ranked_ids = ids[order].tolist()
+        best = order[0]
+        runner_up = scores[order[1]] if len(order) > 1 else 0.0
+
+        if coverage[best] >= self.min_coverage:
+            if scores[best] >= self.accept_threshold and scores[best] - runner_up >= self.accept_margin:
+                return "match", int(ids[best]), float(scores[best]), ranked_ids
+            if scores[best] < self.reject_threshold:
+                return "new", None, float(scores[best]), ranked_ids
+        return "ambiguous", None, float(scores[best]), ranked_ids
@@ -0,0 +1,134 @@
+# src/memory/description_cache.py
+
+import cv2
+import numpy as np
+
+REFRESH_POLICIES = ("first_n", "best_quality", "every_k", "drift")
+
+
+def appearance_signature(crop):
+    """
+    Cheap appearance fingerprint of a BGR crop: an L2-normalised hue/saturation
+    histogram of a downscaled copy. Used by the "drift" refresh policy.
+    """
+    small = cv2.resize(crop, (32, 64), interpolation=cv2.INTER_AREA)
+    hsv = cv2.cvtColor(small, cv2.COLOR_BGR2HSV)
+    hist = cv2.calcHist([hsv], [0, 1], None, [8, 8], [0, 180, 0, 256]).flatten()
+    norm = np.linalg.norm(hist)
+    return hist / norm if norm > 0 else hist
+
+
+class TrackDescriptionCache:
+    """
+    Per-track cache of VLM descriptions keyed by ByteTrack track_id.
+
+    A track is described on its first valid crop; afterwards the cached
+    description is reused until the refresh policy asks for a new one:
+      - "first_n":      describe the first `first_n` crops, keep the best one
+      - "best_quality": re-describe when a crop beats the best so far by `quality_margin`
+      - "every_k":      re-describe every `every_k` frames
+      - "drift":        re-describe when the appearance signature drifts past `drift_threshold`
+    `max_descriptions` caps VLM calls per track (None = unlimited) and tracks
+    unseen for `max_age` frames are evicted.
+    """
+
+    def __init__(self, policy="best_quality", first_n=1, every_k=150, drift_threshold=0.35,
+                 quality_margin=1.5, max_descriptions=3, max_age=90):
+        if policy not in REFRESH_POLICIES:
+            raise ValueError(f"Unknown refresh policy '{policy}', expected one of {REFRESH_POLICIES}")
+        self.policy = policy
+        self.first_n = first_n
+        self.every_k = every_k
+        self.drift_threshold = drift_threshold
+        self.quality_margin = quality_margin
+        self.max_descriptions = max_descriptions
+        self.max_age = max_age
+        self.entries = {}  # {track_id: {"description", "quality", "signature", "described_frame", "n_described", "last_seen"}}
+        self.hits = 0
+        self.misses = 0
+        self._last_expiry_frame = None
+
+    def lookup(self, track_id, frame_id, quality=0.0, signature=None):
+        """
+        Return the cached description for `track_id`, or None when the crop
+        should be sent to the VLM (unknown track or refresh due).
+        """
+        self._expire(frame_id)
+        if track_id is None:
+            self.misses += 1
+            return None
+
+        entry = self.entries.get(track_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        entry["last_seen"] = frame_id
+
+        if self._needs_refresh(entry, frame_id, quality, signature):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry["description"]
+
+    def store(self, track_id, frame_id, description, quality=0.0, signature=None):
+        """Record a fresh VLM description for `track_id`; True when it replaced the track's current one."""
+        if track_id is None or description is None:
+            return False
+        entry = self.entries.get(track_id)
+        if entry is None:
+            entry = {"description": None, "quality": -1.0, "signature": None,
+                     "described_frame": frame_id, "n_described": 0, "last_seen": frame_id}
+            self.entries[track_id] = entry
+        entry["n_described"] += 1
+        entry["described_frame"] = frame_id
+        entry["last_seen"] = frame_id
+
+        # first_n / best_quality keep the best crop's description, the others keep the latest
+        keep_best = self.policy in ("first_n", "best_quality")
+        if not keep_best or quality >= entry["quality"]:
+            entry["description"] = description
+            entry["quality"] = quality
+            entry["signature"] = signature
+            return True
+        return False
+
+    def get(self, track_id):
+        """Current description of `track_id` (None if unknown), without counting a hit or miss."""
+        entry = self.entries.get(track_id)
+        return entry["description"] if entry else None
+
+    def needs_signature(self):
+        """Whether callers should compute `appearance_signature` for lookups."""
+        return self.policy == "drift"
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "tracks": len(self.entries),
+        }
+
+    def _needs_refresh(self, entry, frame_id, quality, signature):
+        if self.max_descriptions is not None and entry["n_described"] >= self.max_descriptions:
+            return False
+        if self.policy == "first_n":
+            return entry["n_described"] < self.first_n
+        if self.policy == "best_quality":
+            return quality > entry["quality"] * self.quality_margin
+        if self.policy == "every_k":
+            return frame_id - entry["described_frame"] >= self.every_k
+        if self.policy == "drift":
+            if signature is None or entry["signature"] is None:
+                return False
+            return 1.0 - float(np.dot(signature, entry["signature"])) > self.drift_threshold
+        return False
+
+    def _expire(self, frame_id):
+        if self.max_age is None or frame_id == self._last_expiry_frame:
+            return
+        self._last_expiry_frame = frame_id
+        stale = [tid for tid, e in self.entries.items() if frame_id - e["last_seen"] > self.max_age]
+        for tid in stale:
+            del self.entries[tid]
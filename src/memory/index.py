@@ -0,0 +1,302 @@
+# src/memory/index.py
+
+import numpy as np
+
+
+def normalize_rows(vectors):
+    """L2-normalise the rows of a 2-D float32 array."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors.reshape(1, -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+class EmbeddingIndex:
+    """
+    Interface for the embedding gallery behind PersonMemory.
+    Keys are integer global IDs; vectors are compared by cosine similarity.
+    """
+
+    def add(self, key, vector):
+        """Insert `vector` under `key`, overwriting any existing vector for that key."""
+        raise NotImplementedError
+
+    def remove(self, key):
+        """Delete `key` from the index (no-op when absent)."""
+        raise NotImplementedError
+
+    def search(self, queries, k):
+        """
+        Return (scores, keys), both shaped (M, k), with each row sorted by
+        descending similarity. Missing neighbours are padded with key -1.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        raise NotImplementedError
+
+
+def _pad_topk(scores, keys, k):
+    """Pad (M, c) results with c < k up to (M, k)."""
+    missing = k - scores.shape[1]
+    if missing <= 0:
+        return scores, keys
+    scores = np.pad(scores, ((0, 0), (0, missing)), constant_values=-np.inf)
+    keys = np.pad(keys, ((0, 0), (0, missing)), constant_values=-1)
+    return scores, keys
+
+
+def _topk(sims, k):
+    """Indices and values of the top-k columns per row, sorted descending."""
+    k = min(k, sims.shape[1])
+    if k < sims.shape[1]:
+        part = np.argpartition(-sims, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(sims.shape[1]), sims.shape).copy()
+    part_scores = np.take_along_axis(sims, part, axis=1)
+    order = np.argsort(-part_scores, axis=1, kind="stable")
+    return np.take_along_axis(part, order, axis=1), np.take_along_axis(part_scores, order, axis=1)
+
+
+class ExactIndex(EmbeddingIndex):
+    """
+    Brute-force index: a contiguous, pre-normalised (N, D) float32 matrix that
+    grows geometrically, answered with one matrix product per batch of queries.
+    """
+
+    def __init__(self, initial_capacity=64):
+        self.initial_capacity = initial_capacity
+        self.matrix = None                         # (capacity, D) float32
+        self.keys = np.empty(0, dtype=np.int64)    # key stored in each row
+        self.rows = {}                             # {key: row}
+        self.count = 0
+
+    def add(self, key, vector):
+        vector = normalize_rows(vector)[0]
+        row = self.rows.get(key)
+        if row is not None:
+            self.matrix[row] = vector
+            return
+
+        if self.matrix is None:
+            self.matrix = np.empty((self.initial_capacity, vector.shape[0]), dtype=np.float32)
+            self.keys = np.empty(self.initial_capacity, dtype=np.int64)
+        elif self.count == self.matrix.shape[0]:
+            self._grow(2 * self.matrix.shape[0])
+
+        row = self.count
+        self.matrix[row] = vector
+        self.keys[row] = key
+        self.rows[key] = row
+        self.count += 1
+
+    def attach(self, keys, matrix):
+        """
+        Adopt an already-normalised (N, D) float32 matrix, e.g. a copy-on-write
+        np.memmap of a saved gallery, without copying it. Rows are paged in on
+        first search; growing past N copies the matrix into RAM once.
+        """
+        self.matrix = matrix
+        self.keys = np.asarray(keys, dtype=np.int64)
+        self.rows = {int(key): row for row, key in enumerate(self.keys.tolist())}
+        self.count = len(self.keys)
+
+    def remove(self, key):
+        row = self.rows.pop(key, None)
+        if row is None:
+            return
+        # Swap the last row into the hole to keep the matrix contiguous
+        last = self.count - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.keys[row] = self.keys[last]
+            self.rows[int(self.keys[row])] = row
+        self.count -= 1
+
+    def search(self, queries, k):
+        queries = normalize_rows(queries)
+        if self.count == 0:
+            return _pad_topk(np.empty((len(queries), 0), dtype=np.float32),
+                             np.empty((len(queries), 0), dtype=np.int64), k)
+        sims = queries @ self.matrix[:self.count].T
+        idx, scores = _topk(sims, k)
+        return _pad_topk(scores, self.keys[idx], k)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, key):
+        return key in self.rows
+
+    def _grow(self, capacity):
+        grown = np.empty((capacity, self.matrix.shape[1]), dtype=np.float32)
+        grown[:self.count] = self.matrix[:self.count]
+        grown_keys = np.empty(capacity, dtype=np.int64)
+        grown_keys[:self.count] = self.keys[:self.count]
+        self.matrix, self.keys = grown, grown_keys
+
+
+class IVFIndex(EmbeddingIndex):
+    """
+    Pure-NumPy inverted-file index. Vectors are bucketed by their nearest of
+    `nlist` k-means centroids, each bucket being a small ExactIndex, and a
+    query only scans the `nprobe` closest buckets. Until `train_size` vectors
+    have been added it scans exactly; it retrains whenever the gallery has
+    doubled since the last training.
+    """
+
+    def __init__(self, nlist=256, nprobe=16, train_size=None, kmeans_iters=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_size = train_size or 8 * nlist
+        self.kmeans_iters = kmeans_iters
+        self.rng = np.random.default_rng(seed)
+        self.centroids = None          # (nlist, D), None until trained
+        self.lists = [ExactIndex()]    # one bucket per centroid (a single flat bucket before training)
+        self.assignments = {}          # {key: bucket id}
+        self._trained_size = 0
+
+    def add(self, key, vector):
+        vector = normalize_rows(vector)[0]
+        bucket = 0 if self.centroids is None else int(np.argmax(self.centroids @ vector))
+        previous = self.assignments.get(key)
+        if previous is not None and previous != bucket:
+            self.lists[previous].remove(key)
+        self.lists[bucket].add(key, vector)
+        self.assignments[key] = bucket
+
+        if self.centroids is None and len(self) >= self.train_size:
+            self._train()
+        elif self.centroids is not None and len(self) >= 2 * self._trained_size:
+            self._train()
+
+    def remove(self, key):
+        bucket = self.assignments.pop(key, None)
+        if bucket is not None:
+            self.lists[bucket].remove(key)
+
+    def search(self, queries, k):
+        if self.centroids is None:
+            return self.lists[0].search(queries, k)
+
+        queries = normalize_rows(queries)
+        nprobe = min(self.nprobe, len(self.lists))
+        probe_idx, _ = _topk(queries @ self.centroids.T, nprobe)
+
+        # Batch all queries probing the same bucket into one matrix product
+        cand_scores = np.full((len(queries), nprobe * k), -np.inf, dtype=np.float32)
+        cand_keys = np.full((len(queries), nprobe * k), -1, dtype=np.int64)
+        for bucket in np.unique(probe_idx):
+            query_rows, probe_slot = np.nonzero(probe_idx == bucket)
+            if len(self.lists[bucket]) == 0:
+                continue
+            scores, keys = self.lists[bucket].search(queries[query_rows], k)
+            cols = probe_slot[:, None] * k + np.arange(k)
+            cand_scores[query_rows[:, None], cols] = scores
+            cand_keys[query_rows[:, None], cols] = keys
+
+        idx, scores = _topk(cand_scores, k)
+        return scores, np.take_along_axis(cand_keys, idx, axis=1)
+
+    def __len__(self):
+        return len(self.assignments)
+
+    def __contains__(self, key):
+        return key in self.assignments
+
+    def _train(self):
+        """Spherical k-means on (a sample of) the stored vectors, then re-bucket everything."""
+        keys = np.concatenate([bucket.keys[:bucket.count] for bucket in self.lists])
+        data = np.concatenate([bucket.matrix[:bucket.count] for bucket in self.lists if bucket.count])
+        nlist = min(self.nlist, len(data))
+        sample_size = min(len(data), 64 * nlist)
+        sample = data[self.rng.choice(len(data), sample_size, replace=False)]
+        centroids = sample[self.rng.choice(sample_size, nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            empty = np.bincount(labels, minlength=nlist) == 0
+            sums[empty] = centroids[empty]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids
+        labels = np.argmax(data @ centroids.T, axis=1)
+        self.lists = [ExactIndex(initial_capacity=16) for _ in range(nlist)]
+        self.assignments = {}
+        for key, label, vector in zip(keys.tolist(), labels.tolist(), data):
+            self.lists[label].add(key, vector)
+            self.assignments[key] = label
+        self._trained_size = len(data)
+
+
+class HNSWIndex(EmbeddingIndex):
+    """HNSW graph index backed by the optional `hnswlib` package."""
+
+    def __init__(self, dim=512, max_elements=1024, M=16, ef_construction=200, ef=64):
+        import hnswlib  # optional dependency
+
+        self.index = hnswlib.Index(space="ip", dim=dim)
+        self.index.init_index(max_elements=max_elements, ef_construction=ef_construction,
+                              M=M, allow_replace_deleted=True)
+        self.index.set_ef(ef)
+        self.ef = ef
+        self.keys = set()
+
+    def add(self, key, vector):
+        vector = normalize_rows(vector)
+        labels = np.array([key])
+        if key in self.keys:
+            # Existing label: update its vector in place. replace_deleted would
+            # move it into a freed slot and leave the label in two places.
+            self.index.add_items(vector, labels)
+            return
+        try:
+            # Removed earlier and its slot not reused yet: revive and overwrite it
+            self.index.unmark_deleted(key)
+            self.index.add_items(vector, labels)
+        except RuntimeError:
+            if self.index.get_current_count() >= self.index.get_max_elements():
+                self.index.resize_index(2 * self.index.get_max_elements())
+            self.index.add_items(vector, labels, replace_deleted=True)
+        self.keys.add(key)
+
+    def remove(self, key):
+        if key in self.keys:
+            self.index.mark_deleted(key)
+            self.keys.discard(key)
+
+    def search(self, queries, k):
+        queries = normalize_rows(queries)
+        n = min(k, len(self.keys))
+        if n == 0:
+            return _pad_topk(np.empty((len(queries), 0), dtype=np.float32),
+                             np.empty((len(queries), 0), dtype=np.int64), k)
+        self.index.set_ef(max(self.ef, n))
+        labels, distances = self.index.knn_query(queries, k=n)
+        # hnswlib's "ip" distance is 1 - dot product
+        return _pad_topk((1.0 - distances).astype(np.float32), labels.astype(np.int64), k)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __contains__(self, key):
+        return key in self.keys
+
+
+INDEX_BACKENDS = {
+    "exact": ExactIndex,
+    "ivf": IVFIndex,
+    "hnsw": HNSWIndex,
+}
+
+
+def make_index(backend="exact", **kwargs):
+    """Build an EmbeddingIndex by backend name ("exact", "ivf" or "hnsw")."""
+    if backend not in INDEX_BACKENDS:
+        raise ValueError(f"Unknown index backend '{backend}', expected one of {list(INDEX_BACKENDS)}")
+    return INDEX_BACKENDS[backend](**kwargs)
@@ -1,13 +1,73 @@
 # src/memory/memory.py
 
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from src.memory.index import make_index
+from src.memory.attributes import parse_description, AttributeMatcher
+
+CONFIDENCE_RANK = {"high": 0, "medium": 1, "low": 2}
+
+
+def resolve_one_to_one(results, taken=()):
+    """
+    Make a frame's (matched_id, confidence, reasoning) results one-to-one: when
+    several detections claim the same ID, the most confident claim keeps it
+    (earliest on ties) and the others become new persons (matched_id None).
+    Claims on an ID in `taken` are dropped the same way.
+    """
+    winners = {}  # {matched_id: index of the claim that keeps it}
+    for i, (matched_id, confidence, _) in enumerate(results):
+        if matched_id is None or matched_id in taken:
+            continue
+        best = winners.get(matched_id)
+        if best is None or CONFIDENCE_RANK.get(confidence, 3) < CONFIDENCE_RANK.get(results[best][1], 3):
+            winners[matched_id] = i
+
+    resolved = []
+    for i, (matched_id, confidence, reasoning) in enumerate(results):
+        if matched_id is not None and winners.get(matched_id) != i:
+            reasoning = f"{reasoning} [ID {matched_id} already claimed in this frame; treated as new]"
+            matched_id = None
+        resolved.append((matched_id, confidence, reasoning))
+    return resolved
+
+
+def ask_llm(llm_agent, new_descriptions, results, queries, taken=()):
+    """
+    Fill the `queries` left by `PersonMemory.prefilter_descriptions` with one
+    batched LLM call (one call per query if the agent cannot batch) and make
+    the frame's results one-to-one.
+    """
+    if len(queries) > 1 and hasattr(llm_agent, "compare_descriptions_batch"):
+        replies = llm_agent.compare_descriptions_batch(
+            [new_descriptions[i] for i, _ in queries], [candidates for _, candidates in queries]
+        )
+    else:
+        replies = [llm_agent.compare_descriptions(new_descriptions[i], candidates) for i, candidates in queries]
+    results = list(results)
+    for (i, _), reply in zip(queries, replies):
+        results[i] = reply
+    return resolve_one_to_one(results, taken)
+
 
 class PersonMemory:
-    def __init__(self, similarity_threshold=0.7):
+    def __init__(self, similarity_threshold=0.7, assignment="greedy", index="exact",
+                 index_kwargs=None, search_k=10, description_top_k=None, skip_llm_threshold=None,
+                 attribute_matcher=None):
         self.memory = {}  # {global_id: {"embedding": ..., "description": ..., "history": [...]}}
         self.next_global_id = 0
         self.similarity_threshold = similarity_threshold
+        self.assignment = assignment  # "greedy" or "hungarian" one-to-one matching per frame
+        self.search_k = search_k      # candidates fetched from the index per query
+        self.description_top_k = description_top_k    # descriptions shortlisted for the LLM (None = all)
+        self.skip_llm_threshold = skip_llm_threshold  # accept the top embedding match without the LLM
+        self.attribute_matcher = attribute_matcher    # optional LLM-free AttributeMatcher fast path
+
+        # Embedding gallery for people that have an embedding ("exact", "ivf" or "hnsw")
+        self.index = make_index(index, **(index_kwargs or {}))
+
+        # Changes since the last GalleryStore flush
+        self.dirty = set()    # global IDs added or updated
+        self.removed = set()  # global IDs removed
 
     def add_person(self, embedding, description=None):
         """Add a new person to memory."""
@@ -15,45 +75,161 @@ class PersonMemory:
         self.memory[global_id] = {
             "embedding": embedding,
             "description": description,
+            "attributes": None,
             "history": []
         }
+        if embedding is not None:
+            self.index.add(global_id, embedding)
+        if description is not None:
+            self._index_attributes(global_id, description)
+        self.dirty.add(global_id)
         self.next_global_id += 1
         return global_id
 
     def find_match(self, embedding):
         """Find the best matching person in memory."""
-        if not self.memory:
-            return None, -1
+        matched_ids, scores = self.find_matches([embedding])
+        return matched_ids[0], scores[0]
 
-        best_id = None
-        best_score = -1
+    def find_matches(self, embeddings):
+        """
+        Match all embeddings of one frame against memory at once.
+        Fetches the top `search_k` candidates per query from the index, then
+        assigns IDs one-to-one so two detections in the same frame can never
+        claim the same global ID. Returns (matched_ids, scores) where
+        matched_ids[i] is None when query i has no match above the threshold and
+        scores[i] is its similarity to the assigned (or else best) person.
+        """
+        n_queries = len(embeddings)
+        if len(self.index) == 0 or n_queries == 0:
+            return [None] * n_queries, [-1] * n_queries
 
-        for global_id, person_data in self.memory.items():
-            score = cosine_similarity([embedding], [person_data["embedding"]])[0, 0]
-            if score > best_score:
-                best_score = score
-                best_id = global_id
+        queries = np.asarray(embeddings, dtype=np.float32).reshape(n_queries, -1)
+        cand_scores, cand_ids = self.index.search(queries, min(self.search_k, len(self.index)))
+
+        # Dense (M, C) similarity table over the union of candidates; non-candidates score -inf
+        candidates, inverse = np.unique(cand_ids, return_inverse=True)
+        inverse = inverse.reshape(cand_ids.shape)
+        sims = np.full((n_queries, len(candidates)), -np.inf, dtype=np.float32)
+        np.put_along_axis(sims, inverse, cand_scores, axis=1)
+        sims[:, candidates < 0] = -np.inf
+        cols = self._assign(sims)
+
+        matched_ids, scores = [], []
+        for i, col in enumerate(cols):
+            if col >= 0:
+                matched_ids.append(int(candidates[col]))
+                scores.append(float(sims[i, col]))
+            else:
+                matched_ids.append(None)
+                scores.append(float(cand_scores[i, 0]) if cand_ids[i, 0] >= 0 else -1)
+        return matched_ids, scores
 
-        if best_score >= self.similarity_threshold:
-            return best_id, best_score
-        else:
-            return None, best_score
-    
     def get_all_descriptions(self):
         """Get all descriptions in memory for LLM comparison."""
         return {global_id: person_data["description"]
                 for global_id, person_data in self.memory.items()
                 if person_data.get("description")}
 
-    def find_match_by_description(self, new_description, llm_agent):
+    def find_match_by_description(self, new_description, llm_agent, embedding=None):
         """
-        Use an LLM agent to compare the new description with all existing ones.
-        Returns (matched_id, reasoning) or (None, reasoning).
+        Use an LLM agent to compare the new description with existing ones.
+        When an embedding is given, only the `description_top_k` most similar
+        people are sent to the LLM, and a top candidate above
+        `skip_llm_threshold` is accepted without calling it at all. With an
+        attribute matcher, clear attribute matches / non-matches are decided
+        without the LLM too; only ambiguous cases reach it.
+        Returns (matched_id, confidence, reasoning).
         """
+        decided, existing_descriptions = self._prefilter_description(
+            new_description, self.get_all_descriptions(), embedding
+        )
+        if decided is not None:
+            return decided
+        return llm_agent.compare_descriptions(new_description, existing_descriptions)
+
+    def find_matches_by_description(self, new_descriptions, llm_agent, embeddings=None, taken=()):
+        """
+        Match all new descriptions of one frame at once. Each goes through the
+        same shortlist / skip / attribute prefilter as `find_match_by_description`
+        against the gallery as it was before the frame; the ones left for the LLM
+        are sent in a single `compare_descriptions_batch` call. The result is
+        made one-to-one (see `resolve_one_to_one`), also against the IDs in
+        `taken` (e.g. tracks already bound this frame).
+        Returns a list of (matched_id, confidence, reasoning).
+        """
+        results, queries = self.prefilter_descriptions(new_descriptions, embeddings)
+        return ask_llm(llm_agent, new_descriptions, results, queries, taken)
+
+    def prefilter_descriptions(self, new_descriptions, embeddings=None):
+        """
+        LLM-free part of `find_matches_by_description` for a frame, against the
+        gallery as it is now. Returns (results, queries): results[i] is the
+        decided (matched_id, confidence, reasoning) or None, and queries lists
+        (i, candidate descriptions) for the descriptions the LLM has to match.
+        """
+        embeddings = embeddings if embeddings is not None else [None] * len(new_descriptions)
         existing_descriptions = self.get_all_descriptions()
+        results = [None] * len(new_descriptions)
+        queries = []  # (index, candidate descriptions) for the LLM
+        for i, (description, embedding) in enumerate(zip(new_descriptions, embeddings)):
+            decided, candidates = self._prefilter_description(description, existing_descriptions, embedding)
+            if decided is not None:
+                results[i] = decided
+            else:
+                queries.append((i, candidates))
+        return results, queries
+
+    def _prefilter_description(self, new_description, existing_descriptions, embedding=None):
+        """
+        LLM-free part of description matching. Returns (decided, candidates):
+        `decided` is a (matched_id, confidence, reasoning) result when no LLM call
+        is needed, else None and `candidates` holds the descriptions to send.
+        """
         if not existing_descriptions:
-            return None, "high", "No existing descriptions in memory."
-        return llm_agent.compare_descriptions(new_description, existing_descriptions)
+            return (None, "high", "No existing descriptions in memory."), {}
+
+        candidate_ids = None
+        if embedding is not None and self.description_top_k:
+            shortlist, top_id, top_score = self.shortlist_descriptions(embedding, existing_descriptions)
+            if (self.skip_llm_threshold is not None and top_id is not None
+                    and top_score >= self.skip_llm_threshold):
+                return (top_id, "high", f"Embedding similarity {top_score:.3f} to ID {top_id}; LLM skipped."), {}
+            existing_descriptions = shortlist
+            candidate_ids = list(shortlist)
+
+        record = parse_description(new_description) if self.attribute_matcher is not None else None
+        if record is not None and len(self.attribute_matcher.table):
+            decision, matched_id, score, ranked_ids = self.attribute_matcher.decide(record, candidate_ids)
+            if decision == "match":
+                return (matched_id, "high", f"Attribute score {score:.2f} to ID {matched_id}; LLM skipped."), {}
+            if decision == "new":
+                return (None, "high", f"Best attribute score {score:.2f} is below the reject threshold; LLM skipped."), {}
+            if candidate_ids is None and self.description_top_k:
+                # No embedding shortlist: fall back to the best attribute candidates
+                keep = set(ranked_ids[:self.description_top_k])
+                existing_descriptions = {gid: desc for gid, desc in existing_descriptions.items()
+                                         if gid in keep or gid not in self.attribute_matcher.table}
+        return None, existing_descriptions
+
+    def shortlist_descriptions(self, embedding, existing_descriptions):
+        """
+        Keep the `description_top_k` people most similar to `embedding`.
+        People stored without an embedding cannot be ranked and are always kept.
+        Returns (shortlist, top_id, top_score) where top_id is the best-ranked
+        person that has a description (None if there is none).
+        """
+        shortlist = {gid: desc for gid, desc in existing_descriptions.items() if gid not in self.index}
+        top_id, top_score = None, -1
+        if len(self.index):
+            scores, ids = self.index.search(embedding, min(self.description_top_k, len(self.index)))
+            for gid, score in zip(ids[0].tolist(), scores[0].tolist()):
+                if gid < 0 or gid not in existing_descriptions:
+                    continue
+                shortlist[gid] = existing_descriptions[gid]
+                if top_id is None:
+                    top_id, top_score = gid, score
+        return shortlist, top_id, top_score
 
     def get_person(self, global_id):
         """Get person data by global ID."""
@@ -64,8 +240,20 @@ class PersonMemory:
         if global_id in self.memory:
             if embedding is not None:
                 self.memory[global_id]["embedding"] = embedding
+                self.index.add(global_id, embedding)
             if description is not None:
                 self.memory[global_id]["description"] = description
+                self._index_attributes(global_id, description)
+            self.dirty.add(global_id)
+
+    def remove_person(self, global_id):
+        """Remove a person from memory (e.g. after merging duplicate IDs)."""
+        if self.memory.pop(global_id, None) is not None:
+            self.index.remove(global_id)
+            if self.attribute_matcher is not None:
+                self.attribute_matcher.table.remove(global_id)
+            self.dirty.discard(global_id)
+            self.removed.add(global_id)
 
     def get_all_ids(self):
         """Get all global IDs in memory."""
@@ -73,4 +261,58 @@ class PersonMemory:
 
     def get_memory_size(self):
         """Get number of persons in memory."""
-        return len(self.memory)
\ No newline at end of file
+        return len(self.memory)
+
+    def _index_attributes(self, global_id, description):
+        """Parse a description into its attribute record and keep the matcher's table in sync."""
+        record = parse_description(description)
+        self.memory[global_id]["attributes"] = record
+        if self.attribute_matcher is None:
+            return
+        if record is not None:
+            self.attribute_matcher.table.add(global_id, record)
+        else:
+            self.attribute_matcher.table.remove(global_id)
+
+    def _assign(self, sims):
+        """One-to-one assignment of queries (rows of `sims`) to candidate columns; -1 means unmatched."""
+        rows = np.full(sims.shape[0], -1, dtype=np.int64)
+        if self.assignment == "hungarian":
+            from scipy.optimize import linear_sum_assignment
+            query_idx, row_idx = linear_sum_assignment(-np.maximum(sims, -1.0))
+            keep = sims[query_idx, row_idx] >= self.similarity_threshold
+            rows[query_idx[keep]] = row_idx[keep]
+            return rows
+
+        # Greedy: take candidate pairs above threshold from the highest similarity down
+        query_idx, row_idx = np.nonzero(sims >= self.similarity_threshold)
+        order = np.argsort(-sims[query_idx, row_idx], kind="stable")
+        taken = set()
+        for q, r in zip(query_idx[order], row_idx[order]):
+            if rows[q] < 0 and r not in taken:
+                rows[q] = r
+                taken.add(r)
+        return rows
+
+
+def build_memory(config):
+    """PersonMemory (with its optional attribute matcher) as described by the `embedding` / `matching` config."""
+    attribute_matcher = None
+    attr_cfg = getattr(config.matching, "attributes", None)
+    if attr_cfg and attr_cfg.enabled:
+        attribute_matcher = AttributeMatcher(
+            accept_threshold = getattr(attr_cfg, "accept_threshold", 0.9),
+            accept_margin    = getattr(attr_cfg, "accept_margin", 0.1),
+            reject_threshold = getattr(attr_cfg, "reject_threshold", 0.4),
+            min_coverage     = getattr(attr_cfg, "min_coverage", 0.5),
+        )
+    return PersonMemory(
+        similarity_threshold = config.embedding.similarity_threshold,
+        assignment           = getattr(config.embedding, "assignment", "greedy"),
+        index                = getattr(config.embedding, "index", "exact"),
+        index_kwargs         = dict(getattr(config.embedding, "index_params", None) or {}),
+        search_k             = getattr(config.embedding, "search_k", 10),
+        description_top_k    = getattr(config.matching, "top_k", None),
+        skip_llm_threshold   = getattr(config.matching, "skip_llm_threshold", None),
+        attribute_matcher    = attribute_matcher,
+    )
@@ -0,0 +1,113 @@
+# src/memory/shared.py
+
+import threading
+from multiprocessing.managers import BaseManager
+from box import Box
+from src.memory.memory import build_memory, ask_llm
+from src.memory.store import GalleryStore
+
+
+class SharedGallery:
+    """
+    One PersonMemory served to several stream processes by a GalleryManager.
+    Every call holds a lock, so each detection-to-ID decision sees the
+    additions of every stream. Optionally backed by a GalleryStore
+    (`gallery_path`), loaded at start when `load` and written by `flush` / `close`.
+    Only picklable data crosses the process boundary: the LLM stays in the
+    workers (see RemoteMemory).
+    """
+
+    def __init__(self, config_dict, gallery_path=None, load=True):
+        self.memory = build_memory(Box(config_dict))
+        self.lock = threading.Lock()
+        self.store = None
+        if gallery_path:
+            self.store = GalleryStore(gallery_path)
+            if load:
+                loaded = self.store.load(self.memory)
+                print(f"[Gallery] shared gallery: loaded {loaded} identities from {gallery_path}")
+
+    def find_matches(self, embeddings):
+        with self.lock:
+            return self.memory.find_matches(embeddings)
+
+    def prefilter_descriptions(self, new_descriptions, embeddings=None):
+        with self.lock:
+            return self.memory.prefilter_descriptions(new_descriptions, embeddings)
+
+    def add_person(self, embedding, description=None):
+        with self.lock:
+            return self.memory.add_person(embedding, description)
+
+    def update_person(self, global_id, embedding=None, description=None):
+        with self.lock:
+            self.memory.update_person(global_id, embedding, description)
+
+    def get_person(self, global_id):
+        with self.lock:
+            return self.memory.get_person(global_id)
+
+    def get_all_descriptions(self):
+        with self.lock:
+            return self.memory.get_all_descriptions()
+
+    def get_memory_size(self):
+        with self.lock:
+            return self.memory.get_memory_size()
+
+    def flush(self):
+        with self.lock:
+            return self.store.flush(self.memory) if self.store is not None else 0
+
+    def close(self):
+        with self.lock:
+            if self.store is not None:
+                self.store.flush(self.memory)
+                self.store.close()
+                self.store = None
+
+
+class GalleryManager(BaseManager):
+    """Server process hosting a SharedGallery: `GalleryManager().start()`, then `.SharedGallery(...)`."""
+
+
+GalleryManager.register("SharedGallery", SharedGallery)
+
+
+class RemoteMemory:
+    """
+    PersonMemory stand-in for a stream process, backed by a SharedGallery
+    proxy. Description matching is split: the LLM-free prefilter runs in the
+    gallery process, the LLM call runs here with the worker's own agent.
+    Two streams may both decide "new" for someone first seen by both at the
+    same moment; the gallery then holds two IDs for that person.
+    """
+
+    def __init__(self, gallery):
+        self.gallery = gallery
+
+    def find_matches(self, embeddings):
+        return self.gallery.find_matches(embeddings)
+
+    def find_match(self, embedding):
+        matched_ids, scores = self.find_matches([embedding])
+        return matched_ids[0], scores[0]
+
+    def find_matches_by_description(self, new_descriptions, llm_agent, embeddings=None, taken=()):
+        results, queries = self.gallery.prefilter_descriptions(new_descriptions, embeddings)
+        return ask_llm(llm_agent, new_descriptions, results, queries, taken)
+
+    def add_person(self, embedding, description=None):
+        return self.gallery.add_person(embedding, description)
+
+    def update_person(self, global_id, embedding=None, description=None):
+        self.gallery.update_person(global_id, embedding, description)
+
+    def get_person(self, global_id):
+        return self.gallery.get_person(global_id)
+
+    def get_all_descriptions(self):
+        return self.gallery.get_all_descriptions()
+
+    def get_memory_size(self):
+        return self.gallery.get_memory_size()
@@ -0,0 +1,190 @@
+# src/memory/store.py
+
+import os
+import sqlite3
+import numpy as np
+from src.memory.attributes import ATTRIBUTE_FIELDS, AttributeRecord
+from src.memory.index import normalize_rows
+
+N_FIELDS = len(ATTRIBUTE_FIELDS)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS persons (
+    gid INTEGER PRIMARY KEY,
+    row INTEGER NOT NULL,          -- row in embeddings.f32, -1 when the person has no embedding
+    description TEXT,
+    attributes BLOB                -- N_FIELDS int8 codes + uint32 clothes-colour bitmask
+);
+"""
+
+
+def pack_attributes(record):
+    if record is None:
+        return None
+    return np.asarray(record.codes, dtype=np.int8).tobytes() + np.uint32(record.colors).tobytes()
+
+
+class GalleryStore:
+    """
+    On-disk PersonMemory gallery, kept in a directory:
+      embeddings.f32   raw (rows, D) float32 matrix of L2-normalised embeddings
+      gallery.sqlite   persons(gid, row, description, attributes) and meta(key, value)
+
+    `load` memory-maps the embeddings (copy-on-write) instead of reading them,
+    so opening a large gallery costs one SQLite scan; with the exact index the
+    map is searched in place. `flush` writes only the people added, updated or
+    removed since the last flush (PersonMemory.dirty / .removed): updated
+    embeddings overwrite their row, new ones are appended. Removed people leave
+    a dead row behind until `save` rewrites a compact copy.
+    """
+
+    def __init__(self, path):
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.embeddings_path = os.path.join(path, "embeddings.f32")
+        self.db = sqlite3.connect(os.path.join(path, "gallery.sqlite"), check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+        self.dim = self._get_meta("dim")
+        self.n_rows = self._get_meta("n_rows") or 0
+        self.rows = dict(self.db.execute("SELECT gid, row FROM persons"))  # {gid: row}
+
+    def load(self, memory):
+        """Load every stored person into an empty PersonMemory. Returns the number loaded."""
+        if not self.rows:
+            return 0
+        embeddings = None
+        if self.n_rows:
+            embeddings = np.memmap(self.embeddings_path, dtype=np.float32, mode="c", shape=(self.n_rows, self.dim))
+
+        gids, rows, descriptions, blobs = zip(*self.db.execute(
+            "SELECT gid, row, description, attributes FROM persons ORDER BY gid"))
+        rows = np.asarray(rows, dtype=np.int64)
+        keys = np.full(self.n_rows, -1, dtype=np.int64)  # gid stored in each row, -1 for dead rows
+        keys[rows[rows >= 0]] = np.asarray(gids, dtype=np.int64)[rows >= 0]
+
+        # Attribute blobs are decoded in one go: (N, N_FIELDS + 4) bytes -> int8 codes + uint32 colours
+        has_attr = [blob is not None for blob in blobs]
+        packed = np.frombuffer(b"".join(blob for blob in blobs if blob is not None), dtype=np.uint8)
+        packed = packed.reshape(-1, N_FIELDS + 4)
+        attr_codes = packed[:, :N_FIELDS].view(np.int8)
+        attr_colors = packed[:, N_FIELDS:].copy().view(np.uint32).ravel()
+
+        rows_view = np.asarray(embeddings) if embeddings is not None else None  # plain ndarray rows are cheaper
+        attr_ids = []
+        k = 0
+        for gid, row, description, has in zip(gids, rows.tolist(), descriptions, has_attr):
+            record = None
+            if has:
+                record = AttributeRecord(attr_codes[k], int(attr_colors[k]))
+                attr_ids.append(gid)
+                k += 1
+            memory.memory[gid] = {
+                "embedding": rows_view[row] if row >= 0 else None,
+                "description": description,
+                "attributes": record,
+                "history": [],
+            }
+
+        live = keys >= 0
+        if hasattr(memory.index, "attach") and len(memory.index) == 0:
+            if live.all():
+                memory.index.attach(keys, embeddings)
+            else:
+                # Dead rows left by removals: attach a compacted in-RAM copy (`save` compacts the file)
+                memory.index.attach(keys[live], np.ascontiguousarray(embeddings[live]))
+        else:
+            for row in np.flatnonzero(live):
+                memory.index.add(int(keys[row]), embeddings[row])
+
+        if memory.attribute_matcher is not None and attr_ids:
+            memory.attribute_matcher.table.extend(attr_ids, attr_codes.T, attr_colors)
+        memory.next_global_id = max(memory.next_global_id, self._get_meta("next_global_id") or 0)
+        memory.dirty.clear()
+        memory.removed.clear()
+        return len(self.rows)
+
+    def flush(self, memory):
+        """Write the people changed since the last flush. Returns the number of changes written."""
+        dirty = set(memory.dirty)
+        removed = set(memory.removed)
+        memory.dirty -= dirty
+        memory.removed -= removed
+        if not dirty and not removed:
+            return 0
+
+        upserts = []
+        writes = []  # (row, normalised embedding)
+        for gid in sorted(dirty):
+            person = memory.memory.get(gid)
+            if person is None:
+                continue
+            row = self.rows.get(gid, -1)
+            if person["embedding"] is not None:
+                vector = normalize_rows(person["embedding"])[0]
+                if self.dim is None:
+                    self.dim = vector.shape[0]
+                if row < 0:
+                    row = self.n_rows
+                    self.n_rows += 1
+                writes.append((row, vector))
+            self.rows[gid] = row
+            upserts.append((gid, row, person["description"], pack_attributes(person.get("attributes"))))
+
+        if writes:
+            mode = "r+b" if os.path.exists(self.embeddings_path) else "wb"
+            with open(self.embeddings_path, mode) as f:
+                for row, vector in writes:
+                    f.seek(row * self.dim * 4)
+                    f.write(vector.tobytes())
+
+        with self.db:
+            self.db.executemany("INSERT OR REPLACE INTO persons VALUES (?, ?, ?, ?)", upserts)
+            self.db.executemany("DELETE FROM persons WHERE gid = ?", [(gid,) for gid in removed])
+            self._set_meta(dim=self.dim, n_rows=self.n_rows, next_global_id=memory.next_global_id)
+        for gid in removed:
+            self.rows.pop(gid, None)
+        return len(upserts) + len(removed)
+
+    def save(self, memory):
+        """Rewrite the whole gallery from `memory` as a compact copy (no dead rows)."""
+        persons = sorted(memory.memory.items())
+        vectors = [normalize_rows(p["embedding"])[0] for _, p in persons if p["embedding"] is not None]
+        tmp_path = self.embeddings_path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            for vector in vectors:
+                f.write(vector.tobytes())
+
+        rows, row = {}, 0
+        records = []
+        for gid, person in persons:
+            rows[gid] = row if person["embedding"] is not None else -1
+            row += person["embedding"] is not None
+            records.append((gid, rows[gid], person["description"], pack_attributes(person.get("attributes"))))
+
+        os.replace(tmp_path, self.embeddings_path)
+        self.rows = rows
+        self.n_rows = len(vectors)
+        self.dim = vectors[0].shape[0] if vectors else self.dim
+        with self.db:
+            self.db.execute("DELETE FROM persons")
+            self.db.executemany("INSERT INTO persons VALUES (?, ?, ?, ?)", records)
+            self._set_meta(dim=self.dim, n_rows=self.n_rows, next_global_id=memory.next_global_id)
+        memory.dirty.clear()
+        memory.removed.clear()
+
+    def stats(self):
+        live = sum(1 for row in self.rows.values() if row >= 0)
+        return {"persons": len(self.rows), "rows": self.n_rows, "dead_rows": self.n_rows - live}
+
+    def close(self):
+        self.db.close()
+
+    def _get_meta(self, key):
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return int(row[0]) if row is not None and row[0] is not None else None
+
+    def _set_meta(self, **values):
+        self.db.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)",
+                            [(key, None if value is None else str(value)) for key, value in values.items()])
@@ -0,0 +1,68 @@
+# src/memory/track_binding.py
+
+
+class TrackIdentityBinding:
+    """
+    Sticky ByteTrack track_id -> global_id table.
+
+    Once a track has been resolved to a global ID the pipeline reuses that
+    binding instead of asking the LLM again. Bindings expire after the track
+    has been unseen for `max_age` frames (ByteTrack drops lost tracks after
+    `track_buffer` frames, so its ids cannot come back later), and with a
+    non-zero `reverify_interval` a bound track is re-matched every N frames.
+    """
+
+    def __init__(self, max_age=30, reverify_interval=0):
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.bindings = {}  # {track_id: {"global_id": ..., "bound_frame": ..., "last_seen": ...}}
+        self.hits = 0
+        self.misses = 0
+        self.reverifications = 0
+        self.expired = 0
+        self._last_expiry_frame = None
+
+    def lookup(self, track_id, frame_id):
+        """Return the bound global ID for `track_id`, or None if it must be (re)resolved."""
+        self._expire(frame_id)
+        binding = self.bindings.get(track_id) if track_id is not None else None
+        if binding is None:
+            self.misses += 1
+            return None
+        binding["last_seen"] = frame_id
+
+        if self.reverify_interval and frame_id - binding["bound_frame"] >= self.reverify_interval:
+            self.reverifications += 1
+            return None
+        self.hits += 1
+        return binding["global_id"]
+
+    def bind(self, track_id, global_id, frame_id):
+        """Bind `track_id` to `global_id`; returns the previously bound ID (if any)."""
+        if track_id is None or global_id is None:
+            return None
+        previous = self.bindings.get(track_id)
+        self.bindings[track_id] = {"global_id": global_id, "bound_frame": frame_id, "last_seen": frame_id}
+        return previous["global_id"] if previous else None
+
+    def get(self, track_id):
+        binding = self.bindings.get(track_id)
+        return binding["global_id"] if binding else None
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "reverifications": self.reverifications,
+            "expired": self.expired,
+            "bound_tracks": len(self.bindings),
+        }
+
+    def _expire(self, frame_id):
+        if self.max_age is None or frame_id == self._last_expiry_frame:
+            return
+        self._last_expiry_frame = frame_id
+        stale = [tid for tid, b in self.bindings.items() if frame_id - b["last_seen"] > self.max_age]
+        for tid in stale:
+            del self.bindings[tid]
+        self.expired += len(stale)
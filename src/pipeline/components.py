@@ -0,0 +1,135 @@
+# src/pipeline/components.py
+
+import yaml
+from src.detection.quality import BestShotBuffer
+from src.memory.description_cache import TrackDescriptionCache
+from src.memory.memory import build_memory
+from src.memory.track_binding import TrackIdentityBinding
+
+
+def build_components(config, detector=None, embedder=None, descriptor=None, matcher=None):
+    """
+    Models and per-run matching state described by `config`, as threaded
+    through the pipeline state. Models passed in (e.g. benchmark stubs) are
+    used as they are; the others are loaded. With `model_server.url` set, the
+    descriptor and matcher are clients of the shared serve.py process.
+    """
+    server_url = config.get("model_server", {}).get("url")
+    if server_url and (descriptor is None or matcher is None):
+        # Qwen-VL and the LLM are loaded once by serve.py and shared with other pipelines
+        from src.serving.client import RemoteDescriptor, RemoteMatcher
+        descriptor = descriptor if descriptor is not None else RemoteDescriptor(server_url)
+        matcher = matcher if matcher is not None else RemoteMatcher(server_url)
+    return {
+        "detector": detector if detector is not None else load_detector(config),
+        "embedder": embedder if embedder is not None else load_embedder(config),
+        "descriptor": descriptor if descriptor is not None else load_descriptor(config),
+        "description_cache": build_description_cache(config),
+        "best_shots": build_best_shots(config),
+        "track_binding": build_track_binding(config),
+        "description_matcher": matcher if matcher is not None else load_matcher(config),
+        "memory": build_memory(config),
+    }
+
+
+def make_state(config, components, frame_id, frame, tracked_detections=None):
+    """Fresh per-frame pipeline state sharing the long-lived components."""
+    return {
+        "config": config,
+        "frame_id": frame_id,
+        "frame": frame,
+        "tracked_detections": tracked_detections,
+        **components,
+        "detections": [],
+        "descriptions": [],
+        "embeddings": [],
+        "global_ids": [],
+        "output_frame": None,
+        "frame_matching_details": [],
+    }
+
+
+def load_detector(config):
+    from src.detection.detector_tracker import UltralyticsByteTrack
+    return UltralyticsByteTrack(
+        model_path=config.detection.model_path,
+        tracker_cfg=config.tracking.tracker_cfg,
+        persist=config.tracking.persist,
+        device=config.device,
+        batch_size=getattr(config.detection, "batch_size", 1),
+        imgsz=getattr(config.detection, "imgsz", 640),
+        half_resolution=getattr(config.detection, "half_resolution", False),
+    )
+
+
+def load_embedder(config):
+    from src.embedding.clip_embedder import ClipEmbedder
+    return ClipEmbedder(
+        model_path=config.embedding.model_path,
+        device=config.device
+    )
+
+
+def load_descriptor(config):
+    from src.embedding.qwen_embedder import QwenEmbedder
+    return QwenEmbedder(
+        device_map     = config.device,
+        max_batch_size = getattr(config.description, "max_batch_size", 8),
+        resized_width  = getattr(config.description, "resized_width", 224),
+        resized_height = getattr(config.description, "resized_height", 448),
+        prefix_cache   = getattr(config.description, "prefix_cache", False),
+    )
+
+
+def load_matcher(config):
+    from src.agent.orchestration_agent import OrchestrationAgent
+    return OrchestrationAgent(
+        model_name = config.llm.llm_model,
+        quant      = getattr(config.llm, "quant", "4bit"),
+        max_new_tokens = getattr(config.llm, "max_new_tokens", 96),
+        device_map = getattr(config.llm, "device_map", "auto"),
+        prefix_cache = getattr(config.llm, "prefix_cache", True),
+        constrained  = getattr(config.llm, "constrained_json", True),
+        reasoning_max_chars = getattr(config.llm, "reasoning_max_chars", 240),
+        max_batch_size = getattr(config.llm, "max_batch_size", 8),
+    )
+
+
+def build_description_cache(config):
+    if not config.description_cache.enabled:
+        return None
+    cache_cfg = config.description_cache
+    return TrackDescriptionCache(
+        policy           = cache_cfg.policy,
+        first_n          = getattr(cache_cfg, "first_n", 1),
+        every_k          = getattr(cache_cfg, "every_k", 150),
+        drift_threshold  = getattr(cache_cfg, "drift_threshold", 0.35),
+        quality_margin   = getattr(cache_cfg, "quality_margin", 1.5),
+        max_descriptions = getattr(cache_cfg, "max_descriptions", 3),
+        max_age          = getattr(cache_cfg, "max_age", 90),
+    )
+
+
+def build_best_shots(config):
+    quality_cfg = config.get("quality", {})
+    if not quality_cfg.get("enabled", False):
+        return None
+    return BestShotBuffer(
+        window      = quality_cfg.get("window", 8),
+        min_quality = quality_cfg.get("min_quality", 0.2),
+        max_age     = quality_cfg.get("max_age", 30),
+    )
+
+
+def build_track_binding(config):
+    if not config.identity_binding.enabled:
+        return None
+    max_age = getattr(config.identity_binding, "max_age", None)
+    if max_age is None:
+        # ByteTrack forgets lost tracks after track_buffer frames, so their IDs cannot come back later
+        with open(config.tracking.tracker_cfg, "r") as f:
+            max_age = yaml.safe_load(f).get("track_buffer", 30)
+    return TrackIdentityBinding(
+        max_age           = max_age,
+        reverify_interval = getattr(config.identity_binding, "reverify_interval", 0),
+    )
@@ -0,0 +1,184 @@
+# src/pipeline/deferred.py
+
+import json
+import queue
+import threading
+import time
+
+import cv2
+
+from src.pipeline.graph import (
+    embedding_node,
+    description_node,
+    id_assignment_description_node,
+    output_node,
+)
+
+
+class DeferredIdentityResolver:
+    """
+    Resolves ByteTrack tracks to global IDs in a background worker so the
+    video path only runs detection/tracking and drawing.
+
+    The video path calls `submit` with each frame's detections; crops of
+    tracks that are neither resolved nor already queued become jobs, and the
+    worker runs the usual embedding -> description -> id_assignment nodes on
+    them. Until a track resolves it is drawn with a provisional track label.
+    Every resolution is appended to `relabel_log`, and `track_log` keeps the
+    boxes of every frame so `rerender` can redraw the whole video afterwards
+    with the final IDs, including the frames before each track resolved.
+    """
+
+    def __init__(self, components, config, max_pending=32):
+        self.components = components  # descriptor, embedder, memory, description_matcher, ...
+        self.config = config
+        self.jobs = queue.Queue(maxsize=max_pending)
+        self.lock = threading.Lock()
+        self.resolved = {}        # {track_id: global_id}
+        self.pending = set()      # track_ids queued or being resolved
+        self.relabel_log = []     # [{"track_id", "global_id", "first_frame", "resolved_frame", "latency_s"}]
+        self.track_log = []       # [{"frame_id", "tracks": [[track_id, x1, y1, x2, y2], ...]}]
+        self.first_seen = {}      # {track_id: frame_id}
+        self.dropped = 0
+        self.latest_frame = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._work, name="identity-resolver", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame_id, detections, frame_buffer=None):
+        """Queue unresolved tracks of this frame; never blocks the video path."""
+        self.latest_frame = frame_id
+        self.track_log.append({
+            "frame_id": frame_id,
+            "tracks": [[det["track_id"], *det["bbox"]] for det in detections],
+        })
+        with self.lock:
+            for det in detections:
+                self.first_seen.setdefault(det["track_id"], frame_id)
+            todo = [det for det in detections
+                    if det["track_id"] is not None
+                    and det["crop"] is not None and min(det["crop"].shape[:2]) > 10
+                    and det["track_id"] not in self.resolved
+                    and det["track_id"] not in self.pending]
+            if not todo:
+                return
+            try:
+                self.jobs.put_nowait((frame_id, time.perf_counter(), todo, frame_buffer))
+            except queue.Full:
+                self.dropped += 1  # these tracks are offered again on a later frame
+                return
+            self.pending.update(det["track_id"] for det in todo)
+
+    def label(self, track_id):
+        """Final global ID for `track_id`, or None while it is still unresolved."""
+        with self.lock:
+            return self.resolved.get(track_id)
+
+    def drain(self, timeout=None):
+        """Wait until every queued job has been resolved (or `timeout` seconds pass)."""
+        deadline = time.perf_counter() + timeout if timeout is not None else None
+        while True:
+            with self.lock:
+                if not self.pending:
+                    return True
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            time.sleep(0.05)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join(timeout=5.0)
+
+    def save_logs(self, path):
+        """Write the relabel log as JSON lines."""
+        with open(path, "w") as f:
+            for entry in self.relabel_log:
+                f.write(json.dumps(entry) + "\n")
+
+    def stats(self):
+        with self.lock:
+            latencies = [e["latency_s"] for e in self.relabel_log]
+            resolved, pending = len(self.resolved), len(self.pending)
+        return {
+            "resolved_tracks": resolved,
+            "pending_tracks": pending,
+            "dropped_submissions": self.dropped,
+            "mean_latency_s": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+        }
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                frame_id, submitted, detections, frame_buffer = self.jobs.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                global_ids = self._resolve(frame_id, detections, frame_buffer)
+            except Exception as e:
+                print(f"[Deferred] resolving frame {frame_id} failed: {e}")
+                global_ids = [None] * len(detections)
+
+            with self.lock:
+                for det, gid in zip(detections, global_ids):
+                    track_id = det["track_id"]
+                    self.pending.discard(track_id)
+                    if gid is None:
+                        continue  # bad crop / no description yet: retried on a later frame
+                    self.resolved[track_id] = gid
+                    self.relabel_log.append({
+                        "track_id": track_id,
+                        "global_id": gid,
+                        "first_frame": self.first_seen.get(track_id, frame_id),
+                        "resolved_frame": self.latest_frame,
+                        "latency_s": round(time.perf_counter() - submitted, 3),
+                    })
+
+    def _resolve(self, frame_id, detections, frame_buffer=None):
+        state = {
+            "config": self.config,
+            "frame_id": frame_id,
+            "frame": None,
+            "frame_buffer": frame_buffer,
+            **self.components,
+            "detections": detections,
+            "descriptions": [],
+            "embeddings": [],
+            "global_ids": [],
+            "frame_matching_details": [],
+        }
+        state = embedding_node(state)
+        state = description_node(state)
+        state = id_assignment_description_node(state)
+        # Invalid crops still get an ID from the matcher; only keep IDs backed by a description
+        return [gid if desc not in (None, "[Invalid crop]") else None
+                for gid, desc in zip(state["global_ids"], state["descriptions"])]
+
+
+def rerender(video_path, output_path, track_log, resolved):
+    """
+    Second rendering pass: redraw every frame of `video_path` with the final
+    track -> global ID mapping, so labels are consistent from a track's first frame.
+    """
+    boxes_by_frame = {entry["frame_id"]: entry["tracks"] for entry in track_log}
+    cap = cv2.VideoCapture(video_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    out = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*"mp4v"), fps, (width, height))
+
+    frame_id = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        tracks = boxes_by_frame.get(frame_id, [])
+        state = {
+            "frame": frame,
+            "detections": [{"track_id": t[0], "bbox": t[1:]} for t in tracks],
+            "global_ids": [resolved.get(t[0]) for t in tracks],
+        }
+        out.write(output_node(state)["output_frame"])
+        frame_id += 1
+
+    cap.release()
+    out.release()
@@ -3,6 +3,10 @@
 from sre_parse import State
 from langgraph.graph import StateGraph, START, END
 from src.utils.viz import draw_detections
+from src.memory.description_cache import appearance_signature
+from src.detection.quality import score_detections
+from src.utils.frame_buffer import FrameBuffer
+from src.detection.detections import Detections
 import cv2
 from PIL import Image
 import time
@@ -48,39 +52,129 @@ def detection_node(state):
     """
     detector = state["detector"]
     conf_thresh = state["config"].detection.confidence_threshold
-    detections = detector.track_frame(state["frame"])
-    state["detections"] = [d for d in detections if d["confidence"] >= conf_thresh]
+    results = state.get("result_cache")
+    # BGR->RGB conversion, device upload and crop views are shared by the later nodes
+    frame_buffer = state["frame_buffer"] = FrameBuffer(state["frame"])
+    detections = state.get("tracked_detections")  # already tracked in a batch (UltralyticsByteTrack.track_frames)
+    if detections is None and results is not None:
+        # Unfiltered tracker output is cached, so confidence-threshold sweeps still hit
+        cached = results.get("detections", state["video_hash"], state["frame_id"])
+        if cached is not None:
+            detections = Detections.from_records(state["frame"], cached)
+    if detections is None:
+        detections = detector.track_frame(state["frame"])
+        if not isinstance(detections, Detections):
+            detections = Detections.from_records(state["frame"], [
+                (d["track_id"], d["bbox"], d["confidence"]) for d in detections])
+        if results is not None:
+            results.put("detections", state["video_hash"], state["frame_id"], detections.records())
+    state["detections"] = detections[detections.confidences >= conf_thresh]
     return state
 
 def embedding_node(state):
     """
     Extracts embeddings for each detected person.
     """
-    embedder = state["embedder"]
-    embeddings = []
-    for det in state["detections"]:
-        crop = det["crop"]  # Assumes detector saves the crop in each detection
-        embedding = embedder.get_embedding(crop)
-        embeddings.append(embedding)
+    embedder = state.get("embedder")
+    if embedder is None:
+        state["embeddings"] = [None] * len(state["detections"])
+        return state
+    detections = state["detections"]
+    results = state.get("result_cache")
+    embeddings = [None] * len(detections)
+    # Assumes detector saves the crop in each detection; all valid crops go through one forward pass
+    valid = [i for i, det in enumerate(detections) if det["crop"] is not None]
+    if results is not None:
+        for i in valid:
+            embeddings[i] = results.get("embedding", state["video_hash"], state["frame_id"], detections[i]["bbox"])
+        valid = [i for i in valid if embeddings[i] is None]
+    frame_buffer = state.get("frame_buffer")
+    if frame_buffer is not None and hasattr(embedder, "get_embeddings_from_frame"):
+        # Crops are cut and resized on the device from one upload of the frame
+        batch = embedder.get_embeddings_from_frame(frame_buffer, [detections[i]["bbox"] for i in valid])
+    else:
+        batch = embedder.get_embeddings([detections[i]["crop"] for i in valid])
+    for row, i in enumerate(valid):
+        embeddings[i] = batch[row]
+        if results is not None:
+            results.put("embedding", state["video_hash"], state["frame_id"], batch[row], bbox=detections[i]["bbox"])
     state["embeddings"] = embeddings
-    print(f"Frame {state['frame_id']}: {len(embeddings)} embeddings, shapes: {[e.shape for e in embeddings]}")
+    print(f"Frame {state['frame_id']}: {len(valid)} embeddings, batch shape: {batch.shape}")
     return state
 
 def description_node(state):
     descriptor = state["descriptor"]
     detections = state["detections"]
+    cache = state.get("description_cache")
+    best_shots = state.get("best_shots")
+    results = state.get("result_cache")
+    frame_buffer = state.get("frame_buffer")
+    frame_id = state["frame_id"]
+    qualities = crop_qualities(state)
     crops = []
-    for det in detections:
+    descriptions = []
+    refreshed = [False] * len(detections)  # track's cached description replaced on this frame
+    cache_keys = []  # (track_id, quality, signature) per crop sent to the VLM
+    sources = []     # (frame_id, bbox) each crop sent to the VLM was cut from
+    for i, det in enumerate(detections):
         crop = det["crop"]
-        if crop is not None and crop.shape[0] > 10 and crop.shape[1] > 10:
-            pil_crop = Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB))
-            crops.append(pil_crop)
-        else:
+        track_id = det["track_id"]
+        if crop is None or crop.shape[0] <= 10 or crop.shape[1] <= 10:
+            crops.append(None)
+            descriptions.append("[Invalid crop]")
+            cache_keys.append(None)
+            sources.append(None)
+            continue
+
+        quality = qualities[i]
+        signature = None
+        if cache is not None:
+            signature = appearance_signature(crop) if cache.needs_signature() else None
+            cached = cache.lookup(track_id, frame_id, quality, signature)
+            if cached is None and best_shots is not None and quality < best_shots.min_quality:
+                # Too poor a crop to replace an existing description
+                cached = cache.get(track_id)
+            if cached is not None:
+                crops.append(None)
+                descriptions.append(cached)
+                cache_keys.append(None)
+                sources.append(None)
+                continue
+
+        source = (frame_id, det["bbox"])
+        if best_shots is not None and track_id is not None:
+            # Hold the track's crops for a window and describe only the best one
+            best_shots.offer(track_id, frame_id, quality, crop, signature, source)
+            ready = best_shots.pop_ready(track_id, frame_id)
+            if ready is None:
+                crops.append(None)
+                descriptions.append(cache.get(track_id) if cache is not None else None)
+                cache_keys.append(None)
+                sources.append(None)
+                continue
+            crop, quality, signature, source = ready
+
+        stored = results.get("description", state["video_hash"], *source) if results is not None else None
+        if stored is not None:
+            # Described in an earlier run with the same model and prompt
+            if cache is not None:
+                refreshed[i] = cache.store(track_id, frame_id, stored, quality, signature)
             crops.append(None)
+            descriptions.append(stored)
+            cache_keys.append(None)
+            sources.append(None)
+            continue
 
-    # Only pass valid crops to the batch function
+        cache_keys.append((track_id, quality, signature) if cache is not None else None)
+        if frame_buffer is not None and source[0] == frame_id:
+            crops.append(frame_buffer.pil(source[1]))  # from the frame's single RGB conversion
+        else:
+            crops.append(Image.fromarray(cv2.cvtColor(crop, cv2.COLOR_BGR2RGB)))  # best shot of an earlier frame
+        descriptions.append(None)
+        sources.append(source)
+
+    # Only pass crops that missed the cache to the batch function
     valid_crops = [c for c in crops if c is not None]
-    descriptions = ["[Invalid crop]" if c is None else None for c in crops]
 
     if valid_crops:
         start = time.time()
@@ -93,30 +187,61 @@ def description_node(state):
             if c is not None:
                 description = batch_descriptions[idx]
                 descriptions[i] = extract_json_from_reply(description)
-                print(f"[Frame {state['frame_id']}] Person {i} description: {descriptions[i]}")
+                print(f"[Frame {frame_id}] Person {i} description: {descriptions[i]}")
+                if cache_keys[i] is not None:
+                    track_id, quality, signature = cache_keys[i]
+                    refreshed[i] = cache.store(track_id, frame_id, descriptions[i], quality, signature)
+                if results is not None and descriptions[i] is not None:
+                    results.put("description", state["video_hash"], sources[i][0], descriptions[i],
+                                bbox=sources[i][1])
                 idx += 1
 
+    if cache is not None:
+        print(f"[Cache] descriptions: {cache.stats()}")
+
     state["descriptions"] = descriptions
+    state["refreshed_descriptions"] = refreshed
     return state
 
+def crop_qualities(state):
+    """
+    Quality score per detection: the vectorized crop-quality scorer when a
+    best-shot buffer is configured and the frame is available, otherwise
+    crop area x detection confidence.
+    """
+    detections = state["detections"]
+    if state.get("best_shots") is not None and state.get("frame") is not None and len(detections):
+        qcfg = state["config"].get("quality", {})
+        quality, _ = score_detections(
+            state["frame"],
+            [det["bbox"] for det in detections],
+            [det["confidence"] for det in detections],
+            reference_height = qcfg.get("reference_height", 256),
+            blur_reference   = qcfg.get("blur_reference", 100.0),
+        )
+        return quality.tolist()
+    return [det["crop"].shape[0] * det["crop"].shape[1] * det["confidence"] if det["crop"] is not None else 0.0
+            for det in detections]
+
 def id_assignment_node(state):
     """Assign global IDs to detections based on embedding similarity."""
     memory = state["memory"]
     embeddings = state["embeddings"]
-    global_ids = []
+    global_ids = [None] * len(embeddings)
 
-    for embedding in embeddings:
-        # Try to find a match in memory
-        matched_id, score = memory.find_match(embedding)
-        
+    # Match the whole frame at once so two detections cannot claim the same ID
+    valid = [i for i, e in enumerate(embeddings) if e is not None]
+    matched_ids, scores = memory.find_matches([embeddings[i] for i in valid])
+
+    for i, matched_id, score in zip(valid, matched_ids, scores):
         if matched_id is not None:
             # Found a match
-            global_ids.append(matched_id)
+            global_ids[i] = matched_id
             print(f"Frame {state['frame_id']}: Matched embedding with global ID {matched_id} (score: {score:.3f})")
         else:
             # No match found, add new person to memory
-            new_id = memory.add_person(embedding)
-            global_ids.append(new_id)
+            new_id = memory.add_person(embeddings[i])
+            global_ids[i] = new_id
             print(f"Frame {state['frame_id']}: Added new person with global ID {new_id}")
 
     state["global_ids"] = global_ids
@@ -126,24 +251,64 @@ def id_assignment_description_node(state):
     memory = state["memory"]
     matcher = state["description_matcher"]
     descriptions = state["descriptions"]
+    detections = state["detections"]
+    embeddings = state.get("embeddings") or [None] * len(descriptions)
+    binding = state.get("track_binding")
+    refreshed = state.get("refreshed_descriptions") or [False] * len(descriptions)
     frame_matching_details = state["frame_matching_details"]
-    global_ids = []
+    global_ids = [None] * len(descriptions)
 
+    pending = []  # detections that need matching against memory
+    results = []
     for i, description in enumerate(descriptions):
+        track_id = detections[i]["track_id"]
+        if binding is not None:
+            bound_id = binding.lookup(track_id, state["frame_id"])
+            if bound_id is not None:
+                global_ids[i] = bound_id
+                if refreshed[i] and description not in (None, "[Invalid crop]"):
+                    # Re-described while bound: keep the gallery entry in step for later cross-track matches
+                    memory.update_person(bound_id, description=description)
+                continue
+
+        if description is None:
+            # No description yet (best shot still being collected or unparseable reply)
+            continue
+        pending.append(i)
+
+    if pending:
+        # All of the frame's descriptions are matched together (one batched LLM call)
         start = time.time()
-        matched_id, confidence, reasoning = memory.find_match_by_description(description, matcher)
+        results = memory.find_matches_by_description(
+            [descriptions[i] for i in pending], matcher,
+            embeddings=[embeddings[i] for i in pending],
+            taken={gid for gid in global_ids if gid is not None},
+        )
         end = time.time()
-        print(f"[Timing] LLM comparison took {end - start:.2f} seconds for one description")
+        print(f"[Timing] LLM comparison took {end - start:.2f} seconds for {len(pending)} descriptions")
+
+    for i, (matched_id, confidence, reasoning) in zip(pending, results):
+        description = descriptions[i]
+        track_id = detections[i]["track_id"]
         print(matched_id, confidence, reasoning)
         if matched_id is not None:
-            global_ids.append(matched_id)
+            global_ids[i] = matched_id
             frame_matching_details.append([matched_id, matched_id, confidence, reasoning])
             print(f"[Frame {state['frame_id']}] Person {i} LLM match: {matched_id}, confidence: {confidence}, reasoning: {reasoning}")
         else:
-            new_id = memory.add_person(embedding=None, description=description)
-            global_ids.append(new_id)
+            new_id = memory.add_person(embedding=embeddings[i], description=description)
+            global_ids[i] = new_id
             frame_matching_details.append([new_id, matched_id, confidence, reasoning])
             print(f"Frame {state['frame_id']}: Added new person with global ID {new_id}")
+
+        # Only bind tracks resolved from a real description, so bad crops get another chance
+        if binding is not None and description != "[Invalid crop]":
+            previous_id = binding.bind(track_id, global_ids[i], state["frame_id"])
+            if previous_id is not None and previous_id != global_ids[i]:
+                print(f"[Frame {state['frame_id']}] Track {track_id} re-bound from ID {previous_id} to {global_ids[i]}")
+
+    if binding is not None:
+        print(f"[Binding] {binding.stats()}")
     state["global_ids"] = global_ids
     return state
     
@@ -238,6 +403,18 @@ def output_node(state):
     state["frame_matching_details"] = []
     return state
 """
+def deferred_assignment_node(state):
+    """
+    Video-rate replacement for embedding/description/id_assignment: hands
+    unresolved tracks to the background DeferredIdentityResolver and labels
+    each detection with whatever global ID its track has resolved to so far.
+    """
+    resolver = state["identity_resolver"]
+    detections = state["detections"]
+    resolver.submit(state["frame_id"], detections, state.get("frame_buffer"))
+    state["global_ids"] = [resolver.label(det["track_id"]) for det in detections]
+    return state
+
 def output_node(state):
     frame      = state["frame"].copy()
     detections = state.get("detections", [])
@@ -245,16 +422,20 @@ def output_node(state):
 
     for det, gid in zip(detections, global_ids):
         x1, y1, x2, y2 = det["bbox"]
-        label          = f"GlobalID:{gid}"
-        cv2.rectangle(frame, (x1, y1), (x2, y2), (0,255,0), 2)
+        if gid is not None:
+            label, color = f"GlobalID:{gid}", (0,255,0)
+        else:
+            # Not resolved (yet): show the provisional tracker label
+            label, color = f"Track:{det['track_id']}?", (0,200,255)
+        cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
         text_y = max(0, y1 - 10)
         cv2.putText(
             frame, label, (x1, text_y),
-            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0,255,0), 2
+            cv2.FONT_HERSHEY_SIMPLEX, 0.5, color, 2
         )
 
-    state["output_frame"]           = frame
-    state["frame_matching_details"] = []    # clear safely as a list
+    # frame_matching_details is left in place for RunRecorder; every frame starts from a fresh state
+    state["output_frame"] = frame
     return state
 
 # Build the LangGraph
@@ -271,14 +452,34 @@ graph.add_edge("id_assignment", "output")
 graph.add_edge("output", END)
 pipeline = graph.compile()
 """
-graph = StateGraph(dict)
-graph.add_node("detection", detection_node)
-graph.add_node("description", description_node)
-graph.add_node("id_assignment", id_assignment_description_node)
-graph.add_node("output", output_node)
-graph.add_edge(START, "detection")
-graph.add_edge("detection", "description")
-graph.add_edge("description", "id_assignment")  
-graph.add_edge("id_assignment", "output")     
-graph.add_edge("output", END)
-pipeline = graph.compile()
\ No newline at end of file
+# Nodes of the description-matching pipeline, in execution order
+PIPELINE_STAGES = [
+    ("detection", detection_node),
+    ("embedding", embedding_node),
+    ("description", description_node),
+    ("id_assignment", id_assignment_description_node),
+    ("output", output_node),
+]
+
+def build_pipeline(stages=PIPELINE_STAGES, instrumentation=None):
+    """Chain `stages` into a linear LangGraph, each node wrapped by `instrumentation` if given."""
+    if instrumentation is not None:
+        stages = instrumentation.wrap_stages(stages)
+    graph = StateGraph(dict)
+    previous = START
+    for name, node in stages:
+        graph.add_node(name, node)
+        graph.add_edge(previous, name)
+        previous = name
+    graph.add_edge(previous, END)
+    return graph.compile()
+
+pipeline = build_pipeline()
+
+# Detection/tracking at video rate; identities resolve in a background worker
+DEFERRED_PIPELINE_STAGES = [
+    ("detection", detection_node),
+    ("deferred_assignment", deferred_assignment_node),
+    ("output", output_node),
+]
+deferred_pipeline = build_pipeline(DEFERRED_PIPELINE_STAGES)
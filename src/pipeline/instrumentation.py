@@ -0,0 +1,207 @@
+# src/pipeline/instrumentation.py
+
+import json
+import math
+import os
+import threading
+import time
+
+try:
+    import torch
+except ImportError:  # CPU-only tools (replay, benchmarks) still get wall times
+    torch = None
+
+# Counters read from the pipeline components before and after every node; a
+# node's event records how much each one moved while it ran.
+COUNTERS = [
+    ("description_cache", "hits", "description_cache_hits"),
+    ("description_cache", "misses", "description_cache_misses"),
+    ("track_binding", "hits", "binding_hits"),
+    ("track_binding", "misses", "binding_misses"),
+    ("descriptor", "prefill.prompt_tokens", "vlm_prompt_tokens"),
+    ("descriptor", "prefill.cached_tokens", "vlm_cached_tokens"),
+    ("descriptor", "prefill.generated_tokens", "vlm_generated_tokens"),
+    ("description_matcher", "prefill.prompt_tokens", "llm_prompt_tokens"),
+    ("description_matcher", "prefill.cached_tokens", "llm_cached_tokens"),
+    ("description_matcher", "prefill.generated_tokens", "llm_generated_tokens"),
+]
+
+
+def _read(component, path):
+    for attr in path.split("."):
+        component = getattr(component, attr, None)
+        if component is None:
+            return 0
+    return component
+
+
+def snapshot_counters(state):
+    counters = {}
+    for key, path, name in COUNTERS:
+        component = state.get(key)
+        if component is not None:
+            counters[name] = _read(component, path)
+    results = state.get("result_cache")
+    if results is not None:
+        for kind, n in results.hits.items():
+            counters[f"result_cache_{kind}_hits"] = n
+        for kind, n in results.misses.items():
+            counters[f"result_cache_{kind}_misses"] = n
+    return counters
+
+
+class Histogram:
+    """Log-scale latency histogram: 4 buckets per doubling from 10 us, plus count / sum / max."""
+
+    BUCKETS_PER_OCTAVE = 4
+    BASE_MS = 0.01
+
+    def __init__(self):
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, ms):
+        bucket = max(0, math.floor(self.BUCKETS_PER_OCTAVE * math.log2(max(ms, self.BASE_MS) / self.BASE_MS)))
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += ms
+        self.max = max(self.max, ms)
+
+    def percentile(self, q):
+        """Upper edge of the bucket holding the q-th percentile (within ~19% of the true value)."""
+        if not self.count:
+            return 0.0
+        rank = q / 100 * self.count
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return min(self.BASE_MS * 2 ** ((bucket + 1) / self.BUCKETS_PER_OCTAVE), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50), 3),
+            "p90_ms": round(self.percentile(90), 3),
+            "p99_ms": round(self.percentile(99), 3),
+            "max_ms": round(self.max, 3),
+        }
+
+
+class Instrumentation:
+    """
+    Wraps pipeline nodes to record, per node call: wall time, GPU time (CUDA
+    events around the node, when `gpu_timing` and CUDA are available), the
+    number of detections, and the change in cache hit/miss and token counters
+    of the components in the state. Times are aggregated into per-node
+    histograms (`summary()`), and with `trace_path` every call is also written
+    as it happens: one JSON object per line (`format="jsonl"`), or a Chrome
+    trace (`format="chrome"`, open in chrome://tracing or Perfetto).
+
+    Only pipelines built with `build_pipeline(..., instrumentation=...)` are
+    wrapped, so a disabled instrumentation costs nothing. Thread-safe, so the
+    streaming stages can share one instance.
+    """
+
+    def __init__(self, trace_path=None, format="chrome", gpu_timing=True):
+        self.format = format
+        self.gpu_timing = gpu_timing and torch is not None and torch.cuda.is_available()
+        self.histograms = {}      # {node: Histogram of wall ms}
+        self.gpu_histograms = {}  # {node: Histogram of GPU ms}
+        self.totals = {}          # {node: {counter: sum of deltas}}
+        self.lock = threading.Lock()
+        self.origin = time.perf_counter()
+        self.trace = None
+        self._first_event = True
+        if trace_path:
+            os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+            self.trace = open(trace_path, "w")
+            if format == "chrome":
+                self.trace.write("[\n")
+
+    def wrap(self, name, node):
+        def run(state):
+            before = snapshot_counters(state)
+            if self.gpu_timing:
+                start_event = torch.cuda.Event(enable_timing=True)
+                end_event = torch.cuda.Event(enable_timing=True)
+                start_event.record()
+            start = time.perf_counter()
+            state = node(state)
+            if self.gpu_timing:
+                end_event.record()
+                end_event.synchronize()
+            end = time.perf_counter()
+            gpu_ms = start_event.elapsed_time(end_event) if self.gpu_timing else None
+            after = snapshot_counters(state)
+            counters = {key: value - before.get(key, 0) for key, value in after.items()
+                        if value != before.get(key, 0)}
+            self.record(name, state.get("frame_id"), start, end, gpu_ms, len(state.get("detections") or ()), counters)
+            return state
+        return run
+
+    def wrap_stages(self, stages):
+        return [(name, self.wrap(name, node)) for name, node in stages]
+
+    def record(self, name, frame_id, start, end, gpu_ms, items, counters):
+        wall_ms = (end - start) * 1e3
+        with self.lock:
+            self.histograms.setdefault(name, Histogram()).add(wall_ms)
+            if gpu_ms is not None:
+                self.gpu_histograms.setdefault(name, Histogram()).add(gpu_ms)
+            totals = self.totals.setdefault(name, {})
+            for key, value in counters.items():
+                totals[key] = totals.get(key, 0) + value
+            if self.trace is not None:
+                self._write(name, frame_id, start, wall_ms, gpu_ms, items, counters)
+
+    def _write(self, name, frame_id, start, wall_ms, gpu_ms, items, counters):
+        # Caller holds the lock
+        args = {"frame_id": frame_id, "items": items, **counters}
+        if gpu_ms is not None:
+            args["gpu_ms"] = round(gpu_ms, 3)
+        if self.format == "chrome":
+            event = {"name": name, "cat": "node", "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                     "ts": round((start - self.origin) * 1e6, 1), "dur": round(wall_ms * 1e3, 1), "args": args}
+            self.trace.write(("" if self._first_event else ",\n") + json.dumps(event))
+            self._first_event = False
+        else:
+            self.trace.write(json.dumps({"node": name, "start_s": round(start - self.origin, 6),
+                                         "wall_ms": round(wall_ms, 3), **args}) + "\n")
+
+    def summary(self):
+        with self.lock:
+            return {
+                name: {
+                    **histogram.summary(),
+                    **({"gpu": self.gpu_histograms[name].summary()} if name in self.gpu_histograms else {}),
+                    **self.totals.get(name, {}),
+                }
+                for name, histogram in self.histograms.items()
+            }
+
+    def format_summary(self):
+        lines = []
+        for name, stats in self.summary().items():
+            line = (f"[Trace] {name:<20} n={stats['count']:<6} mean {stats['mean_ms']:.2f} ms | "
+                    f"p50 {stats['p50_ms']:.2f} | p90 {stats['p90_ms']:.2f} | p99 {stats['p99_ms']:.2f}")
+            if "gpu" in stats:
+                line += f" | gpu mean {stats['gpu']['mean_ms']:.2f} ms"
+            counters = {k: v for k, v in stats.items() if k not in Histogram().summary() and k != "gpu"}
+            if counters:
+                line += f" | {counters}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    def close(self):
+        with self.lock:
+            if self.trace is None:
+                return
+            if self.format == "chrome":
+                self.trace.write("\n]\n")
+            self.trace.close()
+            self.trace = None
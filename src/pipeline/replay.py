@@ -0,0 +1,171 @@
+# src/pipeline/replay.py
+
+import json
+import numpy as np
+from src.memory.attributes import AttributeTable, parse_description
+
+
+def _pack_strings(values):
+    """list of str/None -> (utf-8 bytes as uint8, (N+1,) offsets, (N,) present mask)."""
+    encoded = [v.encode("utf-8") if v is not None else b"" for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets, np.array([v is not None for v in values])
+
+
+def _unpack_string(data, offsets, present, i):
+    if not present[i]:
+        return None
+    return data[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+
+class RunRecorder:
+    """
+    Records what identity assignment saw and decided on every frame, and saves
+    it as one columnar .npz: one row per detection (frame, track_id, bbox,
+    confidence, description, whether the description was refreshed, embedding,
+    global_id) plus per-frame
+    frame_matching_details, so `replay` can re-run matching without any model.
+    """
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.meta = dict(meta or {})
+        self.frame_ids = []
+        self.frame_rows = []      # detections per frame
+        self.track_ids = []
+        self.bboxes = []
+        self.confidences = []
+        self.descriptions = []
+        self.refreshed = []       # description replaced the track's cached one (see description_node)
+        self.embeddings = []
+        self.global_ids = []
+        self.details = []         # JSON of frame_matching_details per frame
+
+    def record(self, state):
+        detections = state["detections"]
+        n = len(detections)
+        descriptions = state.get("descriptions") or [None] * n
+        refreshed = state.get("refreshed_descriptions") or [False] * n
+        embeddings = state.get("embeddings") or [None] * n
+        global_ids = state.get("global_ids") or [None] * n
+        self.frame_ids.append(state["frame_id"])
+        self.frame_rows.append(n)
+        for det, description, fresh, embedding, gid in zip(detections, descriptions, refreshed, embeddings,
+                                                            global_ids):
+            self.track_ids.append(det["track_id"] if det["track_id"] is not None else -1)
+            self.bboxes.append(det["bbox"])
+            self.confidences.append(det["confidence"])
+            self.descriptions.append(description)
+            self.refreshed.append(bool(fresh))
+            self.embeddings.append(embedding)
+            self.global_ids.append(gid if gid is not None else -1)
+        self.details.append(json.dumps(state.get("frame_matching_details") or [], default=str))
+
+    def save(self):
+        dim = next((len(e) for e in self.embeddings if e is not None), 0)
+        embeddings = np.zeros((len(self.embeddings), dim), dtype=np.float32)
+        has_embedding = np.array([e is not None for e in self.embeddings], dtype=bool)
+        for row, embedding in enumerate(self.embeddings):
+            if embedding is not None:
+                embeddings[row] = embedding
+        desc_data, desc_offsets, has_description = _pack_strings(self.descriptions)
+        details_data, details_offsets, _ = _pack_strings(self.details)
+        frame_offsets = np.zeros(len(self.frame_rows) + 1, dtype=np.int64)
+        frame_offsets[1:] = np.cumsum(self.frame_rows)
+        np.savez_compressed(
+            self.path,
+            meta=np.array(json.dumps(self.meta, default=str)),
+            frame_ids=np.asarray(self.frame_ids, dtype=np.int64),
+            frame_offsets=frame_offsets,
+            track_ids=np.asarray(self.track_ids, dtype=np.int64),
+            bboxes=np.asarray(self.bboxes, dtype=np.int32).reshape(-1, 4),
+            confidences=np.asarray(self.confidences, dtype=np.float32),
+            global_ids=np.asarray(self.global_ids, dtype=np.int64),
+            embeddings=embeddings,
+            has_embedding=has_embedding,
+            description_data=desc_data,
+            description_offsets=desc_offsets,
+            has_description=has_description,
+            refreshed_descriptions=np.asarray(self.refreshed, dtype=bool),
+            details_data=details_data,
+            details_offsets=details_offsets,
+        )
+        print(f"[Record] {len(self.frame_ids)} frames / {len(self.track_ids)} detections saved to {self.path}")
+
+
+class RunLog:
+    """Read side of a RunRecorder file; `frames()` yields one dict per recorded frame."""
+
+    def __init__(self, path):
+        with np.load(path) as data:
+            self.columns = {key: data[key] for key in data.files}
+        if "refreshed_descriptions" not in self.columns:  # recorded before the column existed
+            self.columns["refreshed_descriptions"] = np.zeros(len(self.columns["track_ids"]), dtype=bool)
+        self.meta = json.loads(str(self.columns["meta"]))
+
+    def __len__(self):
+        return len(self.columns["frame_ids"])
+
+    def frames(self):
+        c = self.columns
+        for f, frame_id in enumerate(c["frame_ids"].tolist()):
+            rows = range(c["frame_offsets"][f], c["frame_offsets"][f + 1])
+            yield {
+                "frame_id": frame_id,
+                "detections": [{
+                    "track_id": int(c["track_ids"][r]) if c["track_ids"][r] >= 0 else None,
+                    "bbox": c["bboxes"][r].tolist(),
+                    "confidence": float(c["confidences"][r]),
+                    "crop": None,
+                } for r in rows],
+                "descriptions": [_unpack_string(c["description_data"], c["description_offsets"],
+                                                c["has_description"], r) for r in rows],
+                "refreshed_descriptions": [bool(c["refreshed_descriptions"][r]) for r in rows],
+                "embeddings": [c["embeddings"][r] if c["has_embedding"][r] else None for r in rows],
+                "global_ids": [int(c["global_ids"][r]) if c["global_ids"][r] >= 0 else None for r in rows],
+                "frame_matching_details": json.loads(_unpack_string(
+                    c["details_data"], c["details_offsets"], np.ones(len(self), dtype=bool), f)),
+            }
+
+
+class OfflineMatcher:
+    """
+    Model-free stand-in for OrchestrationAgent during replay: picks the
+    candidate with the best weighted attribute score (see AttributeTable),
+    accepting it at or above `threshold`. Lets the description path be replayed
+    on a CPU box; use the real agent to reproduce LLM decisions exactly.
+    """
+
+    def __init__(self, threshold=0.75):
+        self.threshold = threshold
+
+    def compare_descriptions(self, new_description, existing_descriptions):
+        record = parse_description(new_description)
+        if record is None:
+            return None, "low", "Offline replay: description could not be parsed."
+        table = AttributeTable()
+        for gid, description in existing_descriptions.items():
+            candidate = parse_description(description)
+            if candidate is not None:
+                table.add(gid, candidate)
+        if not len(table):
+            return None, "low", "Offline replay: no comparable candidates."
+        ids, scores, _ = table.score(record)
+        best = int(np.argmax(scores))
+        if scores[best] < self.threshold:
+            return None, "medium", f"Offline replay: best attribute score {scores[best]:.2f} below {self.threshold}."
+        confidence = "high" if scores[best] >= 0.9 else "medium"
+        return int(ids[best]), confidence, f"Offline replay: attribute score {scores[best]:.2f}."
+
+
+def id_switches(track_ids, global_ids):
+    """Number of times a track's global ID changes between consecutive detections."""
+    last, switches = {}, 0
+    for track_id, gid in zip(track_ids, global_ids):
+        if track_id is None or gid is None:
+            continue
+        if track_id in last and last[track_id] != gid:
+            switches += 1
+        last[track_id] = gid
+    return switches
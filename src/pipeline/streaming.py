@@ -0,0 +1,188 @@
+# src/pipeline/streaming.py
+
+import queue
+import threading
+import time
+
+from src.pipeline.graph import PIPELINE_STAGES
+
+_DONE = object()  # end-of-stream marker passed down the queues
+
+
+class StageStats:
+    """Throughput and input-queue depth counters for one streaming stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.processed = 0
+        self.busy = 0.0          # seconds spent inside the stage function
+        self.depth_total = 0     # sum of input-queue depths sampled before each item
+        self.depth_max = 0
+        self.lock = threading.Lock()
+
+    def record(self, busy, depth):
+        with self.lock:
+            self.processed += 1
+            self.busy += busy
+            self.depth_total += depth
+            self.depth_max = max(self.depth_max, depth)
+
+    def snapshot(self, wall):
+        with self.lock:
+            return {
+                "processed": self.processed,
+                "busy_s": round(self.busy, 3),
+                "items_per_s": round(self.processed / self.busy, 2) if self.busy else 0.0,
+                "utilization": round(self.busy / wall, 3) if wall else 0.0,
+                "avg_queue": round(self.depth_total / self.processed, 2) if self.processed else 0.0,
+                "max_queue": self.depth_max,
+            }
+
+
+class StreamingPipeline:
+    """
+    Runs decode -> pipeline nodes -> encode as separate threads connected by
+    bounded queues. A full queue blocks its producer (back-pressure), so at
+    most `queue_size` frames wait between any two stages. Every stage is a
+    single thread fed in order, and the writer additionally reorders by
+    frame_id, so frames are written in their original order.
+
+    The stage whose input queue stays full (high avg_queue) while it shows
+    the highest utilization is the bottleneck.
+    """
+
+    def __init__(self, stages=PIPELINE_STAGES, queue_size=4):
+        self.stages = list(stages)
+        self.queue_size = queue_size
+        self.stats = {name: StageStats(name) for name in ["decode", *[n for n, _ in self.stages], "encode"]}
+        self.queues = []
+        self.started = None
+        self._errors = []
+        self._stop = threading.Event()
+
+    def run(self, frames, make_state, write, on_frame=None):
+        """
+        frames:      iterable of (frame_id, frame), e.g. decoded from cv2.VideoCapture
+        make_state:  callable(frame_id, frame) -> initial pipeline state
+        write:       callable(state), called in frame order with the final state
+        on_frame:    optional callable(state) run after each write (progress, logging)
+        """
+        self.started = time.perf_counter()
+        self.queues = [queue.Queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        threads = [threading.Thread(target=self._decode, args=(frames, make_state, self.queues[0]),
+                                    name="decode", daemon=True)]
+        for i, (name, node) in enumerate(self.stages):
+            threads.append(threading.Thread(target=self._stage,
+                                            args=(name, node, self.queues[i], self.queues[i + 1]),
+                                            name=name, daemon=True))
+        for thread in threads:
+            thread.start()
+
+        try:
+            self._encode(self.queues[-1], write, on_frame)
+        finally:
+            self._stop.set()
+            for thread in threads:
+                thread.join(timeout=1.0)
+        if self._errors:
+            name, error = self._errors[0]
+            raise RuntimeError(f"Streaming stage '{name}' failed") from error
+
+    def report(self):
+        """Per-stage counters plus current queue depths."""
+        wall = time.perf_counter() - self.started if self.started else 0.0
+        report = {name: stats.snapshot(wall) for name, stats in self.stats.items()}
+        names = [n for n, _ in self.stages] + ["encode"]
+        for name, q in zip(names, self.queues):
+            report[name]["queue_now"] = q.qsize()
+        return report
+
+    def format_report(self):
+        lines = ["[Streaming] stage          items/s  util  avg_q  max_q  now_q"]
+        for name, s in self.report().items():
+            lines.append(f"[Streaming] {name:<14} {s['items_per_s']:>7} {s['utilization']:>5} "
+                         f"{s['avg_queue']:>6} {s['max_queue']:>6} {s.get('queue_now', '-'):>6}")
+        return "\n".join(lines)
+
+    def _put(self, q, item):
+        # Blocking put that still notices a shutdown requested by another stage
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _get(self, q):
+        while not self._stop.is_set():
+            try:
+                return q.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return _DONE
+
+    def _decode(self, frames, make_state, q_out):
+        stats = self.stats["decode"]
+        try:
+            iterator = iter(frames)
+            while True:
+                start = time.perf_counter()
+                item = next(iterator, None)
+                if item is None:
+                    break
+                state = make_state(*item)
+                stats.record(time.perf_counter() - start, 0)
+                if not self._put(q_out, state):
+                    return
+        except Exception as e:
+            self._fail("decode", e)
+        self._put(q_out, _DONE)
+
+    def _stage(self, name, node, q_in, q_out):
+        stats = self.stats[name]
+        try:
+            while True:
+                depth = q_in.qsize()
+                state = self._get(q_in)
+                if state is _DONE:
+                    break
+                start = time.perf_counter()
+                state = node(state)
+                stats.record(time.perf_counter() - start, depth)
+                if not self._put(q_out, state):
+                    return
+        except Exception as e:
+            self._fail(name, e)
+        self._put(q_out, _DONE)
+
+    def _encode(self, q_in, write, on_frame):
+        stats = self.stats["encode"]
+        pending = {}
+        next_id = None
+        while True:
+            depth = q_in.qsize()
+            state = self._get(q_in)
+            if state is _DONE:
+                break
+            pending[state["frame_id"]] = state
+            if next_id is None:
+                next_id = min(pending)
+            while next_id in pending:
+                ready = pending.pop(next_id)
+                start = time.perf_counter()
+                write(ready)
+                stats.record(time.perf_counter() - start, depth)
+                if on_frame is not None:
+                    on_frame(ready)
+                next_id += 1
+        # Flush anything left behind a gap (e.g. a dropped frame) in order
+        for frame_id in sorted(pending):
+            write(pending[frame_id])
+            if on_frame is not None:
+                on_frame(pending[frame_id])
+
+    def _fail(self, name, error):
+        self._errors.append((name, error))
+        self._stop.set()
@@ -0,0 +1,143 @@
+# src/pipeline/stride.py
+
+import cv2
+import numpy as np
+
+from src.pipeline.graph import output_node
+
+
+def interpolate_detections(prev_state, next_state, alpha):
+    """
+    Detections and global IDs for a skipped frame at fraction `alpha` between
+    two key frames: boxes of tracks seen in both are interpolated linearly,
+    tracks only in the earlier key frame keep their last box, and tracks that
+    only appear in the later one are not drawn yet.
+    """
+    nxt = {det["track_id"]: (det, gid) for det, gid in zip(next_state["detections"], next_state["global_ids"])
+           if det["track_id"] is not None}
+    detections, global_ids = [], []
+    for det, gid in zip(prev_state["detections"], prev_state["global_ids"]):
+        bbox = det["bbox"]
+        if det["track_id"] in nxt:
+            later, later_gid = nxt[det["track_id"]]
+            bbox = np.rint((1 - alpha) * np.asarray(bbox) + alpha * np.asarray(later["bbox"])).astype(int).tolist()
+            gid = gid if gid is not None else later_gid
+        detections.append({"track_id": det["track_id"], "bbox": bbox, "confidence": det["confidence"],
+                           "crop": None, "interpolated": True})
+        global_ids.append(gid)
+    return detections, global_ids
+
+
+class StrideScheduler:
+    """
+    Runs the full pipeline only on key frames and fills the frames in between
+    by box interpolation, so detection, embedding and description cost scales
+    with 1/stride.
+
+    A frame becomes a key frame when `stride` frames have passed since the last
+    one, or earlier when its motion (mean absolute difference of a downscaled
+    grayscale copy against the last key frame) exceeds `motion_high`. With
+    `adaptive`, the stride doubles (up to `max_stride`) after a key frame with
+    motion below `motion_low` and mean detection confidence above
+    `min_confidence`, and halves (down to `min_stride`) otherwise, so static,
+    talking-head footage runs at a long stride and busy scenes at a short one.
+    Skipped frames are held back until the next key frame (at most `max_stride`
+    frames), then interpolated and rendered in order.
+    """
+
+    def __init__(self, stride=2, adaptive=True, min_stride=1, max_stride=8, motion_low=2.0, motion_high=12.0,
+                 min_confidence=0.6, downscale_width=64):
+        self.stride = stride
+        self.adaptive = adaptive
+        self.min_stride = min_stride
+        self.max_stride = max_stride
+        self.motion_low = motion_low
+        self.motion_high = motion_high
+        self.min_confidence = min_confidence
+        self.downscale_width = downscale_width
+        self.last_key_small = None
+        self.last_key_id = None
+        self.key_frames = 0
+        self.skipped_frames = 0
+
+    def _small(self, frame):
+        h, w = frame.shape[:2]
+        size = (self.downscale_width, max(1, round(h * self.downscale_width / w)))
+        return cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+
+    def motion(self, small):
+        if self.last_key_small is None:
+            return float("inf")
+        return float(np.mean(cv2.absdiff(small, self.last_key_small)))
+
+    def is_key(self, frame_id, small):
+        """Whether `frame_id` should run the full pipeline."""
+        if self.last_key_id is None or frame_id - self.last_key_id >= self.stride:
+            return True
+        return self.motion(small) > self.motion_high
+
+    def update(self, frame_id, small, detections):
+        """Record a processed key frame and adapt the stride to its motion and detection confidence."""
+        motion = self.motion(small)
+        if self.adaptive and self.last_key_small is not None:
+            confident = not detections or np.mean([d["confidence"] for d in detections]) >= self.min_confidence
+            if motion < self.motion_low and confident:
+                self.stride = min(self.stride * 2, self.max_stride)
+            elif motion > self.motion_low * 2 or not confident:
+                self.stride = max(self.stride // 2, self.min_stride)
+        self.last_key_small = small
+        self.last_key_id = frame_id
+        self.key_frames += 1
+
+    def run(self, frames, make_state, process):
+        """
+        frames:      iterable of (frame_id, frame)
+        make_state:  callable(frame_id, frame) -> initial pipeline state
+        process:     callable(state) -> final state, e.g. pipeline.invoke (key frames only)
+        Yields the final state of every frame in order; skipped frames carry
+        interpolated detections, `"interpolated": True` and a rendered output_frame.
+        """
+        prev_state = None
+        held = []  # (frame_id, frame) skipped since prev_state
+        for frame_id, frame in frames:
+            small = self._small(frame)
+            if prev_state is not None and not self.is_key(frame_id, small):
+                held.append((frame_id, frame))
+                self.skipped_frames += 1
+                continue
+
+            state = process(make_state(frame_id, frame))
+            self.update(frame_id, small, state["detections"])
+            if prev_state is not None:
+                yield from self._fill(prev_state, state, held)
+            held = []
+            prev_state = state
+            yield state
+
+        if prev_state is not None and held:
+            # Video ended between key frames: hold the last key frame's boxes
+            yield from self._fill(prev_state, prev_state, held)
+
+    def _fill(self, prev_state, next_state, held):
+        span = max(next_state["frame_id"] - prev_state["frame_id"], 1)
+        for frame_id, frame in held:
+            detections, global_ids = interpolate_detections(prev_state, next_state,
+                                                            (frame_id - prev_state["frame_id"]) / span)
+            state = {
+                "frame_id": frame_id,
+                "frame": frame,
+                "detections": detections,
+                "global_ids": global_ids,
+                "frame_matching_details": [],
+                "interpolated": True,
+            }
+            yield output_node(state)
+
+    def stats(self):
+        total = self.key_frames + self.skipped_frames
+        return {
+            "key_frames": self.key_frames,
+            "skipped_frames": self.skipped_frames,
+            "effective_stride": round(total / self.key_frames, 2) if self.key_frames else 0.0,
+            "current_stride": self.stride,
+        }
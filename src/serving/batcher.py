@@ -0,0 +1,143 @@
+# src/serving/batcher.py
+
+import threading
+import time
+
+
+class _Request:
+    __slots__ = ("key", "items", "results", "error", "done")
+
+    def __init__(self, key, items):
+        self.key = key
+        self.items = items
+        self.results = None
+        self.error = None
+        self.done = threading.Event()
+
+
+class DynamicBatcher:
+    """
+    Merges concurrent requests into batched calls of `fn(key, items) -> results`
+    (one result per item). A batch starts with the oldest waiting request and
+    takes every other waiting request with the same `key` (e.g. the same
+    prompt) until it holds `max_batch_size` items or `max_wait` seconds have
+    passed since it started; a single request larger than the batch is run
+    on its own. One worker thread runs the batches, so the model is only ever
+    called from one thread.
+    """
+
+    def __init__(self, fn, max_batch_size=16, max_wait=0.01, name="batcher"):
+        self.fn = fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.pending = []
+        self.cond = threading.Condition()
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self.batch_sizes = {}  # {items per batch: count}
+        self.busy = 0.0
+        self._stop = False
+        self._thread = threading.Thread(target=self._work, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, items, key=None):
+        """Block until `items` have been processed (possibly with other clients' items); returns their results."""
+        if not items:
+            return []
+        request = _Request(key, list(items))
+        with self.cond:
+            if self._stop:
+                raise RuntimeError(f"{self.name}: batcher is closed")
+            self.pending.append(request)
+            self.cond.notify_all()
+        request.done.wait()
+        if request.error is not None:
+            raise request.error
+        return request.results
+
+    def close(self):
+        """Stop the worker; requests still waiting for a batch fail instead of blocking forever."""
+        with self.cond:
+            self._stop = True
+            self.cond.notify_all()
+        self._thread.join(timeout=5.0)
+
+    def stats(self):
+        with self.cond:
+            return {
+                "requests": self.requests,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+                "batch_sizes": dict(sorted(self.batch_sizes.items())),
+                "busy_s": round(self.busy, 3),
+            }
+
+    def _take_batch(self):
+        # Caller holds the lock; pending is non-empty
+        first = self.pending[0]
+        batch, size = [], 0
+        for request in list(self.pending):
+            if request.key != first.key:
+                continue
+            if batch and size + len(request.items) > self.max_batch_size:
+                break
+            batch.append(request)
+            size += len(request.items)
+            self.pending.remove(request)
+        return batch, size
+
+    def _fail_pending(self):
+        # Caller holds the lock
+        for request in self.pending:
+            request.error = RuntimeError(f"{self.name}: batcher closed before the request was run")
+            request.done.set()
+        self.pending.clear()
+
+    def _work(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self._stop:
+                    self.cond.wait()
+                if self._stop:
+                    self._fail_pending()
+                    return
+                # Give other clients up to max_wait to join this batch
+                deadline = time.perf_counter() + self.max_wait
+                key = self.pending[0].key
+                while True:
+                    waiting = sum(len(r.items) for r in self.pending if r.key == key)
+                    remaining = deadline - time.perf_counter()
+                    if waiting >= self.max_batch_size or remaining <= 0 or self._stop:
+                        break
+                    self.cond.wait(remaining)
+                if self._stop:
+                    self._fail_pending()
+                    return
+                batch, size = self._take_batch()
+
+            items = [item for request in batch for item in request.items]
+            start = time.perf_counter()
+            try:
+                results = self.fn(batch[0].key, items)
+                error = None
+            except Exception as e:
+                results, error = None, e
+            elapsed = time.perf_counter() - start
+
+            offset = 0
+            for request in batch:
+                if error is None:
+                    request.results = results[offset:offset + len(request.items)]
+                else:
+                    request.error = error
+                offset += len(request.items)
+                request.done.set()
+            with self.cond:
+                self.requests += len(batch)
+                self.batches += 1
+                self.items += size
+                self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+                self.busy += elapsed
@@ -0,0 +1,70 @@
+# src/serving/client.py
+
+import json
+import urllib.error
+import urllib.request
+from src.memory.memory import resolve_one_to_one
+from src.serving.server import encode_image
+
+
+def _request(url, payload=None, timeout=600):
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(url, data=data, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        raise RuntimeError(f"model server {url}: {json.loads(e.read()).get('error', e)}") from None
+
+
+class RemoteDescriptor:
+    """QwenEmbedder interface (describe / describe_batch) backed by a ModelServer."""
+
+    def __init__(self, url, timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+        info = _request(f"{self.url}/info", timeout=timeout)
+        # Same attributes main.open_result_cache namespaces descriptions by
+        self.model_id = info["model_id"]
+        self.resized_width = info["resized_width"]
+        self.resized_height = info["resized_height"]
+        self.prefix_cache = info["prefix_cache"]
+
+    def describe(self, pil_img, prompt=None, max_new_tokens=256):
+        return self.describe_batch([pil_img], prompt, max_new_tokens)[0]
+
+    def describe_batch(self, pil_imgs, prompt=None, max_new_tokens=256):
+        if not pil_imgs:
+            return []
+        payload = {"images": [encode_image(img) for img in pil_imgs], "prompt": prompt,
+                   "max_new_tokens": max_new_tokens}
+        return _request(f"{self.url}/describe", payload, self.timeout)["descriptions"]
+
+    def prefill_stats(self):
+        return _request(f"{self.url}/stats", timeout=self.timeout)["vlm_prefill"]
+
+
+class RemoteMatcher:
+    """OrchestrationAgent interface (compare_descriptions[_batch]) backed by a ModelServer."""
+
+    def __init__(self, url, timeout=600):
+        self.url = url.rstrip("/")
+        self.timeout = timeout
+
+    def compare_descriptions(self, new_description, existing_descriptions):
+        return self.compare_descriptions_many([new_description], [existing_descriptions])[0]
+
+    def compare_descriptions_batch(self, new_descriptions, existing_descriptions):
+        galleries = (existing_descriptions if isinstance(existing_descriptions, (list, tuple))
+                     else [existing_descriptions] * len(new_descriptions))
+        return resolve_one_to_one(self.compare_descriptions_many(new_descriptions, galleries))
+
+    def compare_descriptions_many(self, new_descriptions, galleries):
+        if not new_descriptions:
+            return []
+        payload = {"queries": [[new, [[gid, desc] for gid, desc in gallery.items()]]
+                               for new, gallery in zip(new_descriptions, galleries)]}
+        return [tuple(result) for result in _request(f"{self.url}/match", payload, self.timeout)["results"]]
+
+    def prefill_stats(self):
+        return _request(f"{self.url}/stats", timeout=self.timeout)["llm_prefill"]
@@ -0,0 +1,131 @@
+# src/serving/server.py
+
+import base64
+import io
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from PIL import Image
+from src.serving.batcher import DynamicBatcher
+
+
+def encode_image(pil_img):
+    """PIL image -> base64 PNG (lossless, so remote descriptions match local ones)."""
+    buffer = io.BytesIO()
+    pil_img.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode("ascii")
+
+
+def decode_image(data):
+    return Image.open(io.BytesIO(base64.b64decode(data))).convert("RGB")
+
+
+class ModelServer:
+    """
+    Localhost HTTP service hosting one descriptor (QwenEmbedder) and one
+    matcher (OrchestrationAgent) for any number of pipeline processes.
+
+      GET  /info      model identity, for result-cache namespaces
+      GET  /stats     batching and prefill statistics
+      POST /describe  {"images": [base64 PNG], "prompt": str|null, "max_new_tokens": int}
+      POST /match     {"queries": [[new_description, [[gid, description], ...]], ...]}
+
+    Requests from all clients go through a DynamicBatcher per model, so
+    concurrent crops / match prompts share `describe_batch` /
+    `compare_descriptions_many` calls. Matching results come back unresolved;
+    clients make each frame's results one-to-one themselves.
+    """
+
+    def __init__(self, descriptor, matcher, host="127.0.0.1", port=8765, max_batch_size=16, max_wait=0.01):
+        self.descriptor = descriptor
+        self.matcher = matcher
+        self.describe_batcher = DynamicBatcher(self._describe, max_batch_size, max_wait, name="describe")
+        self.match_batcher = DynamicBatcher(self._match, max_batch_size, max_wait, name="match")
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == "/info":
+                    self._reply(server.info())
+                elif self.path == "/stats":
+                    self._reply(server.stats())
+                else:
+                    self._reply({"error": f"unknown path {self.path}"}, 404)
+
+            def do_POST(self):
+                try:
+                    body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                    if self.path == "/describe":
+                        self._reply({"descriptions": server.describe(body)})
+                    elif self.path == "/match":
+                        self._reply({"results": server.match(body)})
+                    else:
+                        self._reply({"error": f"unknown path {self.path}"}, 404)
+                except Exception as e:
+                    self._reply({"error": f"{type(e).__name__}: {e}"}, 500)
+
+            def _reply(self, payload, status=200):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass  # one line per crop batch would drown the model logs
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.address = self.httpd.server_address
+
+    def info(self):
+        d = self.descriptor
+        return {
+            "model_id": getattr(d, "model_id", None),
+            "resized_width": getattr(d, "resized_width", None),
+            "resized_height": getattr(d, "resized_height", None),
+            "prefix_cache": getattr(d, "prefix_cache", False),
+        }
+
+    def stats(self):
+        return {
+            "describe": self.describe_batcher.stats(),
+            "match": self.match_batcher.stats(),
+            "vlm_prefill": self.descriptor.prefill_stats(),
+            "llm_prefill": self.matcher.prefill_stats(),
+        }
+
+    def describe(self, body):
+        images = [decode_image(data) for data in body["images"]]
+        key = (body.get("prompt"), body.get("max_new_tokens", 256))
+        return self.describe_batcher.submit(images, key=key)
+
+    def match(self, body):
+        queries = [(new, {int(gid): desc for gid, desc in gallery}) for new, gallery in body["queries"]]
+        return [list(result) for result in self.match_batcher.submit(queries)]
+
+    def _describe(self, key, images):
+        prompt, max_new_tokens = key
+        if prompt is None:
+            return self.descriptor.describe_batch(images, max_new_tokens=max_new_tokens)
+        return self.descriptor.describe_batch(images, prompt, max_new_tokens)
+
+    def _match(self, key, queries):
+        return self.matcher.compare_descriptions_many([new for new, _ in queries], [g for _, g in queries])
+
+    def serve_forever(self):
+        print(f"[ModelServer] listening on http://{self.address[0]}:{self.address[1]}")
+        self.httpd.serve_forever()
+
+    def start(self):
+        """Serve from a background thread (tests, benchmarks); returns the thread."""
+        thread = threading.Thread(target=self.httpd.serve_forever, name="model-server", daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self.describe_batcher.close()
+        self.match_batcher.close()
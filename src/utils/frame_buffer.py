@@ -0,0 +1,53 @@
+# src/utils/frame_buffer.py
+
+import cv2
+from PIL import Image
+
+
+class FrameBuffer:
+    """
+    One decoded BGR frame plus representations derived from it on demand and
+    shared by every node of the frame: the RGB copy is converted once, crops
+    are views into the frame (no copy), and the frame is uploaded to a torch
+    device once so embedders can cut and resize every crop there. PIL images
+    are only built, per crop, for libraries that require them.
+    Crops are views, so anything kept beyond the frame should copy them.
+    """
+
+    def __init__(self, frame):
+        self.bgr = frame
+        self.height, self.width = frame.shape[:2]
+        self._rgb = None
+        self._tensors = {}  # {device: (3, H, W) uint8 RGB tensor}
+
+    @property
+    def rgb(self):
+        if self._rgb is None:
+            self._rgb = cv2.cvtColor(self.bgr, cv2.COLOR_BGR2RGB)
+        return self._rgb
+
+    def clip(self, bbox):
+        """`bbox` clamped to the frame, or None when nothing of it is inside."""
+        x1, y1, x2, y2 = (int(v) for v in bbox)
+        x1, y1 = max(x1, 0), max(y1, 0)
+        x2, y2 = min(x2, self.width), min(y2, self.height)
+        return (x1, y1, x2, y2) if x2 > x1 and y2 > y1 else None
+
+    def crop(self, bbox, rgb=False):
+        """View of the (clamped) box in BGR or RGB, or None for an empty box."""
+        box = self.clip(bbox)
+        if box is None:
+            return None
+        x1, y1, x2, y2 = box
+        return (self.rgb if rgb else self.bgr)[y1:y2, x1:x2]
+
+    def pil(self, bbox):
+        crop = self.crop(bbox, rgb=True)
+        return Image.fromarray(crop) if crop is not None else None
+
+    def tensor(self, device):
+        """The RGB frame as a (3, H, W) uint8 tensor on `device`, uploaded once (channels flipped there)."""
+        if device not in self._tensors:
+            import torch
+            self._tensors[device] = torch.from_numpy(self.bgr).to(device).permute(2, 0, 1).flip(0)
+        return self._tensors[device]
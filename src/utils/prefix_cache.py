@@ -0,0 +1,60 @@
+# src/utils/prefix_cache.py
+
+
+class PrefixCacheStats:
+    """Counts prompt tokens prefilled vs. served from a reused prefix KV cache, and tokens generated."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.prompt_tokens = 0   # prompt tokens of every sequence
+        self.cached_tokens = 0   # of which were reused from the prefix cache
+        self.generated_tokens = 0
+
+    def record(self, prompt_tokens, cached_tokens):
+        self.calls += 1
+        self.prompt_tokens += prompt_tokens
+        self.cached_tokens += cached_tokens
+        print(f"[Timing] {self.name} prefill: {prompt_tokens - cached_tokens}/{prompt_tokens} prompt tokens "
+              f"({cached_tokens} reused from prefix cache)")
+
+    def record_generated(self, tokens):
+        self.generated_tokens += tokens
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "prefilled_tokens": self.prompt_tokens - self.cached_tokens,
+            "generated_tokens": self.generated_tokens,
+            "saved_per_call": round(self.cached_tokens / self.calls, 1) if self.calls else 0.0,
+            "saved_fraction": round(self.cached_tokens / self.prompt_tokens, 3) if self.prompt_tokens else 0.0,
+        }
+
+
+def prefix_matches(input_ids, prefix_ids):
+    """True if every row of `input_ids` (B, L) starts with the 1-D `prefix_ids`."""
+    n = prefix_ids.shape[-1]
+    if input_ids.shape[-1] <= n:
+        return False
+    return bool((input_ids[:, :n] == prefix_ids.to(input_ids.device)).all())
+
+
+def expand_cache(cache, batch_size):
+    """
+    New DynamicCache with `batch_size` rows of the single-row prefix `cache`.
+    The rows are broadcast views, not copies: `generate` and the decode loops
+    grow the cache they are given by concatenation, so the shared prefix is
+    never written to and can be expanded again for the next batch.
+    """
+    from transformers import DynamicCache
+
+    if hasattr(cache, "layers"):
+        tensors = [(layer.keys, layer.values) for layer in cache.layers]
+    else:
+        tensors = zip(cache.key_cache, cache.value_cache)
+    expanded = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(tensors):
+        expanded.update(keys.expand(batch_size, -1, -1, -1), values.expand(batch_size, -1, -1, -1), layer_idx)
+    return expanded
@@ -0,0 +1,152 @@
+# src/utils/result_cache.py
+
+import hashlib
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key BLOB PRIMARY KEY,          -- sha1 of (kind, namespace, video, frame, bbox)
+    kind TEXT NOT NULL,            -- "detections", "embedding" or "description"
+    namespace TEXT NOT NULL,       -- model id / prompt hash the value was produced with
+    size INTEGER NOT NULL,
+    last_used REAL NOT NULL,
+    value BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_used);
+CREATE INDEX IF NOT EXISTS entries_namespace ON entries (kind, namespace);
+"""
+
+
+def text_hash(text, length=12):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:length]
+
+
+def file_fingerprint(path, chunk=1 << 20):
+    """Cheap content hash of a video: its size plus the first and last `chunk` bytes."""
+    digest = hashlib.sha1()
+    size = os.path.getsize(path)
+    digest.update(str(size).encode())
+    with open(path, "rb") as f:
+        digest.update(f.read(chunk))
+        if size > chunk:
+            f.seek(max(size - chunk, chunk))
+            digest.update(f.read(chunk))
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    """
+    Content-addressed on-disk cache of per-frame model outputs across runs,
+    keyed by (kind, namespace, video fingerprint, frame index, bbox).
+
+    `namespaces` maps each kind to the identity of whatever produced it (model
+    id, prompt hash, preprocessing), so changing a model or prompt simply stops
+    matching the old entries; `invalidate_stale` deletes them. Entries are
+    evicted least-recently-used once the total size passes `max_bytes`.
+    Thread-safe, so streaming stages and the deferred worker can share it.
+
+    Cached detections bypass the tracker, so its state is only consistent
+    when a rerun hits the cache for every frame of the video.
+    """
+
+    def __init__(self, path, max_bytes=2 * 1024 ** 3, namespaces=None, commit_every=64):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript(SCHEMA)
+        self.max_bytes = max_bytes
+        self.namespaces = dict(namespaces or {})
+        self.commit_every = commit_every
+        self.lock = threading.Lock()
+        self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        self.touched = {}      # {key: last_used} of hits not yet written back
+        self.pending_writes = 0
+        self.hits = {}
+        self.misses = {}
+        self.evicted = 0
+
+    def key(self, kind, video_hash, frame_id, bbox=None):
+        bbox = None if bbox is None else tuple(int(v) for v in bbox)
+        raw = f"{kind}|{self.namespaces.get(kind, '')}|{video_hash}|{frame_id}|{bbox}"
+        return hashlib.sha1(raw.encode("utf-8")).digest()
+
+    def get(self, kind, video_hash, frame_id, bbox=None):
+        """Cached value, or None on a miss."""
+        key = self.key(kind, video_hash, frame_id, bbox)
+        with self.lock:
+            row = self.db.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses[kind] = self.misses.get(kind, 0) + 1
+                return None
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+            self.touched[key] = time.time()
+        return pickle.loads(row[0])
+
+    def put(self, kind, video_hash, frame_id, value, bbox=None):
+        key = self.key(kind, video_hash, frame_id, bbox)
+        blob = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            old = self.db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.db.execute("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                            (key, kind, self.namespaces.get(kind, ""), len(blob), time.time(), blob))
+            self.total_bytes += len(blob) - (old[0] if old else 0)
+            self.pending_writes += 1
+            if self.pending_writes >= self.commit_every:
+                self._commit()
+
+    def invalidate_stale(self):
+        """Delete entries of every configured kind produced under a different namespace."""
+        with self.lock:
+            removed = 0
+            for kind, namespace in self.namespaces.items():
+                removed += self.db.execute("DELETE FROM entries WHERE kind = ? AND namespace != ?",
+                                           (kind, namespace)).rowcount
+            self.total_bytes = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+            self.db.commit()
+        return removed
+
+    def close(self):
+        with self.lock:
+            self._commit()
+        self.db.close()
+
+    def stats(self):
+        return {
+            "hits": dict(self.hits),
+            "misses": dict(self.misses),
+            "size_mb": round(self.total_bytes / 2 ** 20, 1),
+            "evicted": self.evicted,
+        }
+
+    def _commit(self):
+        # Caller holds the lock
+        if self.touched:
+            self.db.executemany("UPDATE entries SET last_used = ? WHERE key = ?",
+                                [(used, key) for key, used in self.touched.items()])
+            self.touched = {}
+        self._evict()
+        self.db.commit()
+        self.pending_writes = 0
+
+    def _evict(self):
+        # Drop least-recently-used entries until 90% of the budget is free again
+        if self.total_bytes <= self.max_bytes:
+            return
+        target = 0.9 * self.max_bytes
+        while self.total_bytes > target:
+            victims = self.db.execute("SELECT key, size FROM entries ORDER BY last_used LIMIT 256").fetchall()
+            if not victims:
+                break
+            doomed = []
+            for key, size in victims:
+                if self.total_bytes <= target:
+                    break
+                doomed.append((key,))
+                self.total_bytes -= size
+            self.db.executemany("DELETE FROM entries WHERE key = ?", doomed)
+            self.evicted += len(doomed)
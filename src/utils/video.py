@@ -0,0 +1,12 @@
+# src/utils/video.py
+
+
+def read_frames(cap):
+    """Yield (frame_id, frame) until the capture runs out."""
+    frame_id = 0
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        yield frame_id, frame
+        frame_id += 1
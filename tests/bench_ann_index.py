@@ -0,0 +1,67 @@
+# tests/bench_ann_index.py
+# Recall / latency of the approximate gallery indexes against the exact backend.
+import os, sys, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from src.memory.index import make_index
+
+DIM = 512                  # CLIP ViT-B/16 embedding size
+GALLERY_SIZES = [10_000, 100_000]
+N_QUERIES = 200
+QUERIES_PER_FRAME = 10     # find_matches searches one frame's detections at a time
+K = 10
+rng = np.random.default_rng(0)
+
+
+def synthetic_gallery(n, dim=DIM, n_clusters=64):
+    """Clustered unit vectors, roughly mimicking CLIP person embeddings (people look alike)."""
+    centers = rng.standard_normal((n_clusters, dim)).astype(np.float32)
+    x = centers[rng.integers(0, n_clusters, n)] + 0.8 * rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def build(backend, gallery, **kwargs):
+    index = make_index(backend, **kwargs)
+    start = time.perf_counter()
+    for key, vector in enumerate(gallery):
+        index.add(key, vector)
+    return index, time.perf_counter() - start
+
+
+def timed_search(index, queries):
+    start = time.perf_counter()
+    keys = np.concatenate([index.search(queries[i:i + QUERIES_PER_FRAME], K)[1]
+                           for i in range(0, len(queries), QUERIES_PER_FRAME)])
+    return keys, (time.perf_counter() - start) / len(queries)
+
+
+backends = [("ivf", {"nlist": 256, "nprobe": 8}), ("ivf", {"nlist": 256, "nprobe": 32})]
+try:
+    import hnswlib  # noqa: F401
+    backends.append(("hnsw", {"dim": DIM, "ef": 64}))
+except ImportError:
+    print("hnswlib not installed, skipping the hnsw backend")
+
+for n in GALLERY_SIZES:
+    gallery = synthetic_gallery(n)
+    queries = gallery[rng.integers(0, n, N_QUERIES)] + 0.1 * rng.standard_normal((N_QUERIES, DIM)).astype(np.float32)
+
+    exact, exact_build = build("exact", gallery)
+    truth, exact_latency = timed_search(exact, queries)
+    print(f"N={n}: exact build {exact_build:.2f}s, search {exact_latency * 1e3:.3f} ms/query")
+
+    for backend, kwargs in backends:
+        index, build_time = build(backend, gallery, **kwargs)
+        keys, latency = timed_search(index, queries)
+        recall_1 = np.mean(keys[:, 0] == truth[:, 0])
+        recall_k = np.mean([len(set(a) & set(b)) / K for a, b in zip(keys, truth)])
+        print(f"  {backend} {kwargs}: build {build_time:.2f}s, search {latency * 1e3:.3f} ms/query, "
+              f"recall@1 {recall_1:.3f}, recall@{K} {recall_k:.3f}")
+
+# Incremental update / delete keep working after training
+index, _ = build("ivf", gallery[:20_000], nlist=64, nprobe=8)
+index.add(0, gallery[1])
+index.remove(1)
+_, keys = index.search(gallery[1:2], 1)
+print(f"ivf after update/delete: nearest to old vector 1 is key {keys[0, 0]} (expected 0)")
@@ -0,0 +1,56 @@
+# tests/bench_memory_index.py
+# Benchmarks PersonMemory.find_matches against the old per-person loop.
+import os, sys, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from src.memory.memory import PersonMemory
+
+DIM = 512               # CLIP ViT-B/16 embedding size
+QUERIES_PER_FRAME = 10
+GALLERY_SIZES = [1_000, 10_000, 100_000]
+REPEATS = 20
+rng = np.random.default_rng(0)
+
+
+def random_unit(n, dim=DIM):
+    x = rng.standard_normal((n, dim)).astype(np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def loop_find_match(gallery, embedding, threshold):
+    """The previous O(N) Python loop, one similarity per stored person."""
+    best_id, best_score = None, -1
+    for global_id, stored in enumerate(gallery):
+        score = float(np.dot(embedding, stored) / (np.linalg.norm(embedding) * np.linalg.norm(stored)))
+        if score > best_score:
+            best_id, best_score = global_id, score
+    return (best_id, best_score) if best_score >= threshold else (None, best_score)
+
+
+for n in GALLERY_SIZES:
+    gallery = random_unit(n)
+    memory = PersonMemory(similarity_threshold=0.8)
+    start = time.perf_counter()
+    for row in gallery:
+        memory.add_person(row)
+    build = time.perf_counter() - start
+
+    # Queries are noisy copies of stored identities so matches actually happen
+    frames = [gallery[rng.integers(0, n, QUERIES_PER_FRAME)] + 0.05 * random_unit(QUERIES_PER_FRAME)
+              for _ in range(REPEATS)]
+
+    start = time.perf_counter()
+    for queries in frames:
+        memory.find_matches(queries)
+    vectorized = (time.perf_counter() - start) / REPEATS
+
+    loop_repeats = max(1, REPEATS * 1_000 // n)
+    start = time.perf_counter()
+    for queries in frames[:loop_repeats]:
+        for q in queries:
+            loop_find_match(gallery, q, 0.8)
+    loop = (time.perf_counter() - start) / loop_repeats
+
+    print(f"N={n:>7}: build {build:.2f}s | per-frame ({QUERIES_PER_FRAME} queries) "
+          f"vectorized {vectorized * 1e3:.2f} ms, loop {loop * 1e3:.1f} ms, speedup {loop / vectorized:.0f}x")
@@ -0,0 +1,45 @@
+# tests/bench_model_server.py
+# Dynamic batching of the model server with stub models: N concurrent clients
+# each send small describe / match requests; prints throughput and batch sizes.
+import os, sys, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from PIL import Image
+from src.benchmark.stubs import StubDescriptor, StubMatcher
+from src.serving.client import RemoteDescriptor, RemoteMatcher
+from src.serving.server import ModelServer
+
+CALL_LATENCY, ITEM_LATENCY = 0.05, 0.005   # stub seconds per model call / per item
+REQUESTS_PER_CLIENT = 20
+CROPS_PER_REQUEST = 3
+CLIENTS = [1, 4, 16]
+rng = np.random.default_rng(0)
+crops = [Image.fromarray(rng.integers(0, 255, (96, 48, 3), dtype=np.uint8)) for _ in range(CROPS_PER_REQUEST)]
+
+for max_wait in [0.0, 0.01]:
+    for n_clients in CLIENTS:
+        descriptor = StubDescriptor(CALL_LATENCY, ITEM_LATENCY, max_batch_size=None)
+        server = ModelServer(descriptor, StubMatcher(latency=CALL_LATENCY, per_item=ITEM_LATENCY), port=0,
+                             max_batch_size=16, max_wait=max_wait)
+        server.start()
+        url = f"http://{server.address[0]}:{server.address[1]}"
+
+        def client(_):
+            remote = RemoteDescriptor(url)
+            matcher = RemoteMatcher(url)
+            for _ in range(REQUESTS_PER_CLIENT):
+                descriptions = remote.describe_batch(crops)
+                matcher.compare_descriptions_batch(descriptions, {0: descriptions[0]})
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(n_clients) as pool:
+            list(pool.map(client, range(n_clients)))
+        elapsed = time.perf_counter() - start
+        stats = server.stats()
+        server.shutdown()
+        n_crops = n_clients * REQUESTS_PER_CLIENT * CROPS_PER_REQUEST
+        print(f"max_wait={max_wait * 1e3:.0f} ms, {n_clients:>2} clients: {n_crops / elapsed:7.1f} crops/s | "
+              f"describe mean batch {stats['describe']['mean_batch_size']:5.2f} "
+              f"({stats['describe']['batches']} calls) | match mean batch {stats['match']['mean_batch_size']:5.2f}")
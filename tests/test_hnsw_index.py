@@ -0,0 +1,62 @@
+# tests/test_hnsw_index.py
+# HNSWIndex (needs hnswlib) against ExactIndex through add / remove / re-add /
+# update: every search must return each live key once, with the exact scores.
+import os, sys
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from src.memory.index import ExactIndex, HNSWIndex
+
+DIM = 32
+rng = np.random.default_rng(0)
+hnsw = HNSWIndex(dim=DIM, max_elements=8)
+exact = ExactIndex()
+
+
+def add(key):
+    vector = rng.standard_normal(DIM).astype(np.float32)
+    hnsw.add(key, vector)
+    exact.add(key, vector)
+
+
+def remove(key):
+    hnsw.remove(key)
+    exact.remove(key)
+
+
+def check(step):
+    queries = rng.standard_normal((5, DIM)).astype(np.float32)
+    k = len(exact) + 2
+    scores, keys = hnsw.search(queries, k)
+    exact_scores, exact_keys = exact.search(queries, k)
+    for row in keys:
+        live = row[row >= 0].tolist()
+        assert len(live) == len(set(live)), f"{step}: duplicate keys {live}"
+        assert set(live) == set(exact.rows), f"{step}: keys {sorted(live)} != {sorted(exact.rows)}"
+    assert np.allclose(np.sort(scores, axis=1), np.sort(exact_scores, axis=1), atol=1e-5), f"{step}: scores differ"
+    assert len(hnsw) == len(exact)
+    print(f"{step}: OK ({len(exact)} keys)")
+
+
+for key in range(6):
+    add(key)
+check("add")
+remove(2)
+check("remove")
+add(4)
+check("update after remove")
+add(2)
+check("re-add removed key")
+remove(0)
+remove(1)
+add(10)
+add(4)
+check("new key into a freed slot, then update")
+remove(3)
+add(11)
+add(3)
+check("re-add a key whose slot was reused")
+for key in range(20, 40):
+    add(key)
+add(10)
+check("resize and update")
@@ -0,0 +1,145 @@
+# tests/test_prefix_cache.py
+# Prefix-KV-cache decoding vs. plain greedy `generate` on CPU with tiny random
+# Qwen2 / Qwen2.5-VL models built from configs (no downloads): the cached
+# OrchestrationAgent (middle-padded batches) and QwenEmbedder (hand-rolled
+# M-RoPE decode) must produce exactly the uncached replies. Constrained JSON
+# replies of the agent must parse and name a candidate ID or null.
+import json, os, sys, tempfile
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+import torch
+from PIL import Image
+from tokenizers import Tokenizer, decoders, models, pre_tokenizers
+from transformers import (
+    Qwen2TokenizerFast, Qwen2Config, Qwen2ForCausalLM, Qwen2_5_VLConfig,
+    Qwen2_5_VLForConditionalGeneration, Qwen2_5_VLProcessor, Qwen2VLImageProcessor,
+    Qwen2VLVideoProcessor,
+)
+from qwen_vl_utils import process_vision_info
+from transformers.models.gpt2.tokenization_gpt2 import bytes_to_unicode
+from src.agent.orchestration_agent import OrchestrationAgent
+from src.embedding.qwen_embedder import QwenEmbedder
+
+SPECIAL_TOKENS = ["<|endoftext|>", "<|im_start|>", "<|im_end|>", "<|vision_start|>", "<|vision_end|>",
+                  "<|image_pad|>", "<|video_pad|>"]
+CHAT_TEMPLATE = (
+    "{% for message in messages %}<|im_start|>{{ message['role'] }}\n"
+    "{% if message['content'] is string %}{{ message['content'] }}{% else %}{% for c in message['content'] %}"
+    "{% if c['type'] == 'image' %}<|vision_start|><|image_pad|><|vision_end|>{% else %}{{ c['text'] }}{% endif %}"
+    "{% endfor %}{% endif %}<|im_end|>\n{% endfor %}{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}"
+)
+torch.manual_seed(0)
+
+
+def byte_tokenizer():
+    """One token per byte plus the Qwen special tokens."""
+    vocab = {ch: i for i, ch in enumerate(bytes_to_unicode().values())}
+    vocab.update({tok: len(vocab) + i for i, tok in enumerate(SPECIAL_TOKENS)})
+    tokenizer = Tokenizer(models.BPE(vocab=vocab, merges=[]))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False, use_regex=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    tokenizer = Qwen2TokenizerFast(tokenizer_object=tokenizer, eos_token="<|im_end|>",
+                                    pad_token="<|endoftext|>", additional_special_tokens=SPECIAL_TOKENS[1:])
+    tokenizer.chat_template = CHAT_TEMPLATE
+    return tokenizer
+
+
+def text_config(tokenizer):
+    # Large random weights and a short RoPE period, so an off-by-one position or a wrong cache row changes the tokens
+    return dict(vocab_size=len(tokenizer), hidden_size=32, intermediate_size=64, num_hidden_layers=2,
+                num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=8192,
+                initializer_range=0.5, rope_theta=100.0,
+                eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id)
+
+
+def save_llm(path):
+    tokenizer = byte_tokenizer()
+    model = Qwen2ForCausalLM(Qwen2Config(**text_config(tokenizer)))
+    model.generation_config.eos_token_id = tokenizer.eos_token_id
+    model.save_pretrained(path)
+    tokenizer.save_pretrained(path)
+
+
+def save_vlm(path):
+    tokenizer = byte_tokenizer()
+    ids = tokenizer.convert_tokens_to_ids
+    config = Qwen2_5_VLConfig(
+        text_config={**text_config(tokenizer), "rope_scaling": {"type": "mrope", "mrope_section": [2, 1, 1]}},
+        vision_config=dict(depth=2, hidden_size=32, intermediate_size=64, num_heads=2, out_hidden_size=32,
+                           fullatt_block_indexes=[1], window_size=56),
+        image_token_id=ids("<|image_pad|>"), video_token_id=ids("<|video_pad|>"),
+        vision_start_token_id=ids("<|vision_start|>"),
+    )
+    model = Qwen2_5_VLForConditionalGeneration(config)
+    model.generation_config.eos_token_id = tokenizer.eos_token_id
+    model.generation_config.do_sample = False
+    model.save_pretrained(path)
+    Qwen2_5_VLProcessor(image_processor=Qwen2VLImageProcessor(), tokenizer=tokenizer,
+                        video_processor=Qwen2VLVideoProcessor(), chat_template=CHAT_TEMPLATE).save_pretrained(path)
+
+
+def check(name, cached, reference):
+    ok = cached == reference
+    print(f"{name}: {'OK' if ok else 'MISMATCH'}")
+    if not ok:
+        for c, r in zip(cached, reference):
+            print(f"  cached    {c!r}\n  reference {r!r}")
+    assert ok, name
+
+
+with tempfile.TemporaryDirectory() as tmp:
+    # --- LLM matcher: cached prefix + middle padding vs. uncached, unpadded single prompts ---
+    save_llm(tmp)
+    cached = OrchestrationAgent(tmp, quant=None, max_new_tokens=12, device_map="cpu", prefix_cache=True,
+                                constrained=False, max_batch_size=4)
+    plain = OrchestrationAgent(tmp, quant=None, max_new_tokens=12, device_map="cpu", prefix_cache=False,
+                               constrained=False)
+    galleries = [{1: "short"}, {1: "a much longer existing description", 2: "blue coat"}, {3: "x"}]
+    prompts = [plain._prompt_text(f"person {i}" * (i + 1), g) for i, g in enumerate(galleries)]
+    reference = [plain._generate([p])[0] for p in prompts]
+    check("LLM single prompt", [cached._generate([p])[0] for p in prompts], reference)
+    check("LLM padded batch", cached._generate(prompts), reference)
+    check("LLM padded batch again", cached._generate(prompts[::-1]), reference[::-1])
+    print(f"LLM prefill: {cached.prefill_stats()}")
+
+    # --- Constrained JSON decoding: a random model must still produce parseable replies within the budget ---
+    for max_new_tokens in (96, 72):
+        constrained = OrchestrationAgent(tmp, quant=None, max_new_tokens=max_new_tokens, device_map="cpu",
+                                         prefix_cache=True, constrained=True, max_batch_size=4)
+        news = [f"person {i}" * (i + 1) for i in range(len(galleries))]
+        replies = constrained._generate([constrained._prompt_text(n, g) for n, g in zip(news, galleries)],
+                                        [list(g) for g in galleries])
+        for reply, gallery in zip(replies, galleries):
+            result = json.loads(reply)
+            assert result["matched_id"] is None or result["matched_id"] in gallery, reply
+            assert result["confidence"] in ("high", "medium", "low"), reply
+        results = constrained.compare_descriptions_many(news, galleries)
+        assert all(confidence != "error" for _, confidence, _ in results), results
+        print(f"LLM constrained replies (max_new_tokens={max_new_tokens}): OK")
+
+with tempfile.TemporaryDirectory() as tmp:
+    # --- VLM describer: hand-rolled decode from the cached prefix vs. `generate` on the same prompts ---
+    save_vlm(tmp)
+    describer = QwenEmbedder(tmp, torch_dtype=torch.float32, attn_implementation="sdpa", device_map="cpu",
+                             max_batch_size=4, resized_width=56, resized_height=112, prefix_cache=True)
+    rng = np.random.default_rng(0)
+    images = [Image.fromarray(rng.integers(0, 255, (96, 48, 3), dtype=np.uint8)) for _ in range(3)]
+
+    def generate_reference(pil_imgs, prompt="Describe the person.", max_new_tokens=12):
+        """The describer's (prompt-first) messages through the model's own `generate`, without the prefix cache."""
+        conversations = [describer._build_messages(img, prompt) for img in pil_imgs]
+        image_inputs, _ = process_vision_info(conversations)
+        texts = [describer.processor.apply_chat_template(c, add_generation_prompt=True, tokenize=False)
+                 for c in conversations]
+        inputs = describer.processor(text=texts, images=image_inputs, padding=True, return_tensors="pt")
+        with torch.no_grad():
+            output_ids = describer.model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)
+        new_ids = output_ids[:, inputs.input_ids.shape[1]:]
+        return [a.strip() for a in describer.processor.batch_decode(new_ids, skip_special_tokens=True)]
+
+    reference = generate_reference(images)
+    check("VLM single crop", [describer.describe(img, "Describe the person.", 12) for img in images], reference)
+    check("VLM batch", describer.describe_batch(images, "Describe the person.", 12), reference)
+    check("VLM batch again", describer.describe_batch(images[:2], "Describe the person.", 12), reference[:2])
+    print(f"VLM prefill: {describer.prefill_stats()}")
@@ -0,0 +1,66 @@
+# tests/test_track_frames.py
+# Batched track_frames vs. per-frame track_frame on CPU with a small YOLO model,
+# on a synthetic clip panning over an image bundled with ultralytics: at full
+# resolution both must report the same boxes with the same track IDs, for any
+# batch size. Throughput is printed; half resolution only reports agreement.
+import os, sys, time
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import cv2
+import numpy as np
+from ultralytics import ASSETS
+from src.detection.detector_tracker import UltralyticsByteTrack
+
+MODEL = sys.argv[1] if len(sys.argv) > 1 else "yolov8n.pt"
+N_FRAMES = 32
+BATCH_SIZES = [1, 4, 8]
+
+
+def panning_clip(image, n_frames, size=(960, 540), step=8):
+    """`n_frames` crops of `image` sliding right and down by `step` pixels per frame."""
+    w, h = size
+    return [np.ascontiguousarray(image[i * step // 2:i * step // 2 + h, i * step:i * step + w])
+            for i in range(n_frames)]
+
+
+frames = panning_clip(cv2.imread(str(ASSETS / "zidane.jpg")), N_FRAMES)
+print(f"{len(frames)} frames of {frames[0].shape[1]}x{frames[0].shape[0]}")
+
+tracker = UltralyticsByteTrack(model_path=MODEL, device="cpu")
+start = time.perf_counter()
+reference = [tracker.track_frame(frame) for frame in frames]
+print(f"track_frame: {len(frames) / (time.perf_counter() - start):.1f} fps, "
+      f"{sum(len(r) for r in reference)} boxes")
+assert any(len(r) for r in reference), "no person found on the clip"
+
+
+def iou(a, b):
+    a, b = np.array(a), np.array(b)
+    inter = np.prod(np.clip(np.minimum(a[2:], b[2:]) - np.maximum(a[:2], b[:2]), 0, None))
+    return inter / (np.prod(a[2:] - a[:2]) + np.prod(b[2:] - b[:2]) - inter)
+
+
+def agreement(a, b):
+    """Fraction of boxes of `a` and `b` paired (IoU > 0.9) with a box of the other having the same track ID."""
+    matched = total = 0
+    for ref, det in zip(a, b):
+        total += max(len(ref), len(det))
+        det = [(row["track_id"], row["bbox"]) for row in det]
+        for row in ref:
+            matched += any(t == row["track_id"] and iou(row["bbox"], box) > 0.9 for t, box in det)
+    return matched / total if total else 1.0
+
+
+for batch_size in BATCH_SIZES:
+    for half_resolution in (False, True):
+        tracker = UltralyticsByteTrack(model_path=MODEL, device="cpu", batch_size=batch_size,
+                                       half_resolution=half_resolution)
+        start = time.perf_counter()
+        batched = tracker.track_frames(frames)
+        fps = len(frames) / (time.perf_counter() - start)
+        assert len(batched) == len(frames)
+        same = agreement(reference, batched)
+        print(f"track_frames batch={batch_size} half_resolution={half_resolution}: {fps:.1f} fps, "
+              f"same ID/box as track_frame for {same:.1%} of boxes")
+        if not half_resolution:
+            assert same == 1.0, f"batch={batch_size}: track_frames disagrees with track_frame"